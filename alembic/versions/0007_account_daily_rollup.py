@@ -0,0 +1,34 @@
+from alembic import op
+
+# revision identifiers
+revision = "0007_account_daily_rollup"
+down_revision = "0006_mv_account_daily"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # incrementally maintained counterpart of mv_account_daily (see db/rollups.py);
+    # sums and counts are additive, averages and the ratio are derived
+    op.execute("""
+    CREATE TABLE IF NOT EXISTS account_daily (
+      day date NOT NULL,
+      account_id uuid NOT NULL,
+      sum_out numeric(20,4) NOT NULL DEFAULT 0,
+      n_out bigint NOT NULL DEFAULT 0,
+      sum_in numeric(20,4) NOT NULL DEFAULT 0,
+      n_in bigint NOT NULL DEFAULT 0,
+      avg_out numeric(20,4) GENERATED ALWAYS AS (CASE WHEN n_out > 0 THEN sum_out / n_out ELSE 0 END) STORED,
+      avg_in numeric(20,4) GENERATED ALWAYS AS (CASE WHEN n_in > 0 THEN sum_in / n_in ELSE 0 END) STORED,
+      inout_ratio numeric GENERATED ALWAYS AS (CASE WHEN sum_out > 0 THEN sum_in / sum_out ELSE NULL END) STORED,
+      updated_at timestamp NOT NULL DEFAULT NOW(),
+      PRIMARY KEY (day, account_id)
+    );
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_account_daily_acc ON account_daily (account_id, day DESC)")
+    # change cursor: only the not-yet-rolled-up tail is indexed
+    op.execute("CREATE INDEX IF NOT EXISTS ix_transactions_unprocessed ON transactions (tx_ts) WHERE NOT processed")
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_transactions_unprocessed")
+    op.execute("DROP INDEX IF EXISTS ix_account_daily_acc")
+    op.execute("DROP TABLE IF EXISTS account_daily")
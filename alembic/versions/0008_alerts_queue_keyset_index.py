@@ -0,0 +1,19 @@
+from alembic import op
+
+# revision identifiers
+revision = "0008_alerts_queue_keyset_index"
+down_revision = "0007_account_daily_rollup"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # the queue's keyset order ends in alert_id (see api/alerts/main.py); with it in the
+    # index, pages and claims read rows in index order with no sort step for ties
+    op.execute("DROP INDEX IF EXISTS ix_alerts_new_priority_desc")
+    op.execute("""CREATE INDEX IF NOT EXISTS ix_alerts_new_priority_desc
+                  ON alerts (priority DESC, created_at DESC, alert_id DESC) WHERE status = 'new'""")
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_alerts_new_priority_desc")
+    op.execute("""CREATE INDEX IF NOT EXISTS ix_alerts_new_priority_desc
+                  ON alerts (priority DESC, created_at DESC) WHERE status = 'new'""")
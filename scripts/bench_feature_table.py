@@ -0,0 +1,82 @@
+"""
+Compare feature-table formats on synthetic data: write time, size on disk, full load
+time and a pruned load (3 columns, last 7 days).
+
+    PYTHONPATH=src python scripts/bench_feature_table.py --rows 2000000
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data.etl import compute_basic_features, load_feature_table, write_feature_table
+
+START = date(2025, 1, 1)
+
+
+def _chunks(rows: int, chunk_size: int, days: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    t0 = pd.Timestamp(START, tz="UTC")
+    stats = (4.5, 1.0)
+    for lo in range(0, rows, chunk_size):
+        n = min(chunk_size, rows - lo)
+        df = pd.DataFrame({
+            "tx_id": [f"tx{i}" for i in range(lo, lo + n)],
+            "src_account": [f"acc{i:06d}" for i in rng.integers(0, 50_000, n)],
+            "dst_account": [f"acc{i:06d}" for i in rng.integers(0, 50_000, n)],
+            "amount": rng.lognormal(4.5, 1.0, n).round(2),
+            "currency": rng.choice(["EUR", "USD", "SEK"], n),
+            "channel": rng.choice(["web", "mobile", "branch"], n),
+            "merchant_code": rng.choice(["5411", "5999", "6011"], n),
+            "tx_ts": (t0 + pd.to_timedelta(np.sort(rng.uniform(lo, lo + n, n)) / rows * days, unit="D")).floor("us"),
+        })
+        yield compute_basic_features(df, stats)
+
+
+def _size(p: Path) -> int:
+    return p.stat().st_size if p.is_file() else sum(f.stat().st_size for f in p.rglob("*") if f.is_file())
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--chunk-size", type=int, default=100_000)
+    ap.add_argument("--days", type=int, default=60)
+    args = ap.parse_args()
+
+    cols = ["src_account", "amount_zscore", "hour"]
+    since = START + timedelta(days=args.days - 7)
+    tmp = Path(tempfile.mkdtemp(prefix="featbench_"))
+    print(f"{args.rows:,} rows, {args.days} days")
+    print(f"{'format':<16}{'write s':>9}{'size MB':>9}{'load s':>9}{'pruned s':>10}")
+    try:
+        for fmt, part in (("csv", None), ("parquet", "day"), ("parquet", "account"), ("ipc", "day")):
+            out = tmp / ("f.csv" if fmt == "csv" else f"f_{fmt}_{part}")
+            t = time.perf_counter()
+            write_feature_table(_chunks(args.rows, args.chunk_size, args.days), str(out), fmt, part)
+            w = time.perf_counter() - t
+            t = time.perf_counter()
+            load_feature_table(str(out))
+            full = time.perf_counter() - t
+            t = time.perf_counter()
+            if fmt == "csv":  # no pushdown: read the columns, then filter in memory
+                df = load_feature_table(str(out), columns=cols + ["tx_ts"])
+                df = df[df["tx_ts"].dt.date >= since]
+            elif part == "day":
+                load_feature_table(str(out), columns=cols, filters=[("day", ">=", since)])
+            else:
+                import pyarrow.dataset as ds
+                load_feature_table(str(out), columns=cols, filters=ds.field("tx_ts") >= pd.Timestamp(since, tz="UTC"))
+            pruned = time.perf_counter() - t
+            print(f"{fmt + ('/' + part if part else ''):<16}{w:>9.2f}{_size(out) / 1e6:>9.1f}{full:>9.2f}{pruned:>10.2f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Flattened IsolationForest inference (anomaly.iforest_flat) vs sklearn's
+decision_function, at serve-time batch sizes.
+
+    PYTHONPATH=src python scripts/bench_iforest.py --trees 300 --features 8
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+from anomaly.iforest_flat import FlatForest
+
+
+def _time(fn, X, min_time: float = 0.5) -> float:
+    fn(X)  # warm
+    n, t0 = 0, time.perf_counter()
+    while True:
+        fn(X)
+        n += 1
+        dt = time.perf_counter() - t0
+        if dt >= min_time:
+            return dt / n
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--trees", type=int, default=300)
+    ap.add_argument("--features", type=int, default=8)
+    ap.add_argument("--batch", type=int, nargs="+", default=[1, 64, 10_000])
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    model = IsolationForest(n_estimators=args.trees, random_state=0).fit(rng.normal(size=(20_000, args.features)))
+    t0 = time.perf_counter()
+    flat = FlatForest.from_sklearn(model, sklearn_above=1 << 62)  # always traverse
+    print(f"{args.trees} trees, {len(flat.feature):,} nodes, depth {flat.depth}; "
+          f"flatten {1e3 * (time.perf_counter() - t0):.0f} ms")
+    auto = FlatForest.from_sklearn(model)  # serve-time configuration
+    print(f"{'batch':>7}{'sklearn ms':>12}{'flat ms':>10}{'speedup':>9}{'auto ms':>10}{'max |diff|':>12}")
+    for n in args.batch:
+        X = rng.normal(size=(n, args.features)) * 1.5
+        diff = np.abs(flat.decision_function(X) - model.decision_function(X)).max()
+        sk = _time(model.decision_function, X)
+        fl = _time(flat.decision_function, X)
+        au = _time(auto.decision_function, X)
+        print(f"{n:>7}{1e3 * sk:>12.3f}{1e3 * fl:>10.3f}{sk / fl:>8.1f}x{1e3 * au:>10.3f}{diff:>12.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Throughput of data.loader against the ~100k rows/s target.
+
+    PYTHONPATH=src python scripts/bench_loader.py --rows 200000
+    PYTHONPATH=src python scripts/bench_loader.py --rows 1000000 --db-url postgresql+psycopg://...
+
+Synthetic transactions are written to a CSV file first. Without --db-url only the client
+side is measured: reading and normalizing the file and encoding it for COPY, on the row
+path (csv.DictReader + normalize_row) and on the columnar path (read_table_stream + Arrow
+CSV). With it, each file is loaded end to end through CopyLoader. Loaded rows use fresh
+tx_ids and are left in the table.
+
+Measured with 1,000,000 rows in 50k-row chunks. Client and PostgreSQL 16.2 share a
+single vCPU, the server runs default settings with fsync on, and transactions carries
+the 0004/0007 index set (primary key plus seven secondary indexes):
+
+    client, rows (normalize_row + binary encode)         ~50,000 rows/s
+    client, columnar (read_table_stream + Arrow CSV)    ~520,000 rows/s
+    load columnar CSV, dedup                             ~25,000 rows/s
+    load columnar CSV, no dedup                          ~18,000 rows/s
+    load rows, binary, dedup                             ~10,000 rows/s
+
+The client is no longer the limit on the columnar path. COPY of the same CSV into an
+unindexed table runs at ~220,000 rows/s on this box. The rest of the end-to-end time
+is the server maintaining eight btree indexes, most of them keyed on random UUIDs, on
+the same core.
+"""
+import argparse
+import csv
+import json
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+from data.etl_batch import read_csv_stream
+from data.loader import COLUMNS, CopyLoader, _copy_value, _csv, _dsn, normalize_row, read_table_stream
+
+
+def _raw_rows(n: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    accounts = [str(uuid.UUID(int=rnd.getrandbits(128))) for _ in range(1000)]
+    t0 = datetime(2025, 1, 1)
+    for _ in range(n):
+        yield {  # CSV-shaped: everything is a string
+            "tx_id": str(uuid.UUID(int=rnd.getrandbits(128), version=4)), "src_account": rnd.choice(accounts),
+            "dst_account": rnd.choice(accounts), "amount": f"{rnd.lognormvariate(4, 1.5):.2f}", "currency": "EUR",
+            "channel": rnd.choice(["web", "pos", ""]), "merchant_code": "5411",
+            "tx_ts": (t0 + timedelta(seconds=rnd.randrange(90 * 86400))).isoformat(),
+            "ip_hash": "", "geo": json.dumps({"cc": "FI"}), "raw_payload": "", "processed": "",
+        }
+
+
+def _write(path: Path, n: int, seed: int) -> Path:
+    with path.open("w", newline="") as f:
+        w = csv.DictWriter(f, COLUMNS)
+        w.writeheader()
+        w.writerows(_raw_rows(n, seed))
+    return path
+
+
+def _rate(label: str, rows: int, seconds: float) -> None:
+    print(f"{label:<46} {rows / seconds:>12,.0f} rows/s")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--chunk-size", type=int, default=50_000)
+    ap.add_argument("--db-url", default=None)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = _write(Path(tmp) / "bench.csv", args.rows, seed=0)
+
+        t0 = time.perf_counter()
+        for chunk in read_csv_stream(src, args.chunk_size):
+            for r in map(normalize_row, chunk):
+                [_copy_value(c, r[c], True) for c in COLUMNS]
+        _rate("client, rows (normalize_row + binary encode)", args.rows, time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        for table in read_table_stream(src, args.chunk_size):
+            _csv(table)
+        _rate("client, columnar (read_table_stream + Arrow CSV)", args.rows, time.perf_counter() - t0)
+
+        if not args.db_url:
+            return
+        modes = (("load columnar CSV, dedup", True, False), ("load columnar CSV, no dedup", False, False),
+                 ("load rows, binary, dedup", True, True))
+        for seed, (label, dedup, rows) in enumerate(modes, start=1):
+            path = _write(Path(tmp) / f"load{seed}.csv", args.rows, seed)  # fresh tx_ids per mode
+            loader = CopyLoader(_dsn(args.db_url), binary=rows, dedup=dedup)
+            if rows:
+                stats = loader.load(read_csv_stream(path, args.chunk_size), normalize_row)
+            else:
+                stats = loader.load(read_table_stream(path, args.chunk_size))
+            _rate(label, stats.rows_in, stats.seconds)
+            if stats.rows_loaded != stats.rows_in or stats.failed_chunks:
+                print(f"  loaded {stats.rows_loaded:,} of {stats.rows_in:,}, failed chunks: {stats.failed_chunks}")
+
+
+if __name__ == "__main__":
+    main()
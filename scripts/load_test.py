@@ -0,0 +1,67 @@
+"""
+Concurrency sweep against one API worker, to see where throughput flattens.
+
+    uvicorn api.gateway.app:app --workers 1 --port 8000
+    python scripts/load_test.py --path /transactions/ingest-and-score-async --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+
+def _payload(n_accounts: int) -> dict:
+    return {
+        "account_external_id": f"load_{random.randrange(n_accounts):05d}",
+        "amount": round(random.lognormvariate(4.5, 1.0), 2),
+        "currency": "EUR",
+        "country": random.choice(["DE", "FI", "SE", "AE", "IR", "US"]),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+async def _run(client: httpx.AsyncClient, path: str, concurrency: int, duration: float, n_accounts: int):
+    latencies: list[float] = []
+    errors = 0
+    stop_at = time.perf_counter() + duration
+
+    async def user() -> None:
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            r = await client.post(path, json=_payload(n_accounts))
+            if r.status_code == 200:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    q = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else float("nan")
+    return len(latencies) / elapsed, q(0.50), q(0.99), errors
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://localhost:8000")
+    ap.add_argument("--path", default="/transactions/ingest-and-score-async")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    ap.add_argument("--accounts", type=int, default=1000)
+    args = ap.parse_args()
+
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.url, timeout=30.0, limits=limits) as client:
+        print(f"{'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for c in args.concurrency:
+            rps, p50, p99, errors = await _run(client, args.path, c, args.duration, args.accounts)
+            print(f"{c:>5} {rps:>9.1f} {p50:>9.1f} {p99:>9.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from typing import Protocol, Sequence, Tuple
+from typing import Optional, Protocol, Sequence, Tuple
 import numpy as np
 
+from anomaly.iforest_flat import FlatForest
+
 try:
     from sklearn.ensemble import IsolationForest
 except Exception as e:  # pragma: no cover
@@ -25,14 +27,16 @@ class IsoForestModel:
             contamination=contamination,
             random_state=random_state,
         )
+        self._flat: Optional[FlatForest] = None
 
     def fit(self, X: np.ndarray) -> "IsoForestModel":
         self.model.fit(X)
+        self._flat = FlatForest.from_sklearn(self.model)
         return self
 
     def score(self, X: np.ndarray) -> np.ndarray:
         # Higher is more normal in IsolationForest; invert to get anomaly score in [0, +)
-        raw = self.model.score_samples(X)
+        raw = self._flat.score_samples(X) if self._flat is not None else self.model.score_samples(X)
         return (raw.max() - raw).astype(np.float32)
 
     def predict(self, X: np.ndarray) -> np.ndarray:
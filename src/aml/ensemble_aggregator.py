@@ -2,16 +2,16 @@
 
 from __future__ import annotations
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import numpy as np
 import numpy.typing as npt
 from sklearn.ensemble import StackingClassifier
 
-from core.logging import logger
-from anomaly.detector import DetectorBase
+from loguru import logger
+from anomaly.detector import DetectorBase, top_k_contributions
 
 
-class EnsembleAggregator:
+class EnsembleAggregator(DetectorBase):
     """Combine multiple anomaly detectors with learned weights."""
 
     def __init__(self, detectors: List[DetectorBase], method: str = "weighted_avg"):
@@ -26,22 +26,47 @@ class EnsembleAggregator:
         clf = LogisticRegression().fit(scores, y)
         self.weights = clf.coef_[0]
         self.weights = np.abs(self.weights) / np.sum(np.abs(self.weights))
-        logger.info("Ensemble weights fitted: %s", self.weights)
+        logger.info(f"Ensemble weights fitted: {self.weights}")
 
-    def score(self, X: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
-        scores = np.column_stack([d.score(X) for d in self.detectors])
+    def _combine(self, scores: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
         if self.weights is not None:
             return np.dot(scores, self.weights)
         return np.mean(scores, axis=1)
 
+    def _weighted(self, scores: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        """Per-detector share of the ensemble score (columns sum to the score)."""
+        w = self.weights if self.weights is not None else np.full(len(self.detectors), 1.0 / len(self.detectors))
+        return scores * w
+
+    def score(self, X: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        return self._combine(np.column_stack([d.score(X) for d in self.detectors]))
+
+    def score_and_explain(self, X: npt.NDArray[np.float64], top_k: int = 3) -> Tuple[npt.NDArray[np.float64], list[Dict[str, Any]]]:
+        """One score_and_explain call per detector for the whole batch; the ensemble
+        score and its top-k detectors are derived from those cached outputs."""
+        outputs = [d.score_and_explain(X, top_k) for d in self.detectors]
+        scores = np.column_stack([o[0] for o in outputs])
+        total = self._combine(scores)
+        names = [d.__class__.__name__ for d in self.detectors]
+        tops = top_k_contributions(self._weighted(scores), top_k, names)
+        return total, [
+            {
+                "score": float(total[i]),
+                "top": tops[i],
+                "detectors": [{"name": n, **outputs[j][1][i]} for j, n in enumerate(names)],
+            }
+            for i in range(len(total))
+        ]
+
     def explain(self, X: npt.NDArray[np.float64]) -> list[Dict[str, Any]]:
-        individual_expls = [d.explain(X) for d in self.detectors]
+        scores = np.column_stack([d.score(X) for d in self.detectors])  # one call per detector, not per row
+        total = self._combine(scores)
         return [
             {
-                "ensemble_score": float(self.score(X[i:i+1])[0]),
+                "ensemble_score": float(total[i]),
                 "contributing_detectors": [
-                    {"name": d.__class__.__name__, "score": d.score(X[i:i+1])[0]}
-                    for d in self.detectors
+                    {"name": d.__class__.__name__, "score": float(scores[i, j])}
+                    for j, d in enumerate(self.detectors)
                 ]
             }
             for i in range(len(X))
@@ -2,16 +2,119 @@
 
 from __future__ import annotations
 
+import copy
+import threading
 import torch
 import torch.nn as nn
 import torch.optim as optim
+from pathlib import Path
 from sklearn.preprocessing import StandardScaler
-from typing import Dict, Any
+from typing import Any, Callable, Dict, Iterable, Optional
 import numpy as np
 import numpy.typing as npt
 
-from .detector import DetectorBase
-from core.logging import logger
+from .detector import DetectorBase, top_k_contributions
+from common.config import get_settings
+from common.sketch import LogHistogramSketch
+from loguru import logger
+
+
+class FoldedAutoencoder(nn.Module):
+    """
+    Serving graph: raw features in, reconstruction errors out.
+
+    The StandardScaler is folded into the first Linear layer (W/s, b - W @ (m/s)),
+    so the network consumes unscaled rows; the scaled target the error is measured
+    against is one fused multiply-add on the same input.
+    """
+
+    def __init__(self, net: nn.Sequential, mean: np.ndarray, scale: np.ndarray) -> None:
+        super().__init__()
+        inv = torch.tensor(1.0 / scale, dtype=torch.float32)
+        shift = torch.tensor(-mean / scale, dtype=torch.float32)
+        first = net[0]
+        with torch.no_grad():
+            first.bias.add_(first.weight @ shift)
+            first.weight.mul_(inv)
+        self.net = net
+        self.register_buffer("inv_scale", inv)
+        self.register_buffer("shift", shift)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        target = torch.addcmul(self.shift, x, self.inv_scale)
+        return torch.mean((self.net(x) - target) ** 2, dim=1)
+
+
+class ServingScorer:
+    """
+    CPU scorer around a FoldedAutoencoder (eager, int8-quantized or TorchScript).
+
+    Rows are copied into a reusable float32 buffer that the input tensor shares
+    memory with, and run under `torch.inference_mode`. The buffer is guarded by a
+    lock; MicroBatcher's single worker never contends for it.
+    """
+
+    def __init__(self, module: Any, input_dim: int, capacity: int = 256) -> None:
+        self.module = module
+        self.input_dim = input_dim
+        self._buf = np.empty((capacity, input_dim), dtype=np.float32)
+        self._tensor = torch.from_numpy(self._buf)
+        self._lock = threading.Lock()
+
+    def score(self, X: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        X = np.atleast_2d(X)
+        n = len(X)
+        with self._lock:
+            if n > len(self._buf):
+                self._buf = np.empty((max(n, 2 * len(self._buf)), self.input_dim), dtype=np.float32)
+                self._tensor = torch.from_numpy(self._buf)
+            np.copyto(self._buf[:n], X, casting="same_kind")
+            with torch.inference_mode():
+                errors = self.module(self._tensor[:n])
+            return errors.numpy().astype(np.float64)
+
+    def save(self, path: Path) -> None:
+        """Write a TorchScript export (only for scorers built with `script=True`)."""
+        if not isinstance(self.module, torch.jit.ScriptModule):
+            raise TypeError("save() needs a TorchScript scorer; build it with script=True")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.module.save(str(path))
+
+    @classmethod
+    def load(cls, path: Path, input_dim: int) -> "ServingScorer":
+        return cls(torch.jit.load(str(path), map_location="cpu"), input_dim)
+
+
+def ranking_agreement(reference: np.ndarray, candidate: np.ndarray, top_frac: float = 0.01) -> Dict[str, float]:
+    """Spearman correlation and top-`top_frac` overlap between two score vectors."""
+    from scipy.stats import spearmanr
+
+    k = max(1, int(len(reference) * top_frac))
+    top_ref = set(np.argsort(-reference)[:k])
+    top_cand = set(np.argsort(-candidate)[:k])
+    return {
+        "spearman": float(spearmanr(reference, candidate).correlation),
+        "top_overlap": len(top_ref & top_cand) / k,
+        "max_abs_err": float(np.max(np.abs(reference - candidate))),
+    }
+
+
+class _ErrorStats:
+    """Running mean plus quantile sketch of per-row reconstruction errors."""
+
+    def __init__(self) -> None:
+        self.sketch = LogHistogramSketch()
+        self.total = 0.0
+        self.n = 0
+
+    def update(self, errors: np.ndarray) -> None:
+        self.sketch.update(errors)
+        self.total += float(errors.sum())
+        self.n += len(errors)
+
+    @property
+    def mean_error(self) -> float:
+        return self.total / self.n if self.n else float("nan")
 
 
 class AutoencoderDetector(DetectorBase):
@@ -37,8 +140,9 @@ class AutoencoderDetector(DetectorBase):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model = self._build_model().to(self.device)
         self.threshold: float = 0.0
+        self._serving: Optional[ServingScorer] = None
 
-        logger.info("AutoencoderDetector initialized on device: %s", self.device)
+        logger.info(f"AutoencoderDetector initialized on device: {self.device}")
 
     def _build_model(self) -> nn.Module:
         encoder_dims = [self.input_dim] + self.hidden_dims
@@ -55,6 +159,7 @@ class AutoencoderDetector(DetectorBase):
 
     def train(self, X: npt.NDArray[np.float64]) -> None:
         """Train only on presumably normal data."""
+        self._serving = None  # built from the previous weights
         try:
             X_scaled = self.scaler.fit_transform(X)
             dataset = torch.tensor(X_scaled, dtype=torch.float32)
@@ -79,23 +184,156 @@ class AutoencoderDetector(DetectorBase):
                     epoch_loss += loss.item()
 
                 if (epoch + 1) % 20 == 0:
-                    logger.debug("Autoencoder epoch %d/%d - loss: %.6f", epoch + 1, self.epochs, epoch_loss / len(loader))
+                    logger.debug(f"Autoencoder epoch {epoch + 1}/{self.epochs} - loss: {epoch_loss / len(loader):.6f}")
 
             # Compute threshold on training reconstruction errors
             with torch.no_grad():
                 recon_errors = torch.mean((self.model(dataset.to(self.device)) - dataset.to(self.device)) ** 2, dim=1)
                 self.threshold = torch.quantile(recon_errors, self.threshold_percentile / 100.0).item()
 
-            logger.info("Autoencoder training completed. Threshold set to %.6f", self.threshold)
+            logger.info(f"Autoencoder training completed. Threshold set to {self.threshold:.6f}")
 
         except Exception as e:
-            logger.error("Error during autoencoder training: %s", e)
+            logger.error(f"Error during autoencoder training: {e}")
             raise
 
+    def train_stream(
+        self,
+        chunks: Callable[[], Iterable[npt.NDArray[np.float64]]],
+        val_chunks: Optional[Callable[[], Iterable[npt.NDArray[np.float64]]]] = None,
+        patience: int = 5,
+        min_delta: float = 0.0,
+    ) -> Dict[str, Any]:
+        """
+        Out-of-core counterpart of `train`. `chunks` (and `val_chunks`) are factories
+        returning a fresh iterator of (rows, input_dim) arrays per pass, e.g.
+        `lambda: iter_feature_arrays(path, cols)`; memory is bounded by one chunk.
+
+        One pass fits the scaler with `partial_fit`; each epoch then shuffles within
+        chunks and runs mini-batches. With a validation stream, training stops after
+        `patience` epochs without a `min_delta` improvement and the best weights are
+        restored. The threshold comes from a streaming quantile sketch of training
+        reconstruction errors (one extra pass) instead of a full-dataset tensor.
+        """
+        self._serving = None
+        self.scaler = StandardScaler()
+        n_rows = 0
+        for chunk in chunks():
+            self.scaler.partial_fit(chunk)
+            n_rows += len(chunk)
+        if not n_rows:
+            raise ValueError("empty training stream")
+
+        criterion = nn.MSELoss()
+        optimizer = optim.Adam(self.model.parameters(), lr=self.lr)
+        best_loss, best_state, stale = float("inf"), None, 0
+        history: list[Dict[str, float]] = []
+
+        for epoch in range(self.epochs):
+            self.model.train()
+            total, n_batches = 0.0, 0
+            for chunk in chunks():
+                data = torch.tensor(self.scaler.transform(chunk), dtype=torch.float32)
+                data = data[torch.randperm(len(data))]
+                for batch in torch.split(data, self.batch_size):
+                    batch = batch.to(self.device)
+                    loss = criterion(self.model(batch), batch)
+                    optimizer.zero_grad()
+                    loss.backward()
+                    optimizer.step()
+                    total += loss.item()
+                    n_batches += 1
+            entry = {"epoch": epoch + 1, "train_loss": total / max(n_batches, 1)}
+
+            if val_chunks is not None:
+                val_loss = self._stream_errors(val_chunks()).mean_error
+                entry["val_loss"] = val_loss
+                if val_loss < best_loss - min_delta:
+                    best_loss, stale = val_loss, 0
+                    best_state = copy.deepcopy(self.model.state_dict())
+                else:
+                    stale += 1
+            history.append(entry)
+            logger.debug(f"Autoencoder epoch {epoch + 1}/{self.epochs} - {entry}")
+            if val_chunks is not None and stale >= patience:
+                logger.info(f"Early stopping after epoch {epoch + 1} (best val loss {best_loss:.6f})")
+                break
+
+        if best_state is not None:
+            self.model.load_state_dict(best_state)
+        errors = self._stream_errors(chunks())
+        self.threshold = errors.sketch.quantile(self.threshold_percentile / 100.0)
+        logger.info(f"Autoencoder streaming training completed on {n_rows} rows. Threshold set to {self.threshold:.6f}")
+        return {"rows": n_rows, "epochs": history, "best_val_loss": best_loss if best_state else None,
+                "threshold": self.threshold}
+
+    def _stream_errors(self, chunks: Iterable[npt.NDArray[np.float64]]) -> "_ErrorStats":
+        self.model.eval()
+        stats = _ErrorStats()
+        with torch.inference_mode():
+            for chunk in chunks:
+                data = torch.tensor(self.scaler.transform(chunk), dtype=torch.float32).to(self.device)
+                errors = torch.mean((self.model(data) - data) ** 2, dim=1).cpu().numpy()
+                stats.update(errors)
+        return stats
+
     def predict(self, X: npt.NDArray[np.float64]) -> npt.NDArray[np.int32]:
         return (self.score(X) > self.threshold).astype(np.int32)
 
+    def serving(
+        self,
+        quantize: bool = False,
+        script: bool = False,
+        threads: Optional[int] = None,
+        validate_on: Optional[npt.NDArray[np.float64]] = None,
+        min_spearman: float = 0.99,
+        min_top_overlap: float = 0.9,
+    ) -> ServingScorer:
+        """
+        Build a CPU serving scorer from the trained model: scaler folded into the
+        first layer, optionally int8 dynamic quantization of the Linear layers after
+        it (the folded layer stays float32) and a traced TorchScript graph.
+        `threads` (default: settings.TORCH_THREADS)
+        sets torch's intra-op pool, which is per process, so keep it at
+        cores / workers. With `validate_on`, reconstruction-error rankings are
+        compared with the eager model and a ValueError is raised if they drift.
+        """
+        threads = threads if threads is not None else get_settings().TORCH_THREADS
+        if threads > 0:
+            torch.set_num_threads(threads)
+
+        net = copy.deepcopy(self.model).to("cpu").eval()
+        module: Any = FoldedAutoencoder(net, self.scaler.mean_, self.scaler.scale_).eval()
+        if quantize:
+            # The folded first layer sees raw rows: one per-tensor int8 scale spanning amount
+            # (~1e5) and hour/ratio features (~1) would round the small ones to zero, and its
+            # weights carry 1/scale. Keep it in float and quantize the layers after it.
+            names = {name for name, m in module.named_modules() if isinstance(m, nn.Linear) and name != "net.0"}
+            module = torch.ao.quantization.quantize_dynamic(module, names, dtype=torch.qint8)
+        if script:
+            example = torch.zeros(1, self.input_dim)
+            with torch.inference_mode():
+                module = torch.jit.freeze(torch.jit.trace(module, example).eval())
+        scorer = ServingScorer(module, self.input_dim)
+
+        if validate_on is not None:
+            report = ranking_agreement(self._score_eager(validate_on), scorer.score(validate_on))
+            logger.info(f"Autoencoder serving check (quantize={quantize}, script={script}): {report}")
+            if report["spearman"] < min_spearman or report["top_overlap"] < min_top_overlap:
+                raise ValueError(f"Serving model ranking drifted from the trained model: {report}")
+        return scorer
+
+    def enable_serving(self, **kwargs: Any) -> ServingScorer:
+        """Route `score` through a serving scorer (see `serving` for options)."""
+        self._serving = self.serving(**kwargs)
+        return self._serving
+
     def score(self, X: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        if self._serving is not None:
+            return self._serving.score(X)
+        return self._score_eager(X)
+
+    def _score_eager(self, X: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
         try:
             X_scaled = self.scaler.transform(X)
             X_tensor = torch.tensor(X_scaled, dtype=torch.float32).to(self.device)
@@ -104,9 +342,21 @@ class AutoencoderDetector(DetectorBase):
                 errors = torch.mean((recon - X_tensor) ** 2, dim=1)
             return errors.cpu().numpy()
         except Exception as e:
-            logger.error("Error during autoencoder scoring: %s", e)
+            logger.error(f"Error during autoencoder scoring: {e}")
             raise
 
+    def score_and_explain(self, X: npt.NDArray[np.float64], top_k: int = 3) -> tuple[npt.NDArray[np.float64], list[Dict[str, Any]]]:
+        """Reconstruction error per row and the top_k features by share of it, from one forward pass.
+        A feature's share is its term of the mean squared error, so all shares sum to the score."""
+        X_tensor = torch.tensor(self.scaler.transform(np.atleast_2d(X)), dtype=torch.float32).to(self.device)
+        self.model.eval()
+        with torch.inference_mode():
+            sq = ((self.model(X_tensor) - X_tensor) ** 2).cpu().numpy().astype(np.float64)
+        share = sq / sq.shape[1]
+        errors = share.sum(axis=1)
+        tops = top_k_contributions(share, top_k, self.feature_names)
+        return errors, [{"score": float(e), "top": t} for e, t in zip(errors, tops)]
+
     def explain(self, X: npt.NDArray[np.float64]) -> list[Dict[str, Any]]:
         # Simple feature contribution based on reconstruction error
         X_scaled = self.scaler.transform(X)
@@ -1,35 +1,100 @@
 from __future__ import annotations
+from abc import ABC, abstractmethod
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import os
 import numpy as np
 from sklearn.ensemble import IsolationForest
 from joblib import dump, load
 from common.config import get_settings
+from anomaly.iforest_flat import FlatForest
 
-class AnomalyDetector:
+def top_k_contributions(contrib: np.ndarray, k: int, names: Optional[Sequence[Any]] = None) -> List[List[Dict[str, Any]]]:
+    """Per row, the k largest entries of a (rows, features) contribution matrix,
+    largest first, as [{"feature": name_or_index, "contribution": value}, ...]."""
+    contrib = np.atleast_2d(contrib)
+    k = min(k, contrib.shape[1])
+    if k <= 0:
+        return [[] for _ in range(len(contrib))]
+    idx = np.argpartition(-contrib, k - 1, axis=1)[:, :k]
+    idx = np.take_along_axis(idx, np.argsort(-np.take_along_axis(contrib, idx, axis=1), axis=1), axis=1)
+    vals = np.take_along_axis(contrib, idx, axis=1)
+    label = (lambda j: names[j]) if names is not None else int
+    return [[{"feature": label(j), "contribution": float(v)} for j, v in zip(r, vr)] for r, vr in zip(idx, vals)]
+
+
+class DetectorBase(ABC):
+    """Common interface of the anomaly detectors and the ensemble over them."""
+    feature_names: Optional[Sequence[str]] = None
+
+    @abstractmethod
+    def score(self, X: np.ndarray) -> np.ndarray: ...
+
+    def score_and_explain(self, X: np.ndarray, top_k: int = 3) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """Scores plus, per row, {"score": s, "top": [top_k contributions]} from a single
+        pass. Detectors override this; the base version has no attributions."""
+        scores = np.asarray(self.score(X), dtype=np.float64)
+        return scores, [{"score": float(s), "top": []} for s in scores]
+
+
+class AnomalyDetector(DetectorBase):
     def __init__(self, model: IsolationForest | None = None):
         s = get_settings()
         self.model_dir = Path(s.MODEL_DIR)
         self.model_dir.mkdir(parents=True, exist_ok=True)
         self.path = self.model_dir / "iforest.joblib"
-        self.model = model or IsolationForest(
+        self.model = model if model is not None else IsolationForest(
             n_estimators=s.IFOREST_TREES,
             contamination=s.CONTAMINATION,
             random_state=s.RANDOM_STATE,
         )
+        self._flat: FlatForest | None = None
+        if hasattr(self.model, "estimators_"):  # already fitted (e.g. loaded by ModelRegistry)
+            self._flat = FlatForest.from_sklearn(self.model)
+
+    def _decision(self, X: np.ndarray) -> np.ndarray:
+        # flattened traversal at serve time; same values as sklearn's decision_function
+        if self._flat is not None:
+            return self._flat.decision_function(X)
+        return self.model.decision_function(X)
 
     def fit(self, X: np.ndarray) -> None:
         self.model.fit(X)
-        dump(self.model, self.path)
+        self._flat = FlatForest.from_sklearn(self.model)
+        # write-then-rename so a ModelRegistry polling the file never loads a partial dump
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        dump(self.model, tmp)
+        os.replace(tmp, self.path)
 
     def load_or_fit(self, X: np.ndarray) -> None:
         if self.path.exists():
             self.model = load(self.path)
+            self._flat = FlatForest.from_sklearn(self.model)
         else:
             self.fit(X)
 
     def score_one(self, x: np.ndarray) -> float:
         """Return anomaly score in [0..1], higher => more anomalous."""
         # IsolationForest decision_function is higher for normal; invert & squash
-        raw = -self.model.decision_function(x.reshape(1, -1))[0]
+        raw = -self._decision(x.reshape(1, -1))[0]
         # Normalize via sigmoid-ish mapping
         return (1.0 / (1.0 + pow(2.71828, -4 * (raw - 0.5))))
+
+    def score_many(self, X: np.ndarray) -> np.ndarray:
+        """Vectorised score_one: one decision_function call for the whole batch."""
+        raw = -self._decision(np.atleast_2d(X))
+        return 1.0 / (1.0 + np.power(2.71828, -4 * (raw - 0.5)))
+
+    def score(self, X: np.ndarray) -> np.ndarray:
+        return self.score_many(X)
+
+    def score_and_explain(self, X: np.ndarray, top_k: int = 3) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """Scores and the features whose splits isolated each row soonest, from the
+        same forest traversal (see FlatForest.explain)."""
+        X = np.atleast_2d(X)
+        if self._flat is None:
+            self._flat = FlatForest.from_sklearn(self.model)
+        decision, contrib = self._flat.explain(X)
+        scores = 1.0 / (1.0 + np.power(2.71828, -4 * (-decision - 0.5)))
+        tops = top_k_contributions(contrib, top_k, self.feature_names)
+        return scores, [{"score": float(s), "top": t} for s, t in zip(scores, tops)]
@@ -5,11 +5,22 @@ from __future__ import annotations
 import networkx as nx
 import numpy as np
 import numpy.typing as npt
-from typing import Dict, Any
+import pandas as pd
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple
 from pandas import DataFrame
 
-from .detector import DetectorBase
-from core.logging import logger
+from .detector import DetectorBase, top_k_contributions
+from .reachability import ReachabilityIndex
+from loguru import logger
+
+
+@dataclass(frozen=True)
+class GraphIndex:
+    """Scoring structures derived from the graph; rebuilt whenever edges change."""
+    nodes: pd.Index           # node id -> dense index
+    centrality: np.ndarray    # degree centrality per dense index (as nx.degree_centrality)
+    reach: ReachabilityIndex
 
 
 class GraphDetector(DetectorBase):
@@ -19,36 +30,69 @@ class GraphDetector(DetectorBase):
         self.centrality_threshold = centrality_threshold
         self.cycle_risk_factor = cycle_risk_factor
         self.G = nx.DiGraph()
+        self._index: Optional[GraphIndex] = None
 
     def train(self, transactions: DataFrame) -> None:
         """Build graph from historical transactions."""
         self.G.clear()
-        for _, row in transactions.iterrows():
-            self.G.add_edge(row["sender_id"], row["receiver_id"], amount=row["amount"], tx_id=row["id"])
-        logger.info("Transaction graph built with %d nodes and %d edges", self.G.number_of_nodes(), self.G.number_of_edges())
+        self.add_transactions(transactions)
+        index = self._ensure_index()
+        logger.info(f"Transaction graph built with {self.G.number_of_nodes()} nodes and {self.G.number_of_edges()} edges "
+                    f"({index.reach.n_components} strongly connected components)")
+
+    def add_transactions(self, transactions: DataFrame) -> None:
+        """Add edges; centrality and the reachability index are rebuilt on the next score."""
+        self.G.add_edges_from(
+            (s, r, {"amount": a, "tx_id": i})
+            for s, r, a, i in zip(transactions["sender_id"], transactions["receiver_id"],
+                                  transactions["amount"], transactions["id"])
+        )
+        self._index = None
+
+    def _ensure_index(self) -> GraphIndex:
+        index = self._index
+        if index is None:
+            nodes = pd.Index(list(self.G.nodes))
+            n = len(nodes)
+            ends = list(zip(*self.G.edges)) or [(), ()]
+            src = nodes.get_indexer(list(ends[0]))
+            dst = nodes.get_indexer(list(ends[1]))
+            degree = np.bincount(src, minlength=n) + np.bincount(dst, minlength=n)
+            centrality = degree / (n - 1) if n > 1 else np.ones(n)
+            index = self._index = GraphIndex(nodes, centrality, ReachabilityIndex(n, src, dst))
+        return index
 
     def predict(self, X: npt.NDArray[np.float64]) -> npt.NDArray[np.int32]:
         return (self.score(X) > 0.5).astype(np.int32)
 
-    def score(self, X: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    REASONS = ("sender_centrality", "receiver_centrality", "cycle")
+
+    def _components(self, X: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        """(rows, 3) score components in REASONS order; the score is their capped sum."""
         # X expected to have transaction-level features including sender/receiver ids
         # This is a simplified version - in practice you'd map X to graph nodes
-        scores = np.zeros(len(X))
-        centrality = nx.degree_centrality(self.G)
-
-        for i, row in enumerate(X):
-            sender = int(row[0])  # assume first columns are ids - adjust as needed
-            receiver = int(row[1])
-            score = 0.0
-            if centrality.get(sender, 0) > self.centrality_threshold:
-                score += 0.4
-            if centrality.get(receiver, 0) > self.centrality_threshold:
-                score += 0.4
-            if nx.has_path(self.G, receiver, sender):  # possible cycle
-                score += self.cycle_risk_factor * 0.2
-            scores[i] = min(score, 1.0)
-
-        return scores
+        X = np.atleast_2d(X)
+        parts = np.zeros((len(X), len(self.REASONS)))
+        index = self._ensure_index()
+        if not len(X) or not len(index.nodes):
+            return parts
+        # assume first columns are ids - adjust as needed; unknown ids map to -1
+        sender = index.nodes.get_indexer(X[:, 0].astype(np.int64))
+        receiver = index.nodes.get_indexer(X[:, 1].astype(np.int64))
+        central = np.append(index.centrality > self.centrality_threshold, False)  # [-1] -> False
+        parts[:, 0] = 0.4 * central[sender]
+        parts[:, 1] = 0.4 * central[receiver]
+        parts[:, 2] = self.cycle_risk_factor * 0.2 * index.reach.reaches(receiver, sender)  # possible cycle
+        return parts
+
+    def score(self, X: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        return np.minimum(self._components(X).sum(axis=1), 1.0)
+
+    def score_and_explain(self, X: npt.NDArray[np.float64], top_k: int = 3) -> Tuple[npt.NDArray[np.float64], list[Dict[str, Any]]]:
+        parts = self._components(X)
+        scores = np.minimum(parts.sum(axis=1), 1.0)
+        tops = top_k_contributions(parts, top_k, self.REASONS)
+        return scores, [{"score": float(s), "top": [c for c in t if c["contribution"] > 0]} for s, t in zip(scores, tops)]
 
     def explain(self, X: npt.NDArray[np.float64]) -> list[Dict[str, Any]]:
         return [{"reason": "High centrality or cycle involvement"}] * len(X)
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from typing import Any, Tuple
+
+import numpy as np
+
+# The traversal runs in blocks of rows so the (rows, trees) node matrix stays small.
+_BLOCK_ROWS = 256
+# NumPy gathers cost ~35ns per row-tree-level; sklearn's compiled per-tree apply is
+# cheaper per row but pays ~20ms fixed overhead per call (300 trees). Past this many
+# rows the forest hands off to sklearn (see scripts/bench_iforest.py).
+SKLEARN_ABOVE = 1024
+
+
+def _average_path_length(n: np.ndarray) -> np.ndarray:
+    """c(n) from the Isolation Forest paper, as in sklearn.ensemble._iforest."""
+    n = np.asarray(n, dtype=np.float64)
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    big = n > 2
+    out[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return out
+
+
+class FlatForest:
+    """
+    A fitted sklearn IsolationForest flattened into contiguous node arrays.
+
+    All trees share one set of arrays (feature, threshold, children, leaf value);
+    leaves point to themselves, so a batch is traversed level by level with a fixed
+    number of gather/compare steps over a (rows, trees) matrix of node ids, instead
+    of one `tree.apply` call per tree. `leaf_value` folds the leaf depth and the
+    c(n_node_samples) correction sklearn adds per leaf, so the path length of a
+    row is a sum over its leaves.
+
+    `score_samples` / `decision_function` match sklearn's up to float rounding. This
+    pays off for the small batches of online scoring; batches above `sklearn_above`
+    rows are delegated to the source model.
+    """
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, children: np.ndarray,
+                 leaf_value: np.ndarray, roots: np.ndarray, depth: int, denominator: float,
+                 offset: float, n_features: int, model: Any = None, sklearn_above: int = SKLEARN_ABOVE) -> None:
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children  # [2*i] left, [2*i + 1] right child of node i
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.depth = depth
+        self.denominator = denominator
+        self.offset = offset
+        self.n_features = n_features
+        self.model = model
+        self.sklearn_above = sklearn_above
+
+    @classmethod
+    def from_sklearn(cls, model: Any, sklearn_above: int = SKLEARN_ABOVE) -> "FlatForest":
+        feats, thrs, lefts, rights, values, roots = [], [], [], [], [], []
+        base, max_depth = 0, 0
+        for est, cols in zip(model.estimators_, model.estimators_features_):
+            t = est.tree_
+            n = t.node_count
+            is_leaf = t.children_left == -1
+            node_depth = np.zeros(n, dtype=np.int64)
+            for i in range(n):  # nodes are stored parents-first
+                if not is_leaf[i]:
+                    node_depth[t.children_left[i]] = node_depth[t.children_right[i]] = node_depth[i] + 1
+            own = np.arange(n)
+            feats.append(np.where(is_leaf, 0, np.asarray(cols)[np.maximum(t.feature, 0)]))
+            thrs.append(np.where(is_leaf, np.inf, t.threshold))
+            lefts.append(np.where(is_leaf, own, t.children_left) + base)
+            rights.append(np.where(is_leaf, own, t.children_right) + base)
+            values.append(np.where(is_leaf, node_depth + _average_path_length(t.n_node_samples), 0.0))
+            roots.append(base)
+            max_depth = max(max_depth, int(node_depth.max()))
+            base += n
+        denominator = len(model.estimators_) * float(_average_path_length(np.array([model._max_samples]))[0])
+        children = np.empty(2 * base, dtype=np.int32)
+        children[0::2] = np.concatenate(lefts)
+        children[1::2] = np.concatenate(rights)
+        return cls(
+            np.concatenate(feats).astype(np.int32), np.concatenate(thrs), children, np.concatenate(values),
+            np.asarray(roots, dtype=np.int32), max_depth, denominator, float(model.offset_),
+            int(model.n_features_in_), model, sklearn_above,
+        )
+
+    def path_lengths(self, X: np.ndarray) -> np.ndarray:
+        """Sum over trees of (leaf depth + c(leaf size)) for each row."""
+        # sklearn validates X to float32 before comparing against float64 thresholds
+        X = np.ascontiguousarray(np.atleast_2d(X), dtype=np.float32)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, forest expects {self.n_features}")
+        out = np.empty(len(X))
+        for lo in range(0, len(X), _BLOCK_ROWS):
+            out[lo:lo + _BLOCK_ROWS] = self._block(X[lo:lo + _BLOCK_ROWS])
+        return out
+
+    def _block(self, X: np.ndarray, attribute: bool = False) -> Any:
+        n, d = X.shape
+        nodes = np.broadcast_to(self.roots, (n, len(self.roots))).copy()
+        rows = (np.arange(n, dtype=np.int32) * d)[:, None]
+        flat = X.ravel()
+        contrib = np.zeros(n * d) if attribute else None
+        for level in range(self.depth):
+            feat = self.feature[nodes]
+            thr = self.threshold[nodes]
+            if attribute:  # leaves carry an infinite threshold and take no credit
+                contrib += np.bincount((rows + feat).ravel(), weights=np.isfinite(thr).ravel() / (level + 1.0),
+                                       minlength=n * d)
+            go_right = flat[rows + feat] > thr
+            nodes = self.children[2 * nodes + go_right]
+        depths = self.leaf_value[nodes].sum(axis=1)
+        return (depths, contrib.reshape(n, d)) if attribute else depths
+
+    def explain(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """decision_function plus a (rows, features) attribution from the same traversal.
+
+        Each split a row passes through credits its feature with 1 / (level + 1), so
+        features that isolate the row near the root weigh most; rows are normalised
+        to sum to 1. Always traverses the flat arrays (no sklearn hand-off)."""
+        X = np.ascontiguousarray(np.atleast_2d(X), dtype=np.float32)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, forest expects {self.n_features}")
+        depths = np.empty(len(X))
+        contrib = np.empty((len(X), self.n_features))
+        for lo in range(0, len(X), _BLOCK_ROWS):
+            depths[lo:lo + _BLOCK_ROWS], contrib[lo:lo + _BLOCK_ROWS] = self._block(X[lo:lo + _BLOCK_ROWS], attribute=True)
+        total = contrib.sum(axis=1, keepdims=True)
+        contrib = np.divide(contrib, total, out=np.zeros_like(contrib), where=total > 0)
+        return self._to_scores(depths) - self.offset, contrib
+
+    def _delegate(self, X: np.ndarray) -> bool:
+        return self.model is not None and len(X) > self.sklearn_above
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        X = np.atleast_2d(X)
+        if self._delegate(X):
+            return self.model.score_samples(X)
+        return self._to_scores(self.path_lengths(X))
+
+    def _to_scores(self, depths: np.ndarray) -> np.ndarray:
+        if self.denominator == 0:
+            return -np.ones_like(depths)
+        return -(2.0 ** (-depths / self.denominator))
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        X = np.atleast_2d(X)
+        if self._delegate(X):
+            return self.model.decision_function(X)
+        return self.score_samples(X) - self.offset
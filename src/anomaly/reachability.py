@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import breadth_first_order, connected_components
+
+
+class ReachabilityIndex:
+    """
+    Exact reachability queries on a directed graph with near-O(1) typical cost.
+
+    Strongly connected components are collapsed (scipy), so "u reaches v" within a
+    component is a label comparison. On the condensation DAG every component gets
+    `k` GRAIL interval labels [low, post] from randomised DFS post-orders: if u
+    reaches v then v's interval nests in u's for every labelling, so any
+    non-nesting label proves unreachability. Intervals cannot prove reachability, so
+    `landmarks` high-degree components also store who reaches them and whom they
+    reach (one C-level BFS each): l reached from u and reaching v proves u -> v, and
+    either set separating u from v disproves it. Only pairs left undecided fall back
+    to a DFS on the condensation, pruned by the interval test.
+
+    Nodes are dense ints 0..n-1; see `GraphDetector` for the id mapping.
+    """
+    def __init__(self, n: int, src: np.ndarray, dst: np.ndarray, k: int = 3, landmarks: int = 16, seed: int = 0) -> None:
+        self.n = n
+        adj = csr_matrix((np.ones(len(src), dtype=np.int8), (src, dst)), shape=(n, n))
+        self.n_components, self.component = connected_components(adj, directed=True, connection="strong")
+        cs, cd = self.component[src], self.component[dst]
+        keep = cs != cd
+        dag = csr_matrix((np.ones(int(keep.sum()), dtype=np.int8), (cs[keep], cd[keep])),
+                         shape=(self.n_components, self.n_components))
+        dag.sum_duplicates()
+        self._indptr, self._indices = dag.indptr, dag.indices
+        rng = np.random.default_rng(seed)
+        labels = [self._label(rng) for _ in range(k)]
+        self.low = np.stack([lo for lo, _ in labels])    # (k, components)
+        self.post = np.stack([po for _, po in labels])
+        self._landmarks(dag, landmarks)
+        self.fallback_searches = 0
+
+    def _landmarks(self, dag: csr_matrix, count: int) -> None:
+        nc = self.n_components
+        size = np.bincount(self.component, minlength=nc)
+        deg_out = np.diff(dag.indptr)
+        deg_in = np.bincount(dag.indices, minlength=nc)
+        score = (deg_in + size) * (deg_out + size)
+        picks = np.argsort(-score)[:min(count, nc)]
+        rev = dag.T.tocsr()
+        self.to_lm = np.zeros((len(picks), nc), dtype=bool)    # component reaches landmark
+        self.from_lm = np.zeros((len(picks), nc), dtype=bool)  # landmark reaches component
+        for j, lm in enumerate(picks):
+            self.from_lm[j, breadth_first_order(dag, int(lm), directed=True, return_predecessors=False)] = True
+            self.to_lm[j, breadth_first_order(rev, int(lm), directed=True, return_predecessors=False)] = True
+
+    def _label(self, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        n, indptr, indices = self.n_components, self._indptr, self._indices
+        post = np.full(n, -1, dtype=np.int64)
+        low = np.zeros(n, dtype=np.int64)
+        rot = rng.integers(0, 1 << 30, n)  # per-node rotation of the child order
+        counter = 0
+        for root in rng.permutation(n):
+            if post[root] >= 0:
+                continue
+            post[root] = -2  # on stack
+            stack: List[List[int]] = [[int(root), 0]]
+            lows: List[int] = [1 << 62]
+            while stack:
+                frame = stack[-1]
+                v, i = frame
+                deg = indptr[v + 1] - indptr[v]
+                if i < deg:
+                    frame[1] += 1
+                    c = int(indices[indptr[v] + (i + rot[v]) % deg])
+                    if post[c] == -1:
+                        post[c] = -2
+                        stack.append([c, 0])
+                        lows.append(1 << 62)
+                    else:  # finished child (a DAG has no back edges)
+                        lows[-1] = min(lows[-1], low[c])
+                    continue
+                stack.pop()
+                post[v] = counter
+                low[v] = min(lows.pop(), counter)
+                counter += 1
+                if lows:
+                    lows[-1] = min(lows[-1], low[v])
+        return low, post
+
+    def _may_reach(self, cu: np.ndarray, cv: np.ndarray) -> np.ndarray:
+        return ((self.low[:, cv] >= self.low[:, cu]) & (self.post[:, cv] <= self.post[:, cu])).all(axis=0)
+
+    def _search(self, cu: int, cv: int) -> bool:
+        self.fallback_searches += 1
+        seen = {cu}
+        stack = [cu]
+        lo, po = self.low[:, cv:cv + 1], self.post[:, cv:cv + 1]
+        while stack:
+            v = stack.pop()
+            ch = self._indices[self._indptr[v]:self._indptr[v + 1]]
+            if not len(ch):
+                continue
+            if (ch == cv).any():
+                return True
+            # only descend into components whose intervals can still contain the target
+            ok = ch[((self.low[:, ch] <= lo) & (self.post[:, ch] >= po)).all(axis=0)]
+            for c in ok.tolist():
+                if c not in seen:
+                    seen.add(c)
+                    stack.append(c)
+        return False
+
+    def reaches(self, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+        """Vectorised "is there a path u -> v" for node index arrays (-1 = unknown node, False)."""
+        u, v = np.asarray(u, dtype=np.int64), np.asarray(v, dtype=np.int64)
+        out = np.zeros(len(u), dtype=bool)
+        known = (u >= 0) & (v >= 0)
+        cu, cv = self.component[u[known]], self.component[v[known]]
+        res = (cu == cv) | (self.to_lm[:, cu] & self.from_lm[:, cv]).any(axis=0)
+        # v reaches l but u does not, or l reaches u but not v: no u -> v path
+        cut = ((self.to_lm[:, cv] & ~self.to_lm[:, cu]) | (self.from_lm[:, cu] & ~self.from_lm[:, cv])).any(axis=0)
+        maybe = ~res & ~cut & self._may_reach(cu, cv)
+        for j in np.flatnonzero(maybe):
+            res[j] = self._search(int(cu[j]), int(cv[j]))
+        out[known] = res
+        return out
+
+    def reachable(self, u: int, v: int) -> bool:
+        return bool(self.reaches(np.array([u]), np.array([v]))[0])
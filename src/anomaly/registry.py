@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from joblib import load
+from loguru import logger
+
+from anomaly.detector import AnomalyDetector
+from common.config import get_settings
+
+
+@dataclass(frozen=True)
+class ModelSnapshot:
+    version: str  # content hash of the joblib file
+    detector: AnomalyDetector
+    loaded_at: float
+
+
+def file_version(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:12]
+
+
+class ModelRegistry:
+    """
+    Keeps the IsolationForest in memory as an immutable snapshot, like RuleRegistry
+    does for rules: the model is unpickled once, warmed with one prediction, and a
+    new version (file mtime/size changed *and* content hash differs) is loaded off
+    the request path and published with a single reference assignment.
+
+    Publish models with `AnomalyDetector.fit`, which replaces the file atomically,
+    so the watcher never reads a half-written forest. `bootstrap` runs at startup so a
+    fresh deployment has a model before it takes traffic.
+    """
+    def __init__(self, path: Optional[Path] = None, poll_interval: float = 5.0) -> None:
+        self.path = Path(path) if path is not None else AnomalyDetector().path
+        self.poll_interval = poll_interval
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._snapshot: Optional[ModelSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if self.path.exists():
+            self.reload()
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _build(self) -> ModelSnapshot:
+        version = file_version(self.path)
+        if self._snapshot is not None and version == self._snapshot.version:
+            return self._snapshot  # touched, not changed
+        det = AnomalyDetector(model=load(self.path))
+        det.score_many(np.zeros((1, det.model.n_features_in_)))  # warm before it takes traffic
+        return ModelSnapshot(version=version, detector=det, loaded_at=time.time())
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    def current(self) -> Optional[ModelSnapshot]:
+        return self._snapshot
+
+    def reload(self, force: bool = False) -> Optional[ModelSnapshot]:
+        """Load the model file if it changed (or when forced); a failed load keeps the old snapshot and raises."""
+        with self._reload_lock:
+            return self._reload(force)
+
+    def _reload(self, force: bool) -> Optional[ModelSnapshot]:
+        stamp = self._file_stamp()
+        if stamp is None or (not force and stamp == self._stamp):
+            return self._snapshot
+        snap = self._build()
+        self._stamp = stamp
+        if snap is not self._snapshot:
+            old = self._snapshot.version if self._snapshot else None
+            logger.info(f"Anomaly model loaded: {old} -> {snap.version}")
+            self._snapshot = snap
+        return snap
+
+    def _fit(self, X: np.ndarray, reason: str) -> ModelSnapshot:
+        # caller holds _reload_lock
+        det = AnomalyDetector()
+        det.path = self.path
+        det.fit(X)
+        self._stamp = self._file_stamp()
+        self._snapshot = ModelSnapshot(file_version(self.path), det, time.time())
+        logger.info(f"Anomaly model fitted {reason}: {self._snapshot.version}")
+        return self._snapshot
+
+    def bootstrap(self, training_data: Callable[[], np.ndarray]) -> Optional[ModelSnapshot]:
+        """Load the published model or, if there is none, fit and publish one from
+        `training_data()`. With no data the registry stays empty and the first scored
+        request fits the model (see `detector_for`)."""
+        with self._reload_lock:
+            if self._snapshot is None and self._reload(force=True) is None:
+                X = training_data()
+                if len(X):
+                    self._fit(X, f"at startup on {len(X)} rows")
+                else:
+                    logger.warning(f"No anomaly model at {self.path} and no rows to fit one; fitting on first request")
+            return self._snapshot
+
+    def detector_for(self, X: np.ndarray) -> AnomalyDetector:
+        """Current detector; fits and publishes a first model from X if none exists yet."""
+        snap = self._snapshot
+        if snap is not None:
+            return snap.detector
+        with self._reload_lock:
+            if self._snapshot is None and self._reload(force=True) is None:
+                self._fit(X, "on first request")
+            return self._snapshot.detector
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception:
+                cur = self._snapshot.version if self._snapshot else None
+                logger.exception(f"Model reload from {self.path} failed; keeping version {cur}")
+
+    def start(self) -> None:
+        if self.poll_interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+@lru_cache
+def get_model_registry() -> ModelRegistry:
+    reg = ModelRegistry(poll_interval=get_settings().MODEL_POLL_INTERVAL_S)
+    reg.start()
+    return reg
@@ -0,0 +1,121 @@
+"""
+Analyst alert queue over the partitioned `alerts` table (migrations 0003/0004).
+
+Pages are fetched by keyset on (priority DESC, created_at DESC, alert_id DESC), which
+walks `ix_alerts_new_priority_desc` (on exactly those columns since migration 0008) from
+the cursor position, so page N costs the same as page 1. Tag filters use jsonb containment (`tags @> ...`, backed by `ix_alerts_tags_gin`).
+"""
+from __future__ import annotations
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import base64
+import json
+from db.session import SessionLocal
+
+router = APIRouter(prefix="/alerts", tags=["alerts"])
+
+_COLS = ("alert_id, tx_id, src_account, dst_account, amount, currency, risk_score, model_score, "
+         "rule_score, priority, tags, explanation, status, created_at, assigned_to")
+_A_COLS = ", ".join(f"a.{c.strip()}" for c in _COLS.split(","))
+_ORDER = "ORDER BY priority DESC, created_at DESC, alert_id DESC"
+
+def get_db():
+    db = SessionLocal()
+    try: yield db
+    finally: db.close()
+
+class AlertOut(BaseModel):
+    alert_id: str
+    tx_id: str
+    src_account: str
+    dst_account: str
+    amount: float
+    currency: str
+    risk_score: float
+    model_score: float
+    rule_score: float
+    priority: int
+    tags: List[Any]
+    explanation: Dict[str, Any]
+    status: str
+    created_at: datetime
+    assigned_to: Optional[str] = None
+
+class AlertPage(BaseModel):
+    items: List[AlertOut]
+    next_cursor: Optional[str] = None
+
+class ClaimIn(BaseModel):
+    analyst: str = Field(min_length=1, max_length=128)
+    n: int = Field(10, ge=1, le=500)
+    tags: List[str] = []
+
+def encode_cursor(priority: int, created_at: datetime, alert_id: str) -> str:
+    raw = json.dumps([priority, created_at.isoformat(), str(alert_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[int, datetime, str]:
+    try:
+        p, c, a = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(p), datetime.fromisoformat(c), str(a)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _filters(tags: List[str], params: Dict[str, Any]) -> str:
+    where = "status = 'new'"  # must match the partial index predicate verbatim
+    if tags:
+        where += " AND tags @> CAST(:tags AS jsonb)"
+        params["tags"] = json.dumps(tags)
+    return where
+
+def _out(row: Any) -> AlertOut:
+    r = dict(row)
+    for k in ("alert_id", "status"):
+        r[k] = str(r[k])
+    return AlertOut(**r)
+
+@router.get("/queue", response_model=AlertPage)
+def alert_queue(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    tag: List[str] = Query([]),
+    db: Session = Depends(get_db),
+):
+    params: Dict[str, Any] = {"limit": limit + 1}
+    where = _filters(tag, params)
+    if cursor:
+        params["p"], params["c"], params["a"] = decode_cursor(cursor)
+        where += " AND (priority, created_at, alert_id) < (:p, :c, CAST(:a AS uuid))"
+    rows = db.execute(text(f"SELECT {_COLS} FROM alerts WHERE {where} {_ORDER} LIMIT :limit"), params).mappings().all()
+    items = [_out(r) for r in rows[:limit]]
+    nxt = None
+    if len(rows) > limit:
+        last = items[-1]
+        nxt = encode_cursor(last.priority, last.created_at, last.alert_id)
+    return AlertPage(items=items, next_cursor=nxt)
+
+@router.post("/claim", response_model=List[AlertOut])
+def claim_alerts(req: ClaimIn, db: Session = Depends(get_db)):
+    """Atomically assign the next `n` new alerts to an analyst; concurrent claimers
+    skip each other's locked rows instead of blocking or double-assigning."""
+    params: Dict[str, Any] = {"n": req.n, "who": req.analyst}
+    where = _filters(req.tags, params)
+    rows = db.execute(text(f"""
+        WITH c AS (
+            SELECT alert_id, created_at FROM alerts
+            WHERE {where} {_ORDER}
+            LIMIT :n
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE alerts a SET status = 'in_review', assigned_to = :who
+        FROM c WHERE a.alert_id = c.alert_id AND a.created_at = c.created_at
+        RETURNING {_A_COLS}
+    """), params).mappings().all()
+    db.commit()
+    items = [_out(r) for r in rows]
+    items.sort(key=lambda a: (a.priority, a.created_at, a.alert_id), reverse=True)  # RETURNING is unordered
+    return items
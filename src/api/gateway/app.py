@@ -5,9 +5,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from starlette.responses import JSONResponse
 from loguru import logger
 
-from api.transactions.main import router as tx_router
+from api.transactions.main import router as tx_router, shutdown as tx_shutdown
 from api.rules_engine.main import router as rules_router
+from api.alerts.main import router as alerts_router
+from anomaly.registry import get_model_registry
 from common.config import get_settings
+from data.etl import anomaly_training_matrix
 
 settings = get_settings()
 app = FastAPI(title=settings.APP_NAME, version="0.1.0")
@@ -39,6 +42,19 @@ async def unhandled_exc_handler(request: Request, exc: Exception):
 # Routers
 app.include_router(tx_router)
 app.include_router(rules_router)
+app.include_router(alerts_router)
+
+@app.on_event("startup")
+def _bootstrap_model():
+    # load (or fit from recent transactions) before the worker takes traffic
+    try:
+        get_model_registry().bootstrap(lambda: anomaly_training_matrix(settings.MODEL_BOOTSTRAP_ROWS))
+    except Exception:
+        logger.exception("Anomaly model bootstrap failed; the first scored request will fit one")
+
+@app.on_event("shutdown")
+def _flush_on_shutdown():
+    tx_shutdown()
 
 # Health & readiness
 @app.get("/health")
@@ -47,5 +63,7 @@ def health():
 
 @app.get("/ready")
 def ready():
-    # optionally check DB connectivity, model file existence, etc.
-    return {"ready": True}
+    # startup has already loaded (or fitted) the model when there was one to load; an empty
+    # deployment is still ready and fits on its first scored request
+    snap = get_model_registry().current()
+    return {"ready": True, "model_loaded": snap is not None, "model_version": snap.version if snap else None}
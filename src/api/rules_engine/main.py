@@ -5,8 +5,10 @@ from typing import List
 from sqlalchemy.orm import Session
 from db.session import SessionLocal
 from db.models import RuleDef
-from rules_engine.engine import RuleEngine
+from rules_engine.registry import get_rule_registry
+from rules_engine.stats import rule_stats
 from common.config import get_settings
+import os
 import yaml
 from pathlib import Path
 
@@ -46,5 +48,26 @@ def export_yaml(db: Session = Depends(get_db)):
 
 @router.post("/reload")
 def reload_rules():
-    RuleEngine.from_yaml(settings.RULES_PATH)  # this will validate; you can hot-swap in a DI container
+    registry = get_rule_registry()
+    try:
+        snap = registry.reload(force=True)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Invalid rules file: {e}")
+    # bump mtime so the watchers in the other workers pick the change up too
+    os.utime(settings.RULES_PATH)
+    return {"ok": True, "version": snap.version, "rules": len(snap.engine.rules)}
+
+@router.get("/version")
+def rules_version():
+    snap = get_rule_registry().current()
+    return {"version": snap.version, "rules": [r.name for r in snap.engine.rules]}
+
+
+@router.get("/stats")
+def rules_stats():
+    return {"enabled": rule_stats.enabled, "rules": rule_stats.snapshot()}
+
+@router.post("/stats/reset")
+def reset_rules_stats():
+    rule_stats.reset()
     return {"ok": True}
@@ -1,19 +1,52 @@
 from __future__ import annotations
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, field_validator
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
-from db.session import SessionLocal
-from db.models import Transaction, Account, Alert
-from rules_engine.engine import RuleEngine, fetch_account_history
-from data.etl import to_frame, latest_feature_row
-from anomaly.detector import AnomalyDetector
+from typing import Dict, List
+import numpy as np
+from db.session import SessionLocal, AsyncSessionLocal
+from db.models import Transaction, Alert
+from db.accounts import account_resolver
+from db.write_behind import WriteBehindFull, WriteBehindWriter, pg_id_allocator
+from rules_engine.engine import TxBatch
+from rules_engine.registry import get_rule_registry
+from features.history import AccountHistory, AccountHistoryStore
+from data.etl import history_features, to_frame, latest_feature_row
+from anomaly.registry import get_model_registry
 from common.config import get_settings
+from common.batcher import MicroBatcher
+from common.executor import BoundedExecutor
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 settings = get_settings()
-_engine = RuleEngine.from_yaml(settings.RULES_PATH)
-_detector = AnomalyDetector()
+_rules = get_rule_registry()
+_models = get_model_registry()
+_history = AccountHistoryStore(
+    per_account=settings.HISTORY_CACHE_PER_ACCOUNT,
+    max_rows=settings.HISTORY_CACHE_MAX_ROWS,
+    ttl_seconds=settings.HISTORY_CACHE_TTL_S,
+)
+# single-row anomaly scores from concurrent requests share one decision_function call
+_anomaly_batcher = MicroBatcher(
+    lambda X: _models.detector_for(X).score_many(X),
+    max_batch=settings.ANOMALY_BATCH_MAX_SIZE,
+    max_wait_ms=settings.ANOMALY_BATCH_MAX_WAIT_MS,
+    name="anomaly-batcher",
+)
+_scoring = BoundedExecutor(max_workers=settings.SCORING_THREADS, max_pending=settings.SCORING_MAX_PENDING)
+_writer = None if settings.WRITE_BEHIND_MODE == "off" else WriteBehindWriter(
+    SessionLocal,
+    pg_id_allocator(SessionLocal),
+    max_rows=settings.WRITE_BEHIND_MAX_ROWS,
+    max_delay_ms=settings.WRITE_BEHIND_MAX_DELAY_MS,
+    capacity=settings.WRITE_BEHIND_CAPACITY,
+    put_timeout=settings.WRITE_BEHIND_PUT_TIMEOUT_S,
+    wal_dir=settings.WRITE_BEHIND_WAL_DIR if settings.WRITE_BEHIND_MODE == "wal" else None,
+    wal_fsync=settings.WRITE_BEHIND_WAL_FSYNC,
+)
 
 class TxIn(BaseModel):
     account_external_id: str
@@ -42,50 +75,246 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+@router.get("/stats")
+def transactions_stats():
+    return {
+        "account_cache": account_resolver.stats(),
+        "history_cache": {"accounts": len(_history)},
+        "write_behind": _writer.stats() if _writer else None,
+        "anomaly_batcher": _anomaly_batcher.stats(),
+    }
+
+def shutdown() -> None:
+    """Flush write-behind rows and stop the scoring pool; called on app shutdown."""
+    if _writer is not None:
+        _writer.close()
+    _scoring.shutdown(wait=False)
+    _anomaly_batcher.close()
+
+def _anomaly_features(history, tx: dict) -> np.ndarray:
+    df = to_frame([*history, tx])
+    if not _models.ready:
+        _models.detector_for(df.to_numpy())  # initial fit if needed
+    return latest_feature_row(df)
+
+def _anomaly_score(history, tx: dict) -> float:
+    return _anomaly_batcher.score(_anomaly_features(history, tx))
+
 @router.post("/ingest-and-score", response_model=ScoreOut)
 def ingest_and_score(tx: TxIn, db: Session = Depends(get_db)) -> ScoreOut:
-    # Ensure account
-    acct = db.query(Account).filter_by(external_id=tx.account_external_id).first()
-    if not acct:
-        acct = Account(external_id=tx.account_external_id, country=tx.country)
-        db.add(acct); db.flush()
+    # Ensure account (cached; misses go through a single-statement upsert)
+    acct_id = account_resolver.resolve(db, tx.account_external_id, tx.country)
 
-    # Persist transaction
-    rec = Transaction(
-        account_id=acct.id, amount=tx.amount, currency=tx.currency,
-        country=tx.country, timestamp=tx.timestamp, metadata=tx.metadata
-    )
-    db.add(rec); db.flush()
+    # Persist transaction (or just reserve its id when writing behind)
+    tx_row = dict(account_id=acct_id, amount=tx.amount, currency=tx.currency,
+                  country=tx.country, timestamp=tx.timestamp, metadata=tx.metadata)
+    if _writer is None:
+        rec = Transaction(**tx_row)
+        db.add(rec); db.flush()
+        tx_id = rec.id
+    else:
+        tx_id = _writer.next_id()
+        _history.get(db, acct_id, hours=72)  # warm first: this row is not in the DB yet
 
-    # History for rules
-    history = fetch_account_history(db, acct.id, hours=72)
+    # History for rules (in-process ring buffer, warmed from the DB on first access)
+    _history.append(acct_id, tx.timestamp, tx.amount, tx.country)
+    history = _history.get(db, acct_id, hours=72)
 
-    # Rules
-    rule_score, outcomes = _engine.evaluate(
+    # Rules (one snapshot for the whole request, even if a reload lands meanwhile)
+    rules = _rules.current()
+    rule_score, outcomes = rules.engine.evaluate(
         tx={"amount": tx.amount, "country": tx.country, "timestamp": tx.timestamp}, history=history
     )
 
     # Anomaly features
-    df = to_frame([*history, {"amount": tx.amount, "country": tx.country, "timestamp": tx.timestamp}])
-    x = latest_feature_row(df)
-    _detector.load_or_fit(df.to_numpy())  # initial fit if needed
-    anomaly_score = float(_detector.score_one(x))
+    anomaly_score = _anomaly_score(history, {"amount": tx.amount, "country": tx.country, "timestamp": tx.timestamp})
 
     final = settings.RULES_WEIGHT * rule_score + settings.ANOMALY_WEIGHT * anomaly_score
     suspicious = final >= settings.ALERT_THRESHOLD
 
     explanation = {
         "rules": [o.__dict__ for o in outcomes],
+        "rules_version": rules.version,
         "weights": {"rules": settings.RULES_WEIGHT, "anomaly": settings.ANOMALY_WEIGHT},
     }
 
-    if suspicious:
-        alert = Alert(transaction_id=rec.id, final_score=final, rule_score=rule_score,
-                      anomaly_score=anomaly_score, explanation=explanation)
-        db.add(alert)
+    alert_row = dict(transaction_id=tx_id, final_score=final, rule_score=rule_score,
+                     anomaly_score=anomaly_score, explanation=explanation,
+                     created_at=datetime.utcnow()) if suspicious else None
 
-    db.commit()
+    try:
+        if _writer is None:
+            if alert_row:
+                db.add(Alert(**alert_row))
+            db.commit()
+        else:
+            db.commit()  # only a newly created account, if any
+            _writer.submit(dict(tx_row, id=tx_id), alert_row)
+    except WriteBehindFull:
+        _history.invalidate(acct_id)
+        raise HTTPException(status_code=503, detail="Ingest backlog full, retry later")
+    except Exception:
+        _history.invalidate(acct_id)  # drop the row we appended optimistically
+        raise
+    return ScoreOut(
+        transaction_id=tx_id, final_score=final, rule_score=rule_score,
+        anomaly_score=anomaly_score, suspicious=suspicious, explanation=explanation
+    )
+
+@router.post("/ingest-and-score-async", response_model=ScoreOut)
+async def ingest_and_score_async(tx: TxIn, db: AsyncSession = Depends(get_async_db)) -> ScoreOut:
+    """Same contract as ingest_and_score; DB I/O is awaited and model scoring runs on _scoring."""
+    acct_id = await account_resolver.aresolve(db, tx.account_external_id, tx.country)
+
+    rec = Transaction(
+        account_id=acct_id, amount=tx.amount, currency=tx.currency,
+        country=tx.country, timestamp=tx.timestamp, metadata=tx.metadata
+    )
+    db.add(rec); await db.flush()
+
+    _history.append(acct_id, tx.timestamp, tx.amount, tx.country)
+    history = await _history.aget(db, acct_id, hours=72)
+
+    rules = _rules.current()
+    tx_dict = {"amount": tx.amount, "country": tx.country, "timestamp": tx.timestamp}
+    rule_score, outcomes = rules.engine.evaluate(tx=tx_dict, history=history)
+    x = await _scoring.run(_anomaly_features, history, tx_dict)
+    anomaly_score = await _anomaly_batcher.ascore(x)
+
+    final = settings.RULES_WEIGHT * rule_score + settings.ANOMALY_WEIGHT * anomaly_score
+    suspicious = final >= settings.ALERT_THRESHOLD
+    explanation = {
+        "rules": [o.__dict__ for o in outcomes],
+        "rules_version": rules.version,
+        "weights": {"rules": settings.RULES_WEIGHT, "anomaly": settings.ANOMALY_WEIGHT},
+    }
+    if suspicious:
+        db.add(Alert(transaction_id=rec.id, final_score=final, rule_score=rule_score,
+                     anomaly_score=anomaly_score, explanation=explanation))
+    try:
+        await db.commit()
+    except Exception:
+        _history.invalidate(acct_id)
+        raise
     return ScoreOut(
         transaction_id=rec.id, final_score=final, rule_score=rule_score,
         anomaly_score=anomaly_score, suspicious=suspicious, explanation=explanation
     )
+
+def _batch_columns(pre: Dict[int, AccountHistory], owners: List[int], txs: List[TxIn]) -> TxBatch:
+    """
+    TxBatch for an ingest batch. Item i's history is its account's pre-batch rows, the
+    earlier items of the same account and item i itself, as if ingested one by one.
+    Each account's rows are laid out once (pre-batch rows, then its items in order) and
+    the per-item histories are gathered from that with index arithmetic.
+    """
+    n = len(txs)
+    ts = np.array([t.timestamp.timestamp() for t in txs], dtype=np.float64)
+    amount = np.array([t.amount for t in txs], dtype=np.float64)
+    country = np.array([t.country.upper()[:2] for t in txs], dtype="U2")
+
+    accounts = list(dict.fromkeys(owners))
+    slot = {a: k for k, a in enumerate(accounts)}
+    acct = np.array([slot[a] for a in owners], dtype=np.int64)
+    n_pre = np.array([len(pre[a]) for a in accounts], dtype=np.int64)
+    n_items = np.bincount(acct, minlength=len(accounts))
+    block = np.concatenate([[0], np.cumsum(n_pre + n_items)])
+    order = np.argsort(acct, kind="stable")
+    rank = np.empty(n, dtype=np.int64)  # position of each item among its account's items
+    rank[order] = np.arange(n) - np.repeat(np.cumsum(n_items) - n_items, n_items)
+
+    all_ts = np.empty(block[-1], dtype=np.float64)
+    all_amount = np.empty(block[-1], dtype=np.float64)
+    all_country = np.empty(block[-1], dtype="U2")
+    for k, a in enumerate(accounts):
+        h, lo = pre[a], block[k]
+        all_ts[lo:lo + len(h)] = h.timestamps
+        all_amount[lo:lo + len(h)] = h.amounts
+        all_country[lo:lo + len(h)] = h.countries.astype("U2")
+    start = block[acct]
+    own = start + n_pre[acct] + rank
+    all_ts[own], all_amount[own], all_country[own] = ts, amount, country
+
+    sizes = own + 1 - start
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    idx = np.arange(offsets[-1]) - np.repeat(offsets[:-1] - start, sizes)
+    return TxBatch(
+        amount=amount, country=country, timestamp=ts, offsets=offsets,
+        hist_amount=all_amount[idx], hist_country=all_country[idx], hist_timestamp=all_ts[idx],
+    )
+
+@router.post("/ingest-and-score-batch", response_model=List[ScoreOut])
+def ingest_and_score_batch(txs: List[TxIn], db: Session = Depends(get_db)) -> List[ScoreOut]:
+    """
+    Set-based variant of ingest_and_score for upstream batches: one account resolve,
+    one multi-row insert each for transactions and alerts, one history query for the
+    cold accounts, batched rules/anomaly scoring and a single commit. Item i is scored
+    as if items 0..i had been ingested one by one; results keep the input order.
+    Batches over INGEST_BATCH_MAX_SIZE items are rejected with 413.
+    """
+    if not txs:
+        return []
+    if len(txs) > settings.INGEST_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {settings.INGEST_BATCH_MAX_SIZE} transactions")
+    wanted: Dict[str, str] = {}
+    for t in txs:
+        wanted.setdefault(t.account_external_id, t.country)
+    acct_ids = account_resolver.resolve_many(db, wanted)
+    owners = [acct_ids[t.account_external_id] for t in txs]
+
+    # Pre-batch histories, before this batch's rows exist in the DB
+    pre = _history.get_many(db, owners, hours=72)
+
+    tx_ids = db.execute(
+        insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True),
+        [dict(account_id=a, amount=t.amount, currency=t.currency, country=t.country,
+              timestamp=t.timestamp, metadata=t.metadata) for a, t in zip(owners, txs)],
+    ).scalars().all()
+
+    # Per-item history = pre-batch history + earlier items of the same account (and itself)
+    batch = _batch_columns(pre, owners, txs)
+
+    # Rules (one snapshot for the whole batch)
+    rules = _rules.current()
+    rule_res = rules.engine.evaluate_batch(batch)
+
+    # Anomaly: features from the same history columns, one decision_function call
+    X = history_features(batch.hist_timestamp, batch.hist_amount, batch.hist_country, batch.offsets)
+    anomaly_scores = _models.detector_for(X).score_many(X)  # initial fit if needed
+
+    weights = {"rules": settings.RULES_WEIGHT, "anomaly": settings.ANOMALY_WEIGHT}
+    results: List[ScoreOut] = []
+    alerts = []
+    for i, tx_id in enumerate(tx_ids):
+        rule_score, anomaly_score = float(rule_res.total[i]), float(anomaly_scores[i])
+        final = settings.RULES_WEIGHT * rule_score + settings.ANOMALY_WEIGHT * anomaly_score
+        suspicious = final >= settings.ALERT_THRESHOLD
+        explanation = {
+            "rules": [o.__dict__ for o in rule_res.outcomes[i]],
+            "rules_version": rules.version,
+            "weights": weights,
+        }
+        if suspicious:
+            alerts.append(dict(transaction_id=tx_id, final_score=final, rule_score=rule_score,
+                               anomaly_score=anomaly_score, explanation=explanation,
+                               created_at=datetime.utcnow()))
+        results.append(ScoreOut(
+            transaction_id=tx_id, final_score=final, rule_score=rule_score,
+            anomaly_score=anomaly_score, suspicious=suspicious, explanation=explanation
+        ))
+    if alerts:
+        db.execute(insert(Alert), alerts)
+
+    for a, t in zip(owners, txs):
+        _history.append(a, t.timestamp, t.amount, t.country)
+    try:
+        db.commit()
+    except Exception:
+        for a in set(owners):
+            _history.invalidate(a)
+        raise
+    return results
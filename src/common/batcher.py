@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# queue wait histogram: bucket b counts waits with us.bit_length() == b
+_NBUCKETS = 24
+_STOP = object()
+
+
+def _percentile(hist: List[int], q: float) -> Optional[int]:
+    """Upper bound (in us) of the log2 bucket holding the q-th percentile."""
+    total = sum(hist)
+    if not total:
+        return None
+    acc = 0
+    for b, n in enumerate(hist):
+        acc += n
+        if acc >= q * total:
+            return (1 << b) - 1 if b else 0
+    return None
+
+
+def _cap(v: Optional[int], hi: int) -> Optional[int]:
+    return None if v is None else min(v, hi)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row scoring calls into one vectorised call.
+
+    Callers submit a feature row and block (`score`) or await (`ascore`) its result.
+    A worker thread takes the first queued row, keeps collecting until `max_batch`
+    rows are queued or `max_wait_ms` has passed since that first row, then calls
+    `fn(X)` once with the stacked rows. Under light load a row waits at most
+    `max_wait_ms`; under heavy load batches fill up before the deadline.
+
+    `fn` maps an (n, d) array to n scores, e.g. `AnomalyDetector.score_many` or
+    `AutoencoderDetector.score`. Pass a function that resolves the current model
+    (e.g. from ModelRegistry) so a model swap applies from the next batch on.
+    """
+    def __init__(
+        self,
+        fn: Callable[[np.ndarray], np.ndarray],
+        max_batch: int = 64,
+        max_wait_ms: float = 2.0,
+        workers: int = 1,
+        name: str = "batcher",
+    ) -> None:
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._q: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._errors = 0
+        self._sizes = [0] * (max_batch + 1)
+        self._wait_hist = [0] * _NBUCKETS
+        self._max_wait_us = 0
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True) for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, x: np.ndarray) -> "Future[float]":
+        fut: "Future[float]" = Future()
+        self._q.put((x, fut, time.perf_counter()))
+        return fut
+
+    def score(self, x: np.ndarray) -> float:
+        return self.submit(x).result()
+
+    async def ascore(self, x: np.ndarray) -> float:
+        return await asyncio.wrap_future(self.submit(x))
+
+    def _collect(self, first: Tuple[Any, ...]) -> List[Tuple[Any, ...]]:
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._q.get(timeout=timeout) if timeout > 0 else self._q.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._q.put(_STOP)  # leave it for the outer loop (and the other workers)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._q.get()
+            if first is _STOP:
+                self._q.put(_STOP)
+                return
+            batch = self._collect(first)
+            started = time.perf_counter()
+            try:
+                scores = self.fn(np.vstack([b[0] for b in batch]))
+            except BaseException as e:
+                for b in batch:
+                    b[1].set_exception(e)
+                ok = False
+            else:
+                for b, s in zip(batch, scores):
+                    b[1].set_result(float(s))
+                ok = True
+            self._record(batch, started, ok)
+
+    def _record(self, batch: List[Tuple[Any, ...]], started: float, ok: bool) -> None:
+        with self._lock:
+            self._batches += 1
+            self._rows += len(batch)
+            self._errors += not ok
+            self._sizes[len(batch)] += 1
+            for b in batch:
+                us = int((started - b[2]) * 1e6)
+                self._wait_hist[min(us.bit_length(), _NBUCKETS - 1)] += 1
+                if us > self._max_wait_us:
+                    self._max_wait_us = us
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sizes = list(self._sizes)
+            waits = list(self._wait_hist)
+            batches, rows, errors, max_wait = self._batches, self._rows, self._errors, self._max_wait_us
+        return {
+            "batches": batches,
+            "rows": rows,
+            "errors": errors,
+            "mean_batch_size": rows / batches if batches else None,
+            "batch_sizes": {n: c for n, c in enumerate(sizes) if c},
+            "queue_wait_us": {  # log2-bucket bounds, capped at the observed max
+                "p50": _cap(_percentile(waits, 0.5), max_wait),
+                "p99": _cap(_percentile(waits, 0.99), max_wait),
+                "max": max_wait,
+            },
+        }
+
+    def close(self) -> None:
+        self._q.put(_STOP)
+        for t in self._threads:
+            t.join(timeout=1.0)
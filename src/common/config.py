@@ -12,18 +12,54 @@ class Settings(BaseSettings):
     DB_NAME: str = "amlynx"
     DB_USER: str = "amlynx"
     DB_PASSWORD: str = "amlynx"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+
+    # Partition maintenance (db.partitions)
+    PARTITION_MONTHS_AHEAD: int = 3
+    PARTITION_RETENTION_MONTHS: int = 24  # 0 keeps everything attached
+    PARTITION_ARCHIVE_SCHEMA: str = "archive"  # empty string drops detached partitions
+
+    # account_daily rollup (db.rollups)
+    ROLLUP_BATCH_SIZE: int = 5000
+    ROLLUP_IDLE_SLEEP_S: float = 1.0
 
     # ML
     MODEL_DIR: str = "models"
     CONTAMINATION: float = 0.01
     IFOREST_TREES: int = 300
     RANDOM_STATE: int = 42
+    MODEL_POLL_INTERVAL_S: float = 5.0  # 0 disables the model file watcher
+    MODEL_BOOTSTRAP_ROWS: int = 50_000  # recent transactions to fit a first model from at startup
+    TORCH_THREADS: int = 1  # intra-op threads per worker process for autoencoder serving; 0 keeps torch's default
+    SCORING_THREADS: int = 4        # executor threads for model scoring per worker
+    SCORING_MAX_PENDING: int = 64   # callers beyond this wait before submitting
+    ANOMALY_BATCH_MAX_SIZE: int = 64      # rows per vectorised anomaly scoring call
+    ANOMALY_BATCH_MAX_WAIT_MS: float = 2.0  # longest a row waits for others to join its batch
+    INGEST_BATCH_MAX_SIZE: int = 1000  # items per /transactions/ingest-and-score-batch request
 
     # Rules
     RULES_PATH: str = "rules.yaml"
     RULES_WEIGHT: float = 0.6
     ANOMALY_WEIGHT: float = 0.4
     ALERT_THRESHOLD: float = 0.85
+    RULES_POLL_INTERVAL_S: float = 2.0  # 0 disables the file watcher
+    RULE_STATS_ENABLED: bool = True
+
+    # Write-behind persistence for ingest-and-score: off (commit in request) | memory | wal
+    WRITE_BEHIND_MODE: str = "off"
+    WRITE_BEHIND_MAX_ROWS: int = 500
+    WRITE_BEHIND_MAX_DELAY_MS: int = 50
+    WRITE_BEHIND_CAPACITY: int = 20_000
+    WRITE_BEHIND_PUT_TIMEOUT_S: float = 1.0
+    WRITE_BEHIND_WAL_DIR: str = "wal"
+    WRITE_BEHIND_WAL_FSYNC: bool = True
+
+    # Process-local caches
+    ACCOUNT_CACHE_SIZE: int = 100_000
+    HISTORY_CACHE_PER_ACCOUNT: int = 512
+    HISTORY_CACHE_MAX_ROWS: int = 2_000_000
+    HISTORY_CACHE_TTL_S: float = 300.0
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
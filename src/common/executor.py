@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class BoundedExecutor:
+    """
+    Runs blocking/CPU-bound calls off the event loop on a fixed thread pool.
+    At most `max_pending` calls may be queued or running; further callers wait on
+    a semaphore instead of piling work into the pool's unbounded queue.
+    """
+    def __init__(self, max_workers: int = 4, max_pending: int = 64, name: str = "scoring") -> None:
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._max_pending = max_pending
+        self._sem: Optional[asyncio.Semaphore] = None  # bound to the running loop lazily
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self._max_pending)
+        async with self._sem:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, partial(fn, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
@@ -1,36 +1,86 @@
-from typing import Iterable
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple, Union
 import pandas as pd
-from sqlalchemy import select
-from src.db.session import SessionLocal
-from src.db.models import Transaction
-from datetime import datetime, timezone
+from sqlalchemy import DateTime, Float, String, cast, column, func, select, table
+from db.session import SessionLocal
 import numpy as np
 
+TX_COLUMNS: Tuple[str, ...] = (
+    "tx_id", "src_account", "dst_account", "amount", "currency", "channel", "merchant_code", "tx_ts",
+)
+# lightweight table clause: only the selected columns are fetched, no ORM objects are built
+_tx = table("transactions", *(column(c, DateTime) if c == "tx_ts" else column(c) for c in TX_COLUMNS))
+_STR_CASTS = ("tx_id", "src_account", "dst_account")
+
+
+def _expr(name: str):
+    c = _tx.c[name]
+    if name == "amount":
+        return cast(c, Float).label(name)
+    if name == "channel":
+        return func.coalesce(c, "unknown").label(name)
+    if name in _STR_CASTS:
+        return cast(c, String).label(name)
+    return c
+
+
+def arrow_schema(columns: Sequence[str] = TX_COLUMNS):
+    import pyarrow as pa
+    types = {"amount": pa.float64(), "tx_ts": pa.timestamp("us", tz="UTC")}
+    return pa.schema([(c, types.get(c, pa.string())) for c in columns])
+
+
+def _select(columns: Sequence[str], limit: Optional[int]):
+    q = select(*(_expr(c) for c in columns)).select_from(_tx)
+    if limit is not None:
+        q = q.order_by(_tx.c.tx_ts).limit(limit)  # tx_ts is indexed; makes the limited set deterministic
+    return q
+
+
+def iter_transactions(
+    chunk_size: int = 50_000,
+    limit: Optional[int] = None,
+    columns: Sequence[str] = TX_COLUMNS,
+    as_arrow: bool = False,
+    session_factory: Callable = SessionLocal,
+) -> Iterator[Union[pd.DataFrame, "pyarrow.Table"]]:
+    """Stream transactions through a server-side cursor in typed chunks of `chunk_size`
+    rows (DataFrames, or Arrow tables with `as_arrow`). Memory is bounded by one chunk."""
+    import pyarrow as pa
+    schema = arrow_schema(columns)
+    q = _select(columns, limit).execution_options(stream_results=True, yield_per=chunk_size)
+    with session_factory() as session:
+        for rows in session.execute(q).partitions(chunk_size):
+            # naive DB timestamps are UTC; Arrow stamps them as such without conversion
+            t = pa.Table.from_arrays([pa.array(v, type=f.type) for v, f in zip(zip(*rows), schema)], schema=schema)
+            yield t if as_arrow else t.to_pandas()
+
+
 def fetch_transactions(limit: int = 10000) -> pd.DataFrame:
-    with SessionLocal() as session:
-        q = select(Transaction).limit(limit)
-        rows = session.execute(q).scalars().all()
-        data = []
-        for r in rows:
-            data.append({
-                "tx_id": r.tx_id,
-                "src_account": r.src_account,
-                "dst_account": r.dst_account,
-                "amount": float(r.amount),
-                "currency": r.currency,
-                "channel": r.channel or "unknown",
-                "merchant_code": r.merchant_code,
-                "tx_ts": r.tx_ts.replace(tzinfo=timezone.utc).isoformat() if r.tx_ts else None,
-            })
-        df = pd.DataFrame(data)
-        return df
+    chunks = list(iter_transactions(limit=limit))
+    return pd.concat(chunks, ignore_index=True) if chunks else arrow_schema().empty_table().to_pandas()
+
+
+def amount_log_stats(limit: Optional[int] = None, session_factory: Callable = SessionLocal) -> Tuple[float, float]:
+    """Mean and population std of log1p(amount), aggregated server-side so streamed
+    chunks can be standardised against the whole table rather than per chunk."""
+    sub = _select(("amount", "tx_ts"), limit).subquery()
+    x = func.ln(1.0 + sub.c.amount)
+    with session_factory() as session:
+        mean, sq = session.execute(select(func.avg(x), func.avg(x * x))).one()
+    if mean is None:
+        return 0.0, 1.0
+    std = float(np.sqrt(max(sq - mean * mean, 0.0)))
+    return float(mean), std or 1.0
+
 
-def compute_basic_features(df: pd.DataFrame) -> pd.DataFrame:
+def compute_basic_features(df: pd.DataFrame, stats: Optional[Tuple[float, float]] = None) -> pd.DataFrame:
     df = df.copy()
-    # amount z-score per src_account (simple, uses global mean/std for dev)
+    # amount z-score (simple, uses global mean/std for dev); pass `stats` when df is one chunk of a stream
     df["amount_log"] = np.log1p(df["amount"].astype(float))
-    global_mean = df["amount_log"].mean()
-    global_std = df["amount_log"].std(ddof=0) or 1.0
+    if stats is None:
+        stats = (df["amount_log"].mean(), df["amount_log"].std(ddof=0) or 1.0)
+    global_mean, global_std = stats
     df["amount_zscore"] = (df["amount_log"] - global_mean) / global_std
     # time features
     df["tx_ts"] = pd.to_datetime(df["tx_ts"])
@@ -40,8 +90,240 @@ def compute_basic_features(df: pd.DataFrame) -> pd.DataFrame:
     df["is_large"] = (df["amount"] > 10000).astype(int)
     return df
 
-def build_feature_table(out_path: str = "data/features.csv"):
-    df = fetch_transactions(limit=20000)
-    df_feat = compute_basic_features(df)
-    df_feat.to_csv(out_path, index=False)
+
+def iter_basic_features(chunks: Iterable[pd.DataFrame], stats: Tuple[float, float]) -> Iterator[pd.DataFrame]:
+    for df in chunks:
+        yield compute_basic_features(df, stats)
+
+
+# Online anomaly features: one row per transaction, relative to the account history before it.
+ANOMALY_FEATURES: Tuple[str, ...] = (
+    "amount_log", "hour", "dayofweek", "prior_count", "amount_to_prior_mean", "new_country",
+)
+
+
+def _anomaly_matrix(ts: np.ndarray, amount: np.ndarray, prior_count: np.ndarray,
+                    prior_sum: np.ndarray, new_country: np.ndarray) -> np.ndarray:
+    prior_mean = np.divide(prior_sum, prior_count, out=np.zeros_like(prior_sum), where=prior_count > 0)
+    ratio = np.divide(amount, prior_mean, out=np.ones_like(amount), where=prior_mean > 0)
+    days = np.floor_divide(ts, 86400.0)
+    return np.column_stack([
+        np.log1p(np.maximum(amount, 0.0)),
+        np.floor_divide(ts - days * 86400.0, 3600.0),  # UTC hour
+        (days + 3) % 7,  # 1970-01-01 was a Thursday; Monday = 0
+        prior_count, ratio, new_country,
+    ]).astype(np.float64)
+
+
+def _epoch_seconds(values: Iterable[Any]) -> np.ndarray:
+    ts = pd.to_datetime(pd.Series(list(values)), utc=True)
+    return (ts - pd.Timestamp(0, tz="UTC")).dt.total_seconds().to_numpy(dtype=np.float64)
+
+
+def to_frame(rows: Sequence[Dict[str, Any]]) -> pd.DataFrame:
+    """ANOMALY_FEATURES for oldest-first transaction dicts (amount, country, timestamp);
+    each row is featurised against the rows before it."""
+    if not len(rows):
+        return pd.DataFrame(columns=list(ANOMALY_FEATURES), dtype=np.float64)
+    amount = np.array([float(r.get("amount", 0.0)) for r in rows], dtype=np.float64)
+    country = pd.Series([(r.get("country") or "").upper() for r in rows])
+    prior_sum = np.concatenate([[0.0], np.cumsum(amount)[:-1]])
+    X = _anomaly_matrix(_epoch_seconds(r["timestamp"] for r in rows), amount,
+                        np.arange(len(rows), dtype=np.float64), prior_sum,
+                        (~country.duplicated()).to_numpy(dtype=np.float64))
+    return pd.DataFrame(X, columns=list(ANOMALY_FEATURES))
+
+
+def latest_feature_row(df: pd.DataFrame) -> np.ndarray:
+    return df.iloc[-1].to_numpy(dtype=np.float64)
+
+
+def history_features(timestamps: np.ndarray, amounts: np.ndarray, countries: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    ANOMALY_FEATURES for many transactions at once, from CSR-grouped history columns
+    (TxBatch layout): group i is rows[offsets[i]:offsets[i+1]], oldest first, ending
+    with transaction i itself. Equals latest_feature_row(to_frame(group)) per group.
+    """
+    start, last = offsets[:-1], offsets[1:] - 1
+    if len(start) and (last < start).any():
+        raise ValueError("every group must end with its own transaction")
+    cum = np.concatenate([[0.0], np.cumsum(amounts, dtype=np.float64)])
+    group = np.repeat(np.arange(len(start)), offsets[1:] - start)
+    same = countries == countries[last][group]
+    seen = np.bincount(group, weights=same, minlength=len(start)) - 1  # minus the row itself
+    return _anomaly_matrix(
+        np.asarray(timestamps, dtype=np.float64)[last], np.asarray(amounts, dtype=np.float64)[last],
+        (last - start).astype(np.float64), cum[last] - cum[start], (seen == 0).astype(np.float64),
+    )
+
+
+def anomaly_training_matrix(limit: int = 50_000, session_factory: Callable = SessionLocal) -> np.ndarray:
+    """ANOMALY_FEATURES for the most recent `limit` ingested transactions, each against
+    the earlier rows of its account within that set (e.g. to fit a first model)."""
+    from db.models import Transaction
+    q = (select(Transaction.account_id, Transaction.timestamp, Transaction.amount, Transaction.country)
+         .order_by(Transaction.timestamp.desc()).limit(limit))
+    with session_factory() as session:
+        df = pd.DataFrame(session.execute(q).all(), columns=["account_id", "timestamp", "amount", "country"])
+    if df.empty:
+        return np.zeros((0, len(ANOMALY_FEATURES)))
+    df["country"] = df["country"].fillna("").str.upper()
+    df = df.sort_values(["account_id", "timestamp"], kind="stable")
+    amount = df["amount"].astype(float)
+    by_account = amount.groupby(df["account_id"])
+    return _anomaly_matrix(
+        _epoch_seconds(df["timestamp"]), amount.to_numpy(),
+        by_account.cumcount().to_numpy(dtype=np.float64),
+        (by_account.cumsum() - amount).to_numpy(),
+        (~df.duplicated(["account_id", "country"])).to_numpy(dtype=np.float64),
+    )
+
+
+FEATURE_FORMATS = ("parquet", "ipc", "csv")
+
+
+def feature_schema(columns: Sequence[str] = TX_COLUMNS, partition_by: Optional[str] = None):
+    """Explicit Arrow schema of compute_basic_features output (plus the partition column)."""
+    import pyarrow as pa
+    fields = list(arrow_schema(columns)) + [
+        pa.field("amount_log", pa.float64()), pa.field("amount_zscore", pa.float64()),
+        pa.field("hour", pa.int8()), pa.field("dayofweek", pa.int8()), pa.field("is_large", pa.int8()),
+    ]
+    if partition_by is not None:
+        fields.append(_partition_field(partition_by))
+    return pa.schema(fields)
+
+
+def _partition_field(partition_by: str):
+    import pyarrow as pa
+    return {"day": pa.field("day", pa.date32()), "account": pa.field("account_bucket", pa.int16())}[partition_by]
+
+
+def _partition_key(df: pd.DataFrame, partition_by: Optional[str], buckets: int) -> pd.DataFrame:
+    if partition_by == "day":
+        df["day"] = df["tx_ts"].dt.date
+    elif partition_by == "account":
+        # stable across processes, unlike hash()
+        df["account_bucket"] = (pd.util.hash_pandas_object(df["src_account"], index=False) % buckets).astype("int16")
+    elif partition_by is not None:
+        raise ValueError(f"Unknown partition_by: {partition_by}")
+    return df
+
+
+def write_feature_table(
+    chunks: Iterable[pd.DataFrame],
+    out_path: str,
+    fmt: str = "parquet",
+    partition_by: Optional[str] = "day",
+    account_buckets: int = 64,
+) -> str:
+    """Write feature chunks as a hive-partitioned Parquet/Arrow IPC dataset, or as one CSV.
+    Chunks are written as they arrive, so memory stays bounded by one chunk; partitions
+    present in the new data replace the ones on disk."""
+    if fmt not in FEATURE_FORMATS:
+        raise ValueError(f"Unknown feature table format: {fmt}")
+    if fmt == "csv":
+        header = True
+        with open(out_path, "w", newline="") as f:
+            for df in chunks:
+                df.to_csv(f, index=False, header=header)
+                header = False
+        return out_path
+
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    schema: Any = None
+
+    def batches() -> Iterator[Any]:
+        nonlocal schema
+        for df in chunks:
+            df = _partition_key(df, partition_by, account_buckets)
+            if schema is None:
+                schema = feature_schema([c for c in df.columns if c in TX_COLUMNS], partition_by)
+            yield from pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False).to_batches()
+
+    it = batches()
+    first = next(it, None)
+    if first is None:
+        return out_path
+    ds.write_dataset(
+        _chain(first, it), out_path, schema=schema, format=fmt,
+        partitioning=ds.partitioning(pa.schema([_partition_field(partition_by)]), flavor="hive") if partition_by else None,
+        existing_data_behavior="delete_matching",
+        max_rows_per_group=1 << 17,
+    )
     return out_path
+
+
+def _chain(first: Any, rest: Iterator[Any]) -> Iterator[Any]:
+    yield first
+    yield from rest
+
+
+def load_feature_table(
+    path: str,
+    columns: Optional[Sequence[str]] = None,
+    filters: Any = None,
+    memory_map: bool = True,
+    as_arrow: bool = False,
+):
+    """Load a feature table for training. Parquet/IPC datasets read only `columns` and
+    push `filters` (a pyarrow expression or DNF tuples like [("day", ">=", date(...))])
+    down to partitions and row groups; IPC files are memory-mapped. CSV is read whole."""
+    if str(path).endswith(".csv"):
+        df = pd.read_csv(path, usecols=columns, parse_dates=["tx_ts"] if columns is None or "tx_ts" in columns else None)
+        if filters is not None:
+            raise ValueError("filters are not supported for CSV feature tables")
+        return df
+    dataset = _feature_dataset(path, memory_map)
+    table = dataset.to_table(columns=list(columns) if columns is not None else None, filter=_filter_expr(filters))
+    return table if as_arrow else table.to_pandas()
+
+
+def _feature_dataset(path: str, memory_map: bool = True):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    first = next(Path(path).rglob("part-*"), None)
+    fmt = "ipc" if first is not None and first.suffix == ".arrow" else "parquet"
+    # typed partition keys, otherwise hive discovery reads day=2025-01-01 as a string
+    key = first.parent.name.split("=")[0] if first is not None and "=" in first.parent.name else None
+    part = {"day": "day", "account_bucket": "account"}.get(key or "")
+    partitioning = ds.partitioning(pa.schema([_partition_field(part)]), flavor="hive") if part else None
+    return ds.dataset(path, format=fmt, partitioning=partitioning, filesystem=pafs.LocalFileSystem(use_mmap=memory_map))
+
+
+def _filter_expr(filters: Any):
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    if filters is None or isinstance(filters, ds.Expression):
+        return filters
+    return pq.filters_to_expression(filters)
+
+
+def iter_feature_arrays(path: str, columns: Sequence[str], chunk_size: int = 65_536, filters: Any = None) -> Iterator[np.ndarray]:
+    """Stream a feature table as float64 (rows, len(columns)) arrays, for out-of-core
+    training. Parquet/IPC datasets are read batch by batch with projection and
+    pushdown; CSV is read in chunks."""
+    if str(path).endswith(".csv"):
+        if filters is not None:
+            raise ValueError("filters are not supported for CSV feature tables")
+        for df in pd.read_csv(path, usecols=list(columns), chunksize=chunk_size):
+            yield df[list(columns)].to_numpy(dtype=np.float64)
+        return
+    for batch in _feature_dataset(path).to_batches(columns=list(columns), filter=_filter_expr(filters), batch_size=chunk_size):
+        if batch.num_rows:
+            yield np.column_stack([batch.column(i).to_numpy(zero_copy_only=False) for i in range(batch.num_columns)]).astype(np.float64)
+
+
+def build_feature_table(
+    out_path: str = "data/features",
+    limit: Optional[int] = 20000,
+    chunk_size: int = 50_000,
+    fmt: Optional[str] = None,
+    partition_by: Optional[str] = "day",
+):
+    fmt = fmt or ("csv" if out_path.endswith(".csv") else "parquet")
+    stats = amount_log_stats(limit)
+    chunks = iter_basic_features(iter_transactions(chunk_size, limit), stats)
+    return write_feature_table(chunks, out_path, fmt, partition_by if fmt != "csv" else None)
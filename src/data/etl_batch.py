@@ -18,6 +18,14 @@ def read_csv_stream(path: Path, chunk_size: int = 10_000) -> Iterator[List[Dict[
             yield chunk
 
 
+def read_parquet_stream(path: Path, chunk_size: int = 10_000) -> Iterator[List[Dict[str, Any]]]:
+    """Parquet counterpart of read_csv_stream; reads one record batch at a time."""
+    import pyarrow.parquet as pq
+    pf = pq.ParquetFile(path)
+    for batch in pf.iter_batches(batch_size=chunk_size):
+        yield batch.to_pylist()
+
+
 def transform_chunk(chunk: List[Dict[str, Any]], *transforms: Callable[[Dict[str, Any]], Dict[str, Any]]) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
     for row in chunk:
@@ -0,0 +1,325 @@
+"""
+Streaming bulk loader for the range-partitioned `transactions` table.
+
+    python -m data.loader transactions.csv --chunk-size 50000
+
+By default input (CSV or Parquet) is read as typed Arrow tables (`read_table_stream`)
+and each chunk is rendered to CSV by Arrow and sent with `COPY ... FROM STDIN (FORMAT
+csv)`, so no Python object is built per row. With --binary or --transform, chunks
+are row dicts passed through `transform_chunk` and `normalize_row` instead and
+written with text or binary COPY. Either way PostgreSQL routes rows to the monthly
+partitions. With dedup on (the default) each chunk is COPYed into a temp staging
+table and moved over with one INSERT ... SELECT that drops rows already loaded,
+all in a single transaction, so a failed chunk can simply be retried. Loaded rows
+are matched on (tx_id, tx_ts): tx_ts is the partition key, so each probe is pruned
+to one partition and served by ix_transactions_tx_ts instead of scanning them all.
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from loguru import logger
+
+from data.etl_batch import read_csv_stream, read_parquet_stream, transform_chunk
+from db.rollups import LOCK_SHARED_SQL, rollup_insert_sql
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+COLUMNS: Sequence[str] = (
+    "tx_id", "src_account", "dst_account", "amount", "currency",
+    "channel", "merchant_code", "tx_ts", "ip_hash", "geo", "raw_payload", "processed",
+)
+# PostgreSQL types for binary COPY (migration 0004)
+PG_TYPES: Dict[str, str] = {
+    "tx_id": "uuid", "src_account": "uuid", "dst_account": "uuid", "amount": "numeric",
+    "currency": "varchar", "channel": "varchar", "merchant_code": "varchar", "tx_ts": "timestamp",
+    "ip_hash": "varchar", "geo": "jsonb", "raw_payload": "jsonb", "processed": "bool",
+}
+_UUID = ("tx_id", "src_account", "dst_account")
+_JSON = ("geo", "raw_payload")
+_TRUE = ("1", "t", "true", "yes")
+
+Chunk = Union[List[Dict[str, Any]], "pa.Table"]  # row dicts, or a table from read_table_stream
+
+
+def normalize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Coerce CSV strings to the column types COPY expects; blanks become NULL."""
+    out: Dict[str, Any] = {}
+    for col in COLUMNS:
+        v = row.get(col)
+        if v == "":
+            v = None
+        if v is not None:
+            if col in _UUID and not isinstance(v, uuid.UUID):
+                v = uuid.UUID(str(v))
+            elif col == "amount":
+                v = Decimal(str(v))
+            elif col == "tx_ts" and isinstance(v, str):
+                v = datetime.fromisoformat(v)
+            elif col in _JSON and isinstance(v, str):
+                v = json.loads(v)
+            elif col == "processed" and isinstance(v, str):
+                v = v.strip().lower() in ("1", "t", "true", "yes")
+        out[col] = v
+    if out["currency"] is None:
+        out["currency"] = "USD"
+    if out["processed"] is None:
+        out["processed"] = False
+    return out
+
+
+def arrow_schema() -> "pa.Schema":
+    """Column types of the tables COPYed by the columnar path. amount, tx_ts and processed
+    are parsed client-side; ids and JSON stay text and are parsed by the server's COPY.
+    amount keeps 18 decimals so Arrow never rejects input the numeric(18,4) column rounds."""
+    import pyarrow as pa
+    types = {"amount": pa.decimal128(38, 18), "tx_ts": pa.timestamp("us"), "processed": pa.bool_()}
+    return pa.schema([(c, types.get(c, pa.string())) for c in COLUMNS])
+
+
+def normalize_table(table: "pa.Table") -> "pa.Table":
+    """Columnar normalize_row: COLUMNS in order with arrow_schema() types, blank strings
+    as NULL and the currency/processed defaults filled in. Timestamps must be naive ISO."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    columns = []
+    for f in arrow_schema():
+        col = table[f.name] if f.name in table.column_names else pa.nulls(table.num_rows)
+        if pa.types.is_string(col.type) or pa.types.is_large_string(col.type):
+            col = pc.if_else(pc.equal(col, ""), pa.scalar(None, col.type), col)
+            if f.name == "processed":
+                col = pc.is_in(pc.utf8_lower(pc.utf8_trim_whitespace(col)), value_set=pa.array(_TRUE))
+        col = col.cast(f.type)
+        if f.name == "currency":
+            col = pc.fill_null(col, "USD")
+        elif f.name == "processed":
+            col = pc.fill_null(col, False)
+        columns.append(col)
+    return pa.table(columns, schema=arrow_schema())
+
+
+def read_table_stream(path: Path, chunk_size: int) -> Iterator["pa.Table"]:
+    """Typed counterpart of `_stream`: normalized tables of `chunk_size` rows. CSV fields are
+    read as text (no type inference, so e.g. merchant codes keep leading zeros) and cast
+    by normalize_table; columns outside COLUMNS are not read."""
+    import pyarrow as pa
+    if path.suffix in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(path)
+        batches: Iterable[Any] = pf.iter_batches(batch_size=chunk_size, columns=[c for c in COLUMNS if c in pf.schema_arrow.names])
+    else:
+        import pyarrow.csv as pacsv
+        batches = pacsv.open_csv(
+            path,
+            read_options=pacsv.ReadOptions(block_size=1 << 22),
+            convert_options=pacsv.ConvertOptions(
+                column_types=dict.fromkeys(COLUMNS, pa.string()), null_values=[""], strings_can_be_null=True,
+                include_columns=list(COLUMNS), include_missing_columns=True,
+            ),
+        )
+    pending: List[Any] = []
+    size = 0
+    for batch in batches:
+        while batch.num_rows:
+            head = batch.slice(0, chunk_size - size)
+            pending.append(head)
+            size += head.num_rows
+            batch = batch.slice(head.num_rows)
+            if size == chunk_size:
+                yield normalize_table(pa.Table.from_batches(pending))
+                pending, size = [], 0
+    if size:
+        yield normalize_table(pa.Table.from_batches(pending))
+
+
+def _csv(table: "pa.Table") -> Any:
+    # Arrow's CSV matches COPY's: NULL is an unquoted empty field, an empty string is ""
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    sink = pa.BufferOutputStream()
+    pacsv.write_csv(table, sink, pacsv.WriteOptions(include_header=False))
+    return memoryview(sink.getvalue())
+
+
+@dataclass
+class LoadStats:
+    rows_in: int = 0
+    rows_loaded: int = 0
+    chunks: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+    failed_chunks: List[int] = field(default_factory=list)
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.rows_in / self.seconds if self.seconds else 0.0
+
+
+def _dsn(db_url: str) -> str:
+    # SQLAlchemy URL -> libpq URL
+    return db_url.replace("postgresql+psycopg://", "postgresql://", 1)
+
+
+class CopyLoader:
+    def __init__(
+        self,
+        dsn: str,
+        table: str = "transactions",
+        columns: Sequence[str] = COLUMNS,
+        binary: bool = True,
+        dedup: bool = True,
+        max_retries: int = 3,
+        rollup: bool = False,
+    ) -> None:
+        if rollup and not dedup:
+            raise ValueError("rollup requires the staged (dedup) load path")
+        self.dsn = dsn
+        self.table = table
+        self.columns = list(columns)
+        self.binary = binary
+        self.dedup = dedup
+        self.max_retries = max_retries
+        self.rollup = rollup
+        self._conn: Any = None
+
+    def _connect(self) -> Any:
+        import psycopg
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg.connect(self.dsn)
+            if self.dedup:
+                with self._conn.transaction():
+                    self._conn.execute(
+                        f"CREATE TEMP TABLE IF NOT EXISTS _load_stage (LIKE {self.table} INCLUDING DEFAULTS) "
+                        f"ON COMMIT DELETE ROWS"
+                    )
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None and not self._conn.closed:
+            self._conn.close()
+
+    def _copy(self, conn: Any, target: str, rows: Chunk) -> None:
+        cols = ", ".join(self.columns)
+        fmt = " (FORMAT BINARY)" if self.binary else ""
+        with conn.cursor() as cur:
+            if not isinstance(rows, list):  # Arrow table: always CSV, encoded by Arrow
+                with cur.copy(f"COPY {target} ({cols}) FROM STDIN (FORMAT csv)") as copy:
+                    copy.write(_csv(rows.select(self.columns)))
+                return
+            with cur.copy(f"COPY {target} ({cols}) FROM STDIN{fmt}") as copy:
+                if self.binary:
+                    copy.set_types([PG_TYPES[c] for c in self.columns])
+                for r in rows:
+                    copy.write_row([_copy_value(c, r.get(c), self.binary) for c in self.columns])
+
+    def load_chunk(self, rows: Chunk) -> int:
+        """Load one chunk in one transaction; returns rows actually inserted."""
+        conn = self._connect()
+        with conn.transaction():
+            if not self.dedup:
+                self._copy(conn, self.table, rows)
+                return len(rows)
+            self._copy(conn, "_load_stage", rows)
+            cols = ", ".join(self.columns)
+            # rolled-up rows land as processed so the change cursor skips them
+            scols = ", ".join("true" if self.rollup and c == "processed" else f"s.{c}" for c in self.columns)
+            sql = (
+                f"INSERT INTO {self.table} ({cols}) "
+                f"SELECT DISTINCT ON (s.tx_id) {scols} FROM _load_stage s "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {self.table} t WHERE t.tx_ts = s.tx_ts AND t.tx_id = s.tx_id) "
+                f"ORDER BY s.tx_id"
+            )
+            if not self.rollup:
+                return conn.execute(sql).rowcount
+            conn.execute(LOCK_SHARED_SQL)
+            return conn.execute(rollup_insert_sql(sql + " RETURNING src_account, dst_account, amount, tx_ts")).fetchone()[0]
+
+    def load(self, chunks: Iterable[Chunk], *transforms: Callable[[Dict[str, Any]], Dict[str, Any]]) -> LoadStats:
+        """Load chunks of row dicts (run through `transforms`) or Arrow tables from
+        read_table_stream (loaded as they are; row transforms do not apply to them)."""
+        import psycopg
+        stats = LoadStats()
+        t0 = time.perf_counter()
+        try:
+            for i, chunk in enumerate(chunks):
+                if not isinstance(chunk, list) and transforms:
+                    raise TypeError("row transforms need dict chunks, not Arrow tables")
+                rows = transform_chunk(chunk, *transforms) if isinstance(chunk, list) else chunk
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        stats.rows_loaded += self.load_chunk(rows)
+                        break
+                    except psycopg.Error as e:
+                        if attempt == self.max_retries:
+                            logger.error(f"Chunk {i} failed after {attempt + 1} attempts: {e}")
+                            stats.failed_chunks.append(i)
+                            break
+                        stats.retries += 1
+                        logger.warning(f"Chunk {i} failed ({e}); retrying")
+                        if self._conn is not None and self._conn.broken:
+                            self._conn = None  # reconnect on next attempt
+                        time.sleep(min(0.5 * 2 ** attempt, 10.0))
+                stats.rows_in += len(rows)
+                stats.chunks += 1
+        finally:
+            stats.seconds = time.perf_counter() - t0
+            self.close()
+        return stats
+
+
+def _copy_value(col: str, v: Any, binary: bool) -> Any:
+    if v is None or col not in _JSON:
+        return v
+    if binary:
+        from psycopg.types.json import Jsonb
+        return Jsonb(v)
+    return json.dumps(v)
+
+
+def _stream(path: Path, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    if path.suffix in (".parquet", ".pq"):
+        return read_parquet_stream(path, chunk_size)
+    return read_csv_stream(path, chunk_size)
+
+
+def _import(spec: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    mod, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(mod), attr)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from common.config import get_settings
+    ap = argparse.ArgumentParser(description="COPY-based bulk loader for transactions")
+    ap.add_argument("path", type=Path)
+    ap.add_argument("--chunk-size", type=int, default=50_000)
+    ap.add_argument("--binary", action="store_true", help="binary COPY of row dicts (default: columnar CSV COPY)")
+    ap.add_argument("--no-dedup", action="store_true", help="COPY straight into the table")
+    ap.add_argument("--transform", action="append", default=[], help="row transform, module:function (implies the row path)")
+    ap.add_argument("--retries", type=int, default=3)
+    ap.add_argument("--rollup", action="store_true", help="fold loaded rows into account_daily in the same transaction")
+    ap.add_argument("--db-url", default=get_settings().db_url)
+    args = ap.parse_args(argv)
+
+    loader = CopyLoader(_dsn(args.db_url), binary=args.binary, dedup=not args.no_dedup, max_retries=args.retries,
+                        rollup=args.rollup)
+    if args.binary or args.transform:
+        transforms = [_import(t) for t in args.transform] + [normalize_row]
+        stats = loader.load(_stream(args.path, args.chunk_size), *transforms)
+    else:
+        stats = loader.load(read_table_stream(args.path, args.chunk_size))
+    print(f"{stats.rows_in} rows read, {stats.rows_loaded} loaded in {stats.seconds:.1f}s "
+          f"({stats.rows_per_s:,.0f} rows/s), {stats.retries} retries, failed chunks: {stats.failed_chunks or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Mapping, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from common.config import get_settings
+from db.models import Account
+
+_PENDING_KEY = "account_resolver_pending"
+
+
+def _resolve_stmt(new: Mapping[str, str]) -> Any:
+    """
+    PostgreSQL: one statement that inserts missing accounts and returns every id.
+
+        WITH ins AS (INSERT ... ON CONFLICT DO NOTHING RETURNING external_id, id)
+        SELECT external_id, id FROM ins
+        UNION ALL SELECT external_id, id FROM accounts WHERE external_id IN (...)
+
+    The SELECT runs on the statement snapshot, so it never sees the rows `ins` adds,
+    nor a row another transaction committed after the snapshot was taken; such ids
+    are re-read with _select_stmt by the _RESOLVE_ROUNDS retry loop.
+    """
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    now = datetime.utcnow()
+    ins = (
+        pg_insert(Account)
+        .values([{"external_id": k, "country": c, "created_at": now} for k, c in new.items()])
+        .on_conflict_do_nothing(index_elements=[Account.external_id])
+        .returning(Account.external_id, Account.id)
+        .cte("ins")
+    )
+    return select(ins.c.external_id, ins.c.id).union_all(_select_stmt(new))
+
+
+def _select_stmt(keys: Any) -> Any:
+    return select(Account.external_id, Account.id).where(Account.external_id.in_(list(keys)))
+
+
+def _fallback_stmts(new: Mapping[str, str]) -> Any:
+    # Dialects without DML in CTEs (SQLite): insert-or-ignore, then select.
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    now = datetime.utcnow()
+    ins = (
+        sqlite_insert(Account)
+        .values([{"external_id": k, "country": c, "created_at": now} for k, c in new.items()])
+        .on_conflict_do_nothing(index_elements=[Account.external_id])
+    )
+    return ins, _select_stmt(new)
+
+
+def _upsert_stmts(dialect: str, new: Mapping[str, str]) -> tuple:
+    """Statements to run in order; the last one returns (external_id, id) rows."""
+    return (_resolve_stmt(new),) if dialect == "postgresql" else _fallback_stmts(new)
+
+
+# Under READ COMMITTED a concurrent transaction can commit the same external_id after our
+# statement snapshot: ON CONFLICT skips the insert and the snapshot SELECT cannot see the
+# row. A new statement gets a new snapshot, so missing ids are re-selected; if the other
+# transaction rolled back instead, the next round inserts them.
+_RESOLVE_ROUNDS = 3
+
+
+def _pending(missing: Mapping[str, str], resolved: Mapping[str, int]) -> Dict[str, str]:
+    return {k: c for k, c in missing.items() if k not in resolved}
+
+
+class AccountResolver:
+    """
+    Process-local, size-bounded `external_id -> accounts.id` cache in front of an
+    insert-if-missing upsert.
+
+    Ids resolved on a miss are parked on the session and only published to the cache
+    after that session commits; a rollback (which may undo the account insert) drops
+    them. Account ids are never reassigned, so entries otherwise stay valid until
+    evicted or explicitly invalidated.
+    """
+    def __init__(self, max_size: int = 100_000) -> None:
+        self.max_size = max_size
+        self._ids: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._ids), "max_size": self.max_size,
+            "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _lookup(self, wanted: Mapping[str, str]) -> tuple[Dict[str, int], Dict[str, str]]:
+        found: Dict[str, int] = {}
+        missing: Dict[str, str] = {}
+        with self._lock:
+            for ext, country in wanted.items():
+                acct_id = self._ids.get(ext)
+                if acct_id is None:
+                    missing[ext] = country
+                else:
+                    self._ids.move_to_end(ext)
+                    found[ext] = acct_id
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def _park(self, session: Session, resolved: Mapping[str, int]) -> None:
+        session.info.setdefault(_PENDING_KEY, []).append((self, dict(resolved)))
+
+    def publish(self, resolved: Mapping[str, int]) -> None:
+        with self._lock:
+            for ext, acct_id in resolved.items():
+                self._ids[ext] = acct_id
+                self._ids.move_to_end(ext)
+            while len(self._ids) > self.max_size:
+                self._ids.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, external_id: Optional[str] = None) -> None:
+        with self._lock:
+            if external_id is None:
+                self._ids.clear()
+            else:
+                self._ids.pop(external_id, None)
+
+    def resolve_many(self, db: Session, wanted: Mapping[str, str]) -> Dict[str, int]:
+        """Map each external_id to its account id, creating missing accounts with the given country."""
+        found, missing = self._lookup(wanted)
+        if missing:
+            dialect = db.get_bind().dialect.name
+            resolved: Dict[str, int] = {}
+            for _ in range(_RESOLVE_ROUNDS):
+                *head, last = _upsert_stmts(dialect, missing)
+                for stmt in head:
+                    db.execute(stmt)
+                resolved.update(db.execute(last).all())
+                missing = _pending(missing, resolved)
+                if missing:
+                    resolved.update(db.execute(_select_stmt(missing)).all())
+                    missing = _pending(missing, resolved)
+                if not missing:
+                    break
+            else:
+                raise RuntimeError(f"Could not resolve account ids for {sorted(missing)}")
+            self._park(db, resolved)
+            found.update(resolved)
+        return found
+
+    def resolve(self, db: Session, external_id: str, country: str) -> int:
+        return self.resolve_many(db, {external_id: country})[external_id]
+
+    async def aresolve_many(self, db: Any, wanted: Mapping[str, str]) -> Dict[str, int]:
+        """resolve_many for an AsyncSession."""
+        found, missing = self._lookup(wanted)
+        if missing:
+            dialect = db.get_bind().dialect.name
+            resolved: Dict[str, int] = {}
+            for _ in range(_RESOLVE_ROUNDS):
+                *head, last = _upsert_stmts(dialect, missing)
+                for stmt in head:
+                    await db.execute(stmt)
+                resolved.update((await db.execute(last)).all())
+                missing = _pending(missing, resolved)
+                if missing:
+                    resolved.update((await db.execute(_select_stmt(missing))).all())
+                    missing = _pending(missing, resolved)
+                if not missing:
+                    break
+            else:
+                raise RuntimeError(f"Could not resolve account ids for {sorted(missing)}")
+            self._park(db.sync_session, resolved)
+            found.update(resolved)
+        return found
+
+    async def aresolve(self, db: Any, external_id: str, country: str) -> int:
+        return (await self.aresolve_many(db, {external_id: country}))[external_id]
+
+
+account_resolver = AccountResolver(max_size=get_settings().ACCOUNT_CACHE_SIZE)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session) -> None:
+    for resolver, resolved in session.info.pop(_PENDING_KEY, ()):
+        resolver.publish(resolved)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,180 @@
+"""
+Monthly partition maintenance for the range-partitioned `transactions` and `alerts`
+tables (migration 0004). Safe to run repeatedly, e.g. from cron:
+
+    python -m db.partitions --months-ahead 3 --retention-months 24 --archive-schema archive
+
+- creates missing partitions from the current month up to `months_ahead` ahead
+- detaches partitions that end before the retention horizon and either moves them
+  to `archive_schema` or drops them
+- reports per-partition bounds, estimated rows and size
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from dataclasses import asdict, dataclass
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+from sqlalchemy import create_engine, text
+
+TABLES: Dict[str, str] = {"transactions": "tx_ts", "alerts": "created_at"}
+_LOCK_KEY = 0x414D4C5950  # pg_advisory_xact_lock key, one maintenance run at a time
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+@dataclass(frozen=True)
+class PartitionInfo:
+    name: str
+    lo: Optional[date]  # None for a DEFAULT partition
+    hi: Optional[date]
+    est_rows: int = 0
+    total_bytes: int = 0
+
+
+def add_months(d: date, n: int) -> date:
+    m = d.month - 1 + n
+    return date(d.year + m // 12, m % 12 + 1, 1)
+
+
+def partition_name(table: str, lo: date) -> str:
+    return f"{table}_p_{lo.strftime('%Y_%m')}"  # same naming as migration 0004
+
+
+def parse_bounds(expr: str) -> Tuple[Optional[date], Optional[date]]:
+    m = _BOUND_RE.search(expr or "")
+    if not m:
+        return None, None
+    return datetime.fromisoformat(m.group(1)).date(), datetime.fromisoformat(m.group(2)).date()
+
+
+def plan(
+    table: str,
+    existing: Sequence[PartitionInfo],
+    today: date,
+    months_ahead: int = 3,
+    retention_months: Optional[int] = None,
+) -> Tuple[List[Tuple[str, date, date]], List[PartitionInfo]]:
+    """Return (partitions to create, partitions to detach) without touching the DB."""
+    have = {p.lo for p in existing if p.lo is not None}
+    first = today.replace(day=1)
+    create = [
+        (partition_name(table, lo), lo, add_months(lo, 1))
+        for lo in (add_months(first, i) for i in range(months_ahead + 1))
+        if lo not in have
+    ]
+    detach: List[PartitionInfo] = []
+    if retention_months is not None:
+        horizon = add_months(first, -retention_months)
+        detach = [p for p in existing if p.hi is not None and p.hi <= horizon]
+    return create, detach
+
+
+def list_partitions(conn: Any, table: str) -> List[PartitionInfo]:
+    rows = conn.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint,
+               pg_total_relation_size(c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:t AS regclass)
+        ORDER BY 1
+    """), {"t": table}).all()
+    out = []
+    for name, bound, est_rows, size in rows:
+        lo, hi = parse_bounds(bound)
+        out.append(PartitionInfo(name, lo, hi, max(int(est_rows), 0), int(size)))
+    return out
+
+
+def maintain(
+    conn: Any,
+    table: str,
+    today: Optional[date] = None,
+    months_ahead: int = 3,
+    retention_months: Optional[int] = None,
+    archive_schema: Optional[str] = None,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    if table not in TABLES:
+        raise ValueError(f"Unknown partitioned table: {table}")
+    create, detach = plan(table, list_partitions(conn, table), today or date.today(), months_ahead, retention_months)
+    if not dry_run:
+        for name, lo, hi in create:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"
+            ))
+            logger.info(f"Created partition {name} [{lo}, {hi})")
+        if archive_schema and detach:
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+        for p in detach:
+            conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {p.name}"))
+            if archive_schema:
+                conn.execute(text(f"ALTER TABLE {p.name} SET SCHEMA {archive_schema}"))
+                logger.info(f"Detached {p.name} into schema {archive_schema}")
+            else:
+                conn.execute(text(f"DROP TABLE {p.name}"))
+                logger.info(f"Detached and dropped {p.name}")
+    return {
+        "table": table,
+        "created": [n for n, _, _ in create],
+        "detached": [p.name for p in detach],
+        "archived_to": archive_schema if detach else None,
+        "dry_run": dry_run,
+    }
+
+
+def report(conn: Any, table: str) -> List[Dict[str, Any]]:
+    return [
+        {**asdict(p), "lo": p.lo and p.lo.isoformat(), "hi": p.hi and p.hi.isoformat()}
+        for p in list_partitions(conn, table)
+    ]
+
+
+def run(
+    db_url: str,
+    tables: Sequence[str] = tuple(TABLES),
+    months_ahead: int = 3,
+    retention_months: Optional[int] = None,
+    archive_schema: Optional[str] = None,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    eng = create_engine(db_url)
+    out: Dict[str, Any] = {"maintenance": [], "partitions": {}}
+    try:
+        with eng.begin() as conn:
+            # serialises concurrent runs (e.g. several replicas on the same cron)
+            conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _LOCK_KEY})
+            for t in tables:
+                out["maintenance"].append(maintain(conn, t, None, months_ahead, retention_months, archive_schema, dry_run))
+        with eng.connect() as conn:
+            for t in tables:
+                out["partitions"][t] = report(conn, t)
+    finally:
+        eng.dispose()
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from common.config import get_settings
+    s = get_settings()
+    ap = argparse.ArgumentParser(description="Create, detach and report monthly partitions")
+    ap.add_argument("--table", action="append", choices=list(TABLES), help="default: all partitioned tables")
+    ap.add_argument("--months-ahead", type=int, default=s.PARTITION_MONTHS_AHEAD)
+    ap.add_argument("--retention-months", type=int, default=s.PARTITION_RETENTION_MONTHS,
+                    help="detach partitions ending before this many months ago (0 disables)")
+    ap.add_argument("--archive-schema", default=s.PARTITION_ARCHIVE_SCHEMA or None,
+                    help="move detached partitions here instead of dropping them")
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--db-url", default=s.db_url)
+    args = ap.parse_args(argv)
+    res = run(args.db_url, args.table or tuple(TABLES), args.months_ahead,
+              args.retention_months or None, args.archive_schema, args.dry_run)
+    print(json.dumps(res, indent=2))
+
+
+if __name__ == "__main__":
+    main()
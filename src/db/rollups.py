@@ -0,0 +1,180 @@
+"""
+Incremental maintenance of `account_daily` (migration 0007), the upserted replacement
+for fully refreshing `mv_account_daily`.
+
+Every transaction is folded into the rollup exactly once, in the same statement that
+flips its `processed` flag, either
+- from the change cursor: `drain()` claims unprocessed rows with SKIP LOCKED, or
+- from the write path: `rollup_insert_sql()` wraps a bulk INSERT (see data.loader).
+
+`check()` compares the rollup with a full recompute over processed rows, and
+`rebuild()` repairs a day range.
+
+    python -m db.rollups drain --loop
+    python -m db.rollups check --since 2025-01-01
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import create_engine, text
+
+# drain/write path take it shared, rebuild() exclusive
+LOCK_KEY = 0x524F4C4C55  # "ROLLU"
+LOCK_SHARED_SQL = f"SELECT pg_advisory_xact_lock_shared({LOCK_KEY})"
+LOCK_EXCLUSIVE_SQL = f"SELECT pg_advisory_xact_lock({LOCK_KEY})"
+
+_AGG = """
+SELECT day, account_id,
+       SUM(sum_out)::numeric(20,4) AS sum_out, SUM(n_out)::bigint AS n_out,
+       SUM(sum_in)::numeric(20,4) AS sum_in, SUM(n_in)::bigint AS n_in
+FROM (
+  SELECT tx_ts::date AS day, src_account AS account_id, amount AS sum_out, 1 AS n_out, 0 AS sum_in, 0 AS n_in FROM {src}
+  UNION ALL
+  SELECT tx_ts::date, dst_account, 0, 0, amount, 1 FROM {src}
+) x
+GROUP BY day, account_id
+"""
+
+# ORDER BY keeps lock acquisition order stable across concurrent upserters
+_UPSERT = """
+INSERT INTO account_daily AS r (day, account_id, sum_out, n_out, sum_in, n_in)
+SELECT * FROM ({agg}) a ORDER BY day, account_id
+ON CONFLICT (day, account_id) DO UPDATE SET
+  sum_out = r.sum_out + EXCLUDED.sum_out, n_out = r.n_out + EXCLUDED.n_out,
+  sum_in = r.sum_in + EXCLUDED.sum_in, n_in = r.n_in + EXCLUDED.n_in,
+  updated_at = NOW()
+"""
+
+
+def upsert_sql(src: str) -> str:
+    """Upsert the deltas of `src`, a CTE/relation with src_account, dst_account, amount, tx_ts."""
+    return _UPSERT.format(agg=_AGG.format(src=src))
+
+
+def rollup_insert_sql(insert_sql: str) -> str:
+    """Wrap an `INSERT ... RETURNING src_account, dst_account, amount, tx_ts` (which must
+    insert processed = true) so the inserted rows are rolled up in the same statement.
+    The wrapped statement returns the number of inserted rows."""
+    return f"WITH ins AS ({insert_sql}), up AS ({upsert_sql('ins')}) SELECT COUNT(*) FROM ins"
+
+
+# data-modifying CTEs always run, so `up` need not be referenced
+_DRAIN = """
+WITH claimed AS (
+  SELECT tx_id, tx_ts FROM transactions
+  WHERE NOT processed
+  ORDER BY tx_ts
+  LIMIT :n
+  FOR UPDATE SKIP LOCKED
+), d AS (
+  UPDATE transactions t SET processed = true
+  FROM claimed c
+  WHERE t.tx_id = c.tx_id AND t.tx_ts = c.tx_ts
+  RETURNING t.src_account, t.dst_account, t.amount, t.tx_ts
+), up AS (""" + upsert_sql("d") + """)
+SELECT COUNT(*) FROM d
+"""
+
+
+def drain_once(conn: Any, batch_size: int = 5000) -> int:
+    """Roll up at most `batch_size` unprocessed transactions; returns how many."""
+    conn.execute(text(LOCK_SHARED_SQL))
+    return int(conn.execute(text(_DRAIN), {"n": batch_size}).scalar_one())
+
+
+def drain(engine: Any, batch_size: int = 5000, loop: bool = False, idle_sleep: float = 1.0) -> int:
+    """Drain the cursor until empty (or forever with `loop`), one transaction per batch."""
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            n = drain_once(conn, batch_size)
+        total += n
+        if n:
+            logger.debug(f"Rolled up {n} transactions ({total} total)")
+        elif loop:
+            time.sleep(idle_sleep)
+        else:
+            return total
+
+
+_RANGE = "(SELECT src_account, dst_account, amount, tx_ts FROM transactions WHERE {where}) AS src"
+
+_CHECK = f"""
+WITH f AS ({_AGG.format(src=_RANGE.format(where="processed AND tx_ts >= :lo AND tx_ts < :hi"))}),
+r AS (SELECT day, account_id, sum_out, n_out, sum_in, n_in FROM account_daily WHERE day >= :lo AND day < :hi)
+SELECT COALESCE(f.day, r.day) AS day, COALESCE(f.account_id, r.account_id)::text AS account_id,
+       f.sum_out AS expected_sum_out, r.sum_out AS actual_sum_out, f.n_out AS expected_n_out, r.n_out AS actual_n_out,
+       f.sum_in AS expected_sum_in, r.sum_in AS actual_sum_in, f.n_in AS expected_n_in, r.n_in AS actual_n_in
+FROM f FULL OUTER JOIN r ON f.day = r.day AND f.account_id = r.account_id
+WHERE (COALESCE(f.sum_out, 0), COALESCE(f.n_out, 0), COALESCE(f.sum_in, 0), COALESCE(f.n_in, 0))
+   IS DISTINCT FROM (COALESCE(r.sum_out, 0), COALESCE(r.n_out, 0), COALESCE(r.sum_in, 0), COALESCE(r.n_in, 0))
+ORDER BY 1, 2
+LIMIT :limit
+"""
+
+
+def check(conn: Any, lo: date, hi: date, limit: int = 100) -> List[Dict[str, Any]]:
+    """Rows where the rollup disagrees with a full recompute over [lo, hi); empty means consistent.
+
+    Unprocessed rows are excluded on both sides, so a running drain does not cause
+    false positives (the comparison is one statement, i.e. one snapshot)."""
+    rows = conn.execute(text(_CHECK), {"lo": lo, "hi": hi, "limit": limit}).mappings().all()
+    return [dict(r) for r in rows]
+
+
+def rebuild(conn: Any, lo: date, hi: date) -> int:
+    """Recompute [lo, hi) from scratch and mark its transactions processed."""
+    conn.execute(text(LOCK_EXCLUSIVE_SQL))  # waits for in-flight drains/loads
+    conn.execute(text("DELETE FROM account_daily WHERE day >= :lo AND day < :hi"), {"lo": lo, "hi": hi})
+    conn.execute(
+        text("UPDATE transactions SET processed = true WHERE NOT processed AND tx_ts >= :lo AND tx_ts < :hi"),
+        {"lo": lo, "hi": hi},
+    )
+    res = conn.execute(text(upsert_sql(_RANGE.format(where="tx_ts >= :lo AND tx_ts < :hi"))), {"lo": lo, "hi": hi})
+    logger.info(f"Rebuilt account_daily for [{lo}, {hi}): {res.rowcount} rows")
+    return res.rowcount
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from common.config import get_settings
+    s = get_settings()
+    ap = argparse.ArgumentParser(description="Maintain and verify the account_daily rollup")
+    ap.add_argument("--db-url", default=s.db_url)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    d = sub.add_parser("drain", help="roll up unprocessed transactions")
+    d.add_argument("--batch-size", type=int, default=s.ROLLUP_BATCH_SIZE)
+    d.add_argument("--loop", action="store_true", help="keep polling for new rows")
+    d.add_argument("--idle-sleep", type=float, default=s.ROLLUP_IDLE_SLEEP_S)
+    for name in ("check", "rebuild"):
+        p = sub.add_parser(name)
+        p.add_argument("--since", type=date.fromisoformat, required=True)
+        p.add_argument("--until", type=date.fromisoformat, default=date.max)
+        if name == "check":
+            p.add_argument("--limit", type=int, default=100)
+    args = ap.parse_args(argv)
+
+    eng = create_engine(args.db_url)
+    try:
+        if args.cmd == "drain":
+            print(f"{drain(eng, args.batch_size, args.loop, args.idle_sleep)} transactions rolled up")
+        elif args.cmd == "check":
+            with eng.connect() as conn:
+                bad = check(conn, args.since, args.until, args.limit)
+            print(json.dumps(bad, indent=2, default=str) if bad else "account_daily is consistent")
+            if bad:
+                raise SystemExit(1)
+        else:
+            with eng.begin() as conn:
+                rebuild(conn, args.since, args.until)
+    finally:
+        eng.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import insert, select, text
+from sqlalchemy.exc import IntegrityError
+
+from db.models import Alert, Transaction
+
+Item = Tuple[Dict[str, Any], Optional[Dict[str, Any]]]  # (transaction row, alert row or None)
+_DATETIME_KEYS = ("timestamp", "created_at")
+
+
+class WriteBehindFull(RuntimeError):
+    """Raised by submit() when the queue stayed full for the whole put timeout."""
+
+
+def pg_id_allocator(session_factory: Callable[[], Any], table: str = "transactions", column: str = "id"):
+    """Reserve blocks of ids from the table's serial sequence; nextval needs no commit."""
+    q = text("SELECT nextval(pg_get_serial_sequence(:t, :c)) FROM generate_series(1, :n)")
+
+    def next_ids(n: int) -> List[int]:
+        with session_factory() as db:
+            return list(db.execute(q, {"t": table, "c": column, "n": n}).scalars())
+    return next_ids
+
+
+def _encode(item: Item) -> str:
+    def enc(row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        return {k: v.isoformat() if isinstance(v, datetime) else v for k, v in row.items()}
+    return json.dumps([enc(item[0]), enc(item[1])], separators=(",", ":"))
+
+
+def _decode(line: str) -> Item:
+    def dec(row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        return {k: datetime.fromisoformat(v) if k in _DATETIME_KEYS and v else v for k, v in row.items()}
+    tx, alert = json.loads(line)
+    return dec(tx), dec(alert)  # type: ignore[return-value]
+
+
+class _Segment:
+    """
+    An open WAL segment. The file holds an exclusive flock for as long as the writer owns
+    it, so replay in other processes skips it; the lock goes away with the process.
+
+    fsync is group-committed: `sync(upto)` returns at once if an earlier fsync already
+    covered line `upto`, otherwise one fsync covers every line written so far.
+    """
+    def __init__(self, path: Path) -> None:
+        tmp = path.with_suffix(".tmp")
+        self.file = tmp.open("a", encoding="utf-8")
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        os.replace(tmp, path)  # visible to replay only once locked
+        self.path = path
+        self.written = 0  # lines appended and flushed to the OS (under the writer's _cond)
+        self.synced = 0
+        self._sync_lock = threading.Lock()
+
+    def append(self, line: str) -> int:
+        self.file.write(line)
+        self.file.flush()
+        self.written += 1
+        return self.written
+
+    def sync(self, upto: Optional[int] = None) -> None:
+        upto = self.written if upto is None else upto
+        with self._sync_lock:
+            if self.synced >= upto:
+                return
+            target = self.written
+            os.fsync(self.file.fileno())
+            self.synced = target
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class WriteBehindWriter:
+    """
+    Takes scored transactions (and their alerts) off the request path.
+
+    Requests get a transaction id up front from `next_id()` (reserved in blocks) and
+    `submit()` the rows; a background thread flushes them with multi-row INSERTs every
+    `max_rows` rows or `max_delay_ms`, whichever comes first.
+
+    Durability:
+      - wal_dir=None: acknowledged once queued in memory; a crash loses the queue.
+      - wal_dir set:  acknowledged once appended (and fsynced) to a local WAL segment.
+        Concurrent submits share one fsync. Segments are deleted after their rows commit.
+        Before its first batch the flusher thread replays segments not locked by a live
+        writer, skipping transaction ids that already made it to the DB. Replay retries
+        like any batch, so leftover segments never fail construction while the DB is down.
+
+    A batch whose flush fails stays queued and is retried with backoff until it commits,
+    so acknowledged rows are not dropped during a DB outage; rows the DB rejects outright
+    (integrity errors) are dropped one by one and counted in `failed_rows`. While a batch
+    is pending it counts against `capacity`: once `capacity` rows are waiting, submit()
+    blocks for up to `put_timeout` seconds and then raises WriteBehindFull.
+
+    close() stops intake and flushes what is left, giving up after `max_retries` failed
+    attempts; unflushed WAL segments are then kept for replay.
+    """
+    def __init__(
+        self,
+        session_factory: Callable[[], Any],
+        next_ids: Callable[[int], List[int]],
+        max_rows: int = 500,
+        max_delay_ms: int = 50,
+        capacity: int = 20_000,
+        put_timeout: float = 1.0,
+        wal_dir: Optional[str] = None,
+        wal_fsync: bool = True,
+        id_block: int = 1000,
+        max_retries: int = 5,
+    ) -> None:
+        self._session_factory = session_factory
+        self._next_ids = next_ids
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000.0
+        self.capacity = capacity
+        self.put_timeout = put_timeout
+        self.wal_fsync = wal_fsync
+        self.id_block = id_block
+        self.max_retries = max_retries
+
+        self._items: Deque[Item] = deque()
+        self._inflight = 0  # rows taken by the flusher and not yet committed
+        self._cond = threading.Condition()
+        self._closed = False
+        self._ids: Deque[int] = deque()
+        self._id_lock = threading.Lock()
+
+        self.flushed_rows = 0
+        self.flushed_batches = 0
+        self.failed_rows = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+
+        self._wal_dir = Path(wal_dir) if wal_dir else None
+        self._wal_seq = 0
+        self._wal: Optional[_Segment] = None
+        if self._wal_dir is not None:
+            self._wal_dir.mkdir(parents=True, exist_ok=True)
+            self._open_segment()  # locked, so our own replay skips it
+
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    # ---- request side ----
+    def next_id(self) -> int:
+        with self._id_lock:
+            if not self._ids:
+                self._ids.extend(self._next_ids(self.id_block))
+            return self._ids.popleft()
+
+    def submit(self, tx_row: Dict[str, Any], alert_row: Optional[Dict[str, Any]] = None) -> None:
+        item = (tx_row, alert_row)
+        deadline = time.monotonic() + self.put_timeout
+        segment, line = None, 0
+        with self._cond:
+            while len(self._items) + self._inflight >= self.capacity and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise WriteBehindFull(f"write-behind queue full ({self.capacity} rows)")
+            if self._closed:
+                raise RuntimeError("write-behind writer is closed")
+            if self._wal is not None:
+                segment = self._wal
+                line = segment.append(_encode(item) + "\n")
+            self._items.append(item)
+            if len(self._items) >= self.max_rows:
+                self._cond.notify_all()
+        if segment is not None and self.wal_fsync:
+            segment.sync(line)  # outside _cond; waiters share one fsync
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self._items) + self._inflight, "capacity": self.capacity,
+            "flushed_rows": self.flushed_rows, "flushed_batches": self.flushed_batches,
+            "failed_rows": self.failed_rows, "failed_flushes": self.failed_flushes,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "durability": "wal" if self._wal_dir else "memory",
+        }
+
+    # ---- WAL ----
+    def _open_segment(self) -> None:
+        assert self._wal_dir is not None
+        self._wal_seq += 1
+        self._wal = _Segment(self._wal_dir / f"{os.getpid()}-{time.time_ns()}-{self._wal_seq:06d}.wal")
+
+    def _rotate(self) -> Optional[_Segment]:
+        """Hand the current segment to the flusher (caller holds _cond) and start a new one.
+        The flusher keeps it open, and so locked, until its rows have committed."""
+        done = self._wal
+        if done is None:
+            return None
+        if self._closed:
+            self._wal = None
+        else:
+            self._open_segment()
+        return done
+
+    def _replay(self) -> None:
+        """Replay segments left by dead writers (flusher thread). A segment is unlinked only
+        once its rows committed; if closing gives up on one, it and the rest stay for later."""
+        assert self._wal_dir is not None
+        for seg in sorted(self._wal_dir.glob("*.wal")):
+            try:
+                f = seg.open("r", encoding="utf-8")
+            except FileNotFoundError:  # replayed by another process meanwhile
+                continue
+            with f:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:  # owned by a live writer
+                    continue
+                if os.fstat(f.fileno()).st_nlink == 0:  # replayed and unlinked while we waited
+                    continue
+                items = [_decode(line) for line in f if line.strip()]
+                if self._flush(items, replay=True):
+                    logger.error(f"Keeping WAL segment {seg.name} for replay on next start")
+                    return
+                logger.info(f"Replayed WAL segment {seg.name} ({len(items)} rows)")
+                seg.unlink()
+
+    def _uncommitted(self, batch: List[Item]) -> List[Item]:
+        with self._session_factory() as db:
+            ids = [tx["id"] for tx, _ in batch]
+            done = set(db.execute(select(Transaction.id).where(Transaction.id.in_(ids))).scalars())
+        return [it for it in batch if it[0]["id"] not in done]
+
+    # ---- flusher ----
+    def _write(self, batch: List[Item]) -> None:
+        t0 = time.perf_counter()
+        with self._session_factory() as db:
+            for i in range(0, len(batch), self.max_rows):
+                chunk = batch[i:i + self.max_rows]
+                db.execute(insert(Transaction), [tx for tx, _ in chunk])
+                alerts = [a for _, a in chunk if a is not None]
+                if alerts:
+                    db.execute(insert(Alert), alerts)
+            db.commit()
+        self.last_flush_ms = (time.perf_counter() - t0) * 1000
+        self.flushed_rows += len(batch)
+        self.flushed_batches += 1
+
+    def _take(self) -> Tuple[List[Item], Optional[Path]]:
+        with self._cond:
+            deadline: Optional[float] = None
+            while not self._closed and len(self._items) < self.max_rows:
+                if not self._items:
+                    deadline = None
+                    self._cond.wait()
+                    continue
+                if deadline is None:
+                    deadline = time.monotonic() + self.max_delay
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = list(self._items)
+            self._items.clear()
+            self._inflight = len(batch)
+            segment = self._rotate() if batch or self._closed else None
+            return batch, segment
+
+    def _write_rows(self, batch: List[Item]) -> List[Item]:
+        """Write row by row, dropping rows the DB rejects; returns the rows left unwritten
+        if a different error interrupts."""
+        for i, item in enumerate(batch):
+            try:
+                self._write([item])
+            except IntegrityError as e:
+                self.failed_rows += 1
+                logger.error(f"Dropping write-behind row {item[0].get('id')}: {e.orig}")
+            except Exception:
+                logger.exception("Write-behind row flush failed")
+                return batch[i:]
+        return []
+
+    def _flush(self, batch: List[Item], replay: bool = False) -> bool:
+        """Write the batch, retrying until it commits. Only gives up once closing;
+        returns True if rows were left unwritten. With `replay`, rows whose ids are
+        already in the DB are skipped first."""
+        attempt = 0
+        while batch:
+            try:
+                if replay:
+                    batch = self._uncommitted(batch)
+                    if not batch:
+                        return False
+                self._write(batch)
+                return False
+            except IntegrityError:
+                # one bad row would fail the batch forever; isolate it
+                batch = self._write_rows(batch)
+                if not batch:
+                    return False
+            except Exception:
+                logger.exception(f"Write-behind flush of {len(batch)} rows failed (attempt {attempt + 1})")
+            self.failed_flushes += 1
+            attempt += 1
+            with self._cond:
+                closing = self._closed
+            if closing and attempt >= self.max_retries:
+                self.failed_rows += len(batch)
+                logger.error(f"Giving up on {len(batch)} write-behind rows at shutdown")
+                return True
+            time.sleep(min(0.1 * 2 ** attempt, 5.0))
+        return False
+
+    def _run(self) -> None:
+        if self._wal_dir is not None:
+            self._replay()
+        while True:
+            batch, segment = self._take()
+            if segment is not None and self.wal_fsync:
+                segment.sync()  # releases submitters still waiting on this segment
+            unwritten = self._flush(batch)
+            if segment is not None:
+                if unwritten:
+                    logger.error(f"Keeping WAL segment {segment.path.name} for replay on next start")
+                else:
+                    segment.path.unlink(missing_ok=True)
+                segment.close()
+            with self._cond:
+                self._inflight = 0
+                self._cond.notify_all()  # wake submitters blocked on capacity
+                if self._closed and not self._items:
+                    return
+
+    def close(self, timeout: float = 30.0) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import threading
+import time
+
+import numpy as np
+
+
+def _epoch(ts: datetime) -> float:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+@dataclass(frozen=True)
+class AccountHistory:
+    """
+    Read-only, oldest-first view of an account's recent transactions.
+    Columnar consumers use the arrays directly; iterating yields
+    {amount, country, timestamp} dicts, the only history fields the rules read
+    (unlike `fetch_account_history`, there is no id or currency).
+    """
+    timestamps: np.ndarray  # float64 epoch seconds (UTC)
+    amounts: np.ndarray     # float64
+    countries: np.ndarray   # S2
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def extended(self, timestamps: np.ndarray, amounts: np.ndarray, countries: np.ndarray) -> "AccountHistory":
+        """A new view with extra rows appended (e.g. earlier items of the same ingest batch)."""
+        return AccountHistory(
+            np.concatenate([self.timestamps, timestamps]),
+            np.concatenate([self.amounts, amounts]),
+            np.concatenate([self.countries, np.asarray(countries, dtype="S2")]),
+        )
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for t, a, c in zip(self.timestamps, self.amounts, self.countries):
+            yield {
+                "amount": float(a),
+                "country": c.decode(),
+                "timestamp": datetime.fromtimestamp(t, tz=timezone.utc),
+            }
+
+
+class _Ring:
+    __slots__ = ("ts", "amount", "country", "head", "size", "loaded_at")
+
+    def __init__(self, capacity: int) -> None:
+        self.ts = np.empty(capacity, dtype=np.float64)
+        self.amount = np.empty(capacity, dtype=np.float64)
+        self.country = np.empty(capacity, dtype="S2")
+        self.head = 0  # next write slot
+        self.size = 0
+        self.loaded_at = time.monotonic()
+
+    def append(self, ts: float, amount: float, country: str) -> None:
+        cap = len(self.ts)
+        self.ts[self.head] = ts
+        self.amount[self.head] = amount
+        self.country[self.head] = (country or "").upper().encode()[:2]
+        self.head = (self.head + 1) % cap
+        self.size = min(self.size + 1, cap)
+
+    def view(self, since: float) -> AccountHistory:
+        cap = len(self.ts)
+        idx = (np.arange(self.head - self.size, self.head)) % cap
+        keep = idx[self.ts[idx] >= since]
+        return AccountHistory(self.ts[keep], self.amount[keep], self.country[keep])
+
+
+class AccountHistoryStore:
+    """
+    Process-local, bounded store of per-account ring buffers.
+
+    - `append` is called on ingest; it only touches accounts already resident,
+      since a cold account will pick the row up when it is warmed from the DB.
+    - `get` warms an account from the DB on first access (or after `ttl_seconds`,
+      so rows written by other workers are eventually seen).
+    - Accounts are evicted LRU once the total row budget is exceeded.
+    """
+    def __init__(self, per_account: int = 512, max_rows: int = 2_000_000, ttl_seconds: Optional[float] = 300.0) -> None:
+        self.per_account = per_account
+        self.max_rows = max_rows
+        self.ttl_seconds = ttl_seconds
+        self._rings: "OrderedDict[int, _Ring]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+    def _fresh(self, ring: _Ring) -> bool:
+        return self.ttl_seconds is None or time.monotonic() - ring.loaded_at < self.ttl_seconds
+
+    def _evict(self) -> None:
+        while len(self._rings) * self.per_account > self.max_rows and len(self._rings) > 1:
+            self._rings.popitem(last=False)
+
+    def append(self, account_id: int, timestamp: datetime, amount: float, country: str) -> None:
+        with self._lock:
+            ring = self._rings.get(account_id)
+            if ring is not None:
+                ring.append(_epoch(timestamp), float(amount), country)
+                self._rings.move_to_end(account_id)
+
+    def load(self, account_id: int, rows: Iterator[tuple]) -> _Ring:
+        """Replace an account's buffer with (timestamp, amount, country) rows, oldest first."""
+        ring = _Ring(self.per_account)
+        for ts, amount, country in rows:
+            ring.append(_epoch(ts), float(amount), country)
+        with self._lock:
+            self._rings[account_id] = ring
+            self._rings.move_to_end(account_id)
+            self._evict()
+        return ring
+
+    def invalidate(self, account_id: Optional[int] = None) -> None:
+        with self._lock:
+            if account_id is None:
+                self._rings.clear()
+            else:
+                self._rings.pop(account_id, None)
+
+    def get(self, db: Any, account_id: int, hours: int = 72) -> AccountHistory:
+        since = time.time() - hours * 3600
+        with self._lock:
+            ring = self._rings.get(account_id)
+            if ring is not None and self._fresh(ring):
+                self._rings.move_to_end(account_id)
+                return ring.view(since)
+        ring = self.load(account_id, _query_history(db, account_id, hours, self.per_account))
+        with self._lock:
+            return ring.view(since)
+
+    async def aget(self, db: Any, account_id: int, hours: int = 72) -> AccountHistory:
+        """`get` for an AsyncSession; only a cold or expired account awaits the DB."""
+        since = time.time() - hours * 3600
+        with self._lock:
+            ring = self._rings.get(account_id)
+            if ring is not None and self._fresh(ring):
+                self._rings.move_to_end(account_id)
+                return ring.view(since)
+        rows = (await db.execute(_history_stmt(account_id, hours, self.per_account))).all()
+        ring = self.load(account_id, reversed(rows))
+        with self._lock:
+            return ring.view(since)
+
+    def get_many(self, db: Any, account_ids: Iterable[int], hours: int = 72) -> Dict[int, AccountHistory]:
+        """Like `get` for many accounts; all cold accounts are warmed with a single query."""
+        since = time.time() - hours * 3600
+        out: Dict[int, AccountHistory] = {}
+        cold: List[int] = []
+        with self._lock:
+            for acct in dict.fromkeys(account_ids):
+                ring = self._rings.get(acct)
+                if ring is not None and self._fresh(ring):
+                    self._rings.move_to_end(acct)
+                    out[acct] = ring.view(since)
+                else:
+                    cold.append(acct)
+        if cold:
+            rows: Dict[int, List[tuple]] = {a: [] for a in cold}
+            for acct, ts, amount, country in _query_histories(db, cold, hours):
+                rows[acct].append((ts, amount, country))
+            for acct, acct_rows in rows.items():
+                ring = self.load(acct, iter(acct_rows[-self.per_account:]))
+                with self._lock:
+                    out[acct] = ring.view(since)
+        return out
+
+
+def _query_histories(db: Any, account_ids: List[int], hours: int) -> Iterator[tuple]:
+    from sqlalchemy import select
+    from db.models import Transaction
+    t_start = datetime.utcnow() - timedelta(hours=hours)
+    return iter(db.execute(
+        select(Transaction.account_id, Transaction.timestamp, Transaction.amount, Transaction.country).where(
+            Transaction.account_id.in_(account_ids),
+            Transaction.timestamp >= t_start
+        ).order_by(Transaction.account_id, Transaction.timestamp)
+    ).all())
+
+
+def _history_stmt(account_id: int, hours: int, limit: int) -> Any:
+    # Only the three columns the buffer keeps; no ORM objects.
+    from sqlalchemy import select
+    from db.models import Transaction
+    t_start = datetime.utcnow() - timedelta(hours=hours)
+    return select(Transaction.timestamp, Transaction.amount, Transaction.country).where(
+        Transaction.account_id == account_id,
+        Transaction.timestamp >= t_start
+    ).order_by(Transaction.timestamp.desc()).limit(limit)
+
+
+def _query_history(db: Any, account_id: int, hours: int, limit: int) -> Iterator[tuple]:
+    return reversed(db.execute(_history_stmt(account_id, hours, limit)).all())
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import numpy as np
 
 from features.store import FeatureStore
-from rules_engine.dsl import Rule, score as rules_score
+from rules_engine.dsl import Rule
+from rules_engine.planner import RuleSetPlan
 from aml.anomaly import AnomalyModel
 
 
@@ -19,6 +20,17 @@ class ScoringPipeline:
     def __init__(self, feature_store: FeatureStore, anomaly_model: Optional[AnomalyModel] = None) -> None:
         self.feature_store = feature_store
         self.anomaly_model = anomaly_model
+        # plan for the last rule set seen, keyed by its contents (a list the caller edits
+        # in place gets a new plan); comparing the same Rule objects is identity-only
+        self._rules_key: Optional[Tuple[Rule, ...]] = None
+        self._plan: Optional[RuleSetPlan] = None
+
+    def rules_plan(self, rules: List[Rule]) -> RuleSetPlan:
+        key = tuple(rules)
+        if self._plan is None or key != self._rules_key:
+            self._plan = RuleSetPlan(key)
+            self._rules_key = key
+        return self._plan
 
     def _vectorize(self, payload: Dict[str, Any], feature_names: List[str]) -> np.ndarray:
         feats = [payload.get(n) for n in feature_names]
@@ -38,7 +50,7 @@ class ScoringPipeline:
         cached = self.feature_store.get_features(feature_namespace, entity_id, feature_names)
         enriched = {**payload, **{n.split(":")[-1]: v for n, v in cached.items()}}
 
-        r_score = float(rules_score(rules, enriched))
+        r_score = float(self.rules_plan(rules).score(enriched))
         a_score = 0.0
         if self.anomaly_model:
             X = self._vectorize(enriched, feature_names)
@@ -0,0 +1,325 @@
+"""
+Backtest a candidate rules file against the current one over historical transactions.
+
+    python -m rules_engine.backtest --candidate new_rules.yaml --months 12 --out backtest_out
+
+Months are fanned out to a process pool. Each worker streams its month ordered by
+(account, time), rebuilds every account's trailing history window in order and
+scores fixed-size chunks rule by rule, so memory is bounded by `chunk_size` plus one
+account's window. Per month it appends each chunk's transaction ids and bit-packed
+rule hit matrices of both rule sets to `<YYYY-MM>.npz` as it goes (read them back with
+`iter_month`) and keeps the summary as running counts; `summary.json` holds per-rule
+hit counts and the deltas, keyed by `rule_ids`.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from rules_engine.engine import RuleEngine, TxBatch, _epoch
+
+
+@dataclass(frozen=True)
+class BacktestJob:
+    db_url: str
+    baseline_path: str
+    candidate_path: str
+    month: date
+    history_hours: int
+    out_dir: str
+    chunk_size: int = 50_000
+
+
+def _add_month(d: date, n: int = 1) -> date:
+    m = d.month - 1 + n
+    return date(d.year + m // 12, m % 12 + 1, 1)
+
+
+def month_range(end: date, months: int) -> List[date]:
+    last = end.replace(day=1)
+    return [_add_month(last, -i) for i in range(months - 1, -1, -1)]
+
+
+def history_hours(*engines: RuleEngine, default: int = 72) -> int:
+    """Longest trailing window any rule looks at (ingest uses 72h)."""
+    return max([default] + [int(getattr(r, "window_hours", 0)) for e in engines for r in e.rules])
+
+
+def _stream_rows(db_url: str, lo: datetime, hi: datetime, yield_per: int) -> Iterator[Tuple[Any, ...]]:
+    from sqlalchemy import create_engine, select
+    from db.models import Transaction
+    eng = create_engine(db_url)
+    try:
+        with eng.connect() as conn:
+            q = (
+                select(Transaction.id, Transaction.account_id, Transaction.timestamp,
+                       Transaction.amount, Transaction.country)
+                .where(Transaction.timestamp >= lo, Transaction.timestamp < hi)
+                .order_by(Transaction.account_id, Transaction.timestamp, Transaction.id)
+            )
+            yield from conn.execution_options(stream_results=True, yield_per=yield_per).execute(q)
+    finally:
+        eng.dispose()
+
+
+class _ChunkBuilder:
+    """Accumulates (tx, trailing window) pairs into TxBatch column buffers."""
+    def __init__(self) -> None:
+        self.ids: List[int] = []
+        self.amount: List[float] = []
+        self.country: List[str] = []
+        self.ts: List[float] = []
+        self.sizes: List[int] = []
+        self.h_amount: List[float] = []
+        self.h_country: List[str] = []
+        self.h_ts: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, tx_id: int, ts: float, amount: float, country: str, window: Deque[Tuple[float, float, str]]) -> None:
+        self.ids.append(tx_id)
+        self.ts.append(ts)
+        self.amount.append(amount)
+        self.country.append(country)
+        self.sizes.append(len(window))
+        for t, a, c in window:
+            self.h_ts.append(t)
+            self.h_amount.append(a)
+            self.h_country.append(c)
+
+    def build(self) -> Tuple[np.ndarray, TxBatch]:
+        offsets = np.zeros(len(self.sizes) + 1, dtype=np.int64)
+        np.cumsum(self.sizes, out=offsets[1:])
+        batch = TxBatch(
+            amount=np.asarray(self.amount, dtype=np.float64),
+            country=np.asarray(self.country, dtype=str),
+            timestamp=np.asarray(self.ts, dtype=np.float64),
+            offsets=offsets,
+            hist_amount=np.asarray(self.h_amount, dtype=np.float64),
+            hist_country=np.asarray(self.h_country, dtype=str),
+            hist_timestamp=np.asarray(self.h_ts, dtype=np.float64),
+        )
+        return np.asarray(self.ids, dtype=np.int64), batch
+
+
+def rule_ids(engine: RuleEngine) -> List[str]:
+    """Summary keys: the rule's name, suffixed #2, #3, ... when a rules file repeats it."""
+    seen: Dict[str, int] = {}
+    out = []
+    for r in engine.rules:
+        seen[r.name] = seen.get(r.name, 0) + 1
+        out.append(r.name if seen[r.name] == 1 else f"{r.name}#{seen[r.name]}")
+    return out
+
+
+def _hit_matrix(engine: RuleEngine, batch: TxBatch) -> np.ndarray:
+    # per rule, positionally: evaluate_batch's scores dict is keyed by name
+    if not engine.rules:
+        return np.zeros((0, len(batch)), bool)
+    return np.stack([r.evaluate_batch(batch)[0] > 0 for r in engine.rules])
+
+
+class _MonthWriter:
+    """
+    Streams a month's chunks into an .npz archive: per chunk k, `tx_id_k` and the
+    packed `baseline_k`/`candidate_k` hit matrices, plus `n` and `chunks` at close.
+    Written to a temporary name and renamed on close.
+    """
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._tmp = path.with_name(path.name + ".tmp")
+        self._zf = zipfile.ZipFile(self._tmp, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        self.chunks = 0
+        self.n = 0
+
+    def _put(self, name: str, arr: Any) -> None:
+        with self._zf.open(f"{name}.npy", "w", force_zip64=True) as f:
+            np.lib.format.write_array(f, np.asanyarray(arr), allow_pickle=False)
+
+    def add(self, tx_ids: np.ndarray, base: np.ndarray, cand: np.ndarray) -> None:
+        k = f"{self.chunks:06d}"
+        self._put(f"tx_id_{k}", tx_ids)
+        self._put(f"baseline_{k}", np.packbits(base, axis=1))
+        self._put(f"candidate_{k}", np.packbits(cand, axis=1))
+        self.chunks += 1
+        self.n += len(tx_ids)
+
+    def close(self) -> None:
+        self._put("n", self.n)
+        self._put("chunks", self.chunks)
+        self._zf.close()
+        os.replace(self._tmp, self.path)
+
+
+def iter_month(path: str) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield (tx_id, baseline hits, candidate hits) per chunk of a month file, with the
+    hit matrices unpacked to (rules, rows) bool arrays."""
+    with np.load(path) as z:
+        for k in range(int(z["chunks"])):
+            ids = z[f"tx_id_{k:06d}"]
+            yield (
+                ids,
+                np.unpackbits(z[f"baseline_{k:06d}"], axis=1, count=len(ids)).astype(bool),
+                np.unpackbits(z[f"candidate_{k:06d}"], axis=1, count=len(ids)).astype(bool),
+            )
+
+
+class _MonthTally:
+    """Running summary counts for one month."""
+    def __init__(self, n_base: int, n_cand: int) -> None:
+        self.transactions = 0
+        self.baseline_flagged = 0
+        self.candidate_flagged = 0
+        self.newly_flagged = 0
+        self.no_longer_flagged = 0
+        self.base_rules = np.zeros(n_base, dtype=np.int64)
+        self.cand_rules = np.zeros(n_cand, dtype=np.int64)
+
+    def add(self, base: np.ndarray, cand: np.ndarray) -> None:
+        base_any, cand_any = base.any(axis=0), cand.any(axis=0)
+        self.transactions += base.shape[1]
+        self.baseline_flagged += int(base_any.sum())
+        self.candidate_flagged += int(cand_any.sum())
+        self.newly_flagged += int((cand_any & ~base_any).sum())
+        self.no_longer_flagged += int((base_any & ~cand_any).sum())
+        self.base_rules += base.sum(axis=1)
+        self.cand_rules += cand.sum(axis=1)
+
+    def summary(self, label: str, base_ids: Sequence[str], cand_ids: Sequence[str]) -> Dict[str, Any]:
+        return {
+            "month": label,
+            "transactions": self.transactions,
+            "baseline_flagged": self.baseline_flagged,
+            "candidate_flagged": self.candidate_flagged,
+            "newly_flagged": self.newly_flagged,
+            "no_longer_flagged": self.no_longer_flagged,
+            "baseline_rules": {k: int(h) for k, h in zip(base_ids, self.base_rules)},
+            "candidate_rules": {k: int(h) for k, h in zip(cand_ids, self.cand_rules)},
+        }
+
+
+def run_month(job: BacktestJob) -> Dict[str, Any]:
+    baseline = RuleEngine.from_yaml(job.baseline_path)
+    candidate = RuleEngine.from_yaml(job.candidate_path)
+    lo = datetime(job.month.year, job.month.month, 1)
+    nxt = _add_month(job.month)
+    hi = datetime(nxt.year, nxt.month, 1)
+    horizon = job.history_hours * 3600.0
+    lo_epoch = _epoch(lo)
+
+    label = job.month.strftime("%Y-%m")
+    out = _MonthWriter(Path(job.out_dir) / f"{label}.npz")
+    tally = _MonthTally(len(baseline.rules), len(candidate.rules))
+    chunk = _ChunkBuilder()
+
+    def flush() -> None:
+        nonlocal chunk
+        if len(chunk):
+            tx_ids, batch = chunk.build()
+            base, cand = _hit_matrix(baseline, batch), _hit_matrix(candidate, batch)
+            out.add(tx_ids, base, cand)
+            tally.add(base, cand)
+            chunk = _ChunkBuilder()
+
+    current: Optional[int] = None
+    window: Deque[Tuple[float, float, str]] = deque()
+    # rows before `lo` only warm the trailing windows
+    for tx_id, account_id, ts, amount, country in _stream_rows(
+        job.db_url, lo - timedelta(hours=job.history_hours), hi, yield_per=job.chunk_size
+    ):
+        if account_id != current:
+            current, window = account_id, deque()
+        t = _epoch(ts)
+        window.append((t, float(amount), (country or "").upper()))
+        while window[0][0] < t - horizon:
+            window.popleft()
+        if t >= lo_epoch:
+            chunk.add(int(tx_id), t, float(amount), (country or "").upper(), window)
+            if len(chunk) >= job.chunk_size:
+                flush()
+    flush()
+    out.close()
+
+    summary = tally.summary(label, rule_ids(baseline), rule_ids(candidate))
+    logger.info(f"Backtest {label}: {summary['transactions']} tx, "
+                f"{summary['baseline_flagged']} -> {summary['candidate_flagged']} flagged")
+    return summary
+
+
+def _merge(months: List[Dict[str, Any]]) -> Dict[str, Any]:
+    keys = ("transactions", "baseline_flagged", "candidate_flagged", "newly_flagged", "no_longer_flagged")
+    total: Dict[str, Any] = {k: sum(m[k] for m in months) for k in keys}
+    for side in ("baseline_rules", "candidate_rules"):
+        agg: Dict[str, int] = {}
+        for m in months:
+            for name, n in m[side].items():
+                agg[name] = agg.get(name, 0) + n
+        total[side] = agg
+    n = total["transactions"] or 1
+    total["baseline_hit_rate"] = total["baseline_flagged"] / n
+    total["candidate_hit_rate"] = total["candidate_flagged"] / n
+    total["rule_deltas"] = {
+        name: total["candidate_rules"].get(name, 0) - total["baseline_rules"].get(name, 0)
+        for name in {*total["baseline_rules"], *total["candidate_rules"]}
+    }
+    return {"total": total, "months": months}
+
+
+def run_backtest(
+    db_url: str,
+    baseline_path: str,
+    candidate_path: str,
+    out_dir: str,
+    months: int = 12,
+    end: Optional[date] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 50_000,
+) -> Dict[str, Any]:
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    hours = history_hours(RuleEngine.from_yaml(baseline_path), RuleEngine.from_yaml(candidate_path))
+    jobs = [
+        BacktestJob(db_url, baseline_path, candidate_path, m, hours, out_dir, chunk_size)
+        for m in month_range(end or date.today(), months)
+    ]
+    if workers == 1:
+        results = [run_month(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_month, jobs))
+    report = _merge(results)
+    Path(out_dir, "summary.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from common.config import get_settings
+    s = get_settings()
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--candidate", required=True)
+    ap.add_argument("--baseline", default=s.RULES_PATH)
+    ap.add_argument("--months", type=int, default=12)
+    ap.add_argument("--end", type=date.fromisoformat, default=None, help="last month to include (YYYY-MM-DD)")
+    ap.add_argument("--out", default="backtest_out")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--chunk-size", type=int, default=50_000)
+    ap.add_argument("--db-url", default=s.db_url)
+    args = ap.parse_args(argv)
+    report = run_backtest(args.db_url, args.baseline, args.candidate, args.out, args.months,
+                          args.end, args.workers, args.chunk_size)
+    print(json.dumps(report["total"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
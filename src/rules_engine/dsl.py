@@ -1,7 +1,14 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict, List, Literal, Optional, Protocol, Union, Callable
+from typing import Any, Dict, Iterable, List, Literal, Optional, Protocol, Sequence, Tuple, Union, Callable
+import operator
+import re
+import time
+
+import numpy as np
+
+from .stats import rule_stats
 
 Op = Literal["<", "<=", ">", ">=", "==", "!=", "in", "not_in", "startswith", "endswith", "regex"]
 
@@ -57,8 +64,112 @@ def evaluate(rule: Rule, payload: Dict[str, Any], getter: FieldGetter = default_
     return any_ok and all_ok
 
 
-def score(rules: List[Rule], payload: Dict[str, Any]) -> float:
-    return sum(r.weight for r in rules if evaluate(r, payload))
+def score(rules: Sequence[Union[Rule, "CompiledRule"]], payload: Dict[str, Any]) -> float:
+    total = 0.0
+    timed = rule_stats.enabled
+    for r in rules:
+        t0 = time.perf_counter_ns() if timed else 0
+        hit = r(payload) if isinstance(r, CompiledRule) else evaluate(r, payload)
+        if timed:
+            rule_stats.record(f"dsl:{r.id}", time.perf_counter_ns() - t0, hit)
+        if hit:
+            total += r.weight
+    return total
+
+
+# ---- Compiled form ----
+Check = Callable[[Dict[str, Any]], bool]
+
+_BINARY: Dict[str, Callable[[Any, Any], bool]] = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "==": operator.eq, "!=": operator.ne,
+}
+
+
+def _compile_getter(field: str, getter: FieldGetter) -> Callable[[Dict[str, Any]], Any]:
+    if getter is not default_getter:
+        return lambda data: getter(data, field)
+    tokens = tuple(field.split("."))
+    if len(tokens) == 1:
+        (tok,) = tokens
+        return lambda data: data.get(tok) if isinstance(data, dict) else None
+
+    def get(data: Dict[str, Any]) -> Any:
+        cur: Any = data
+        for token in tokens:
+            if isinstance(cur, dict):
+                cur = cur.get(token)
+            else:
+                return None
+        return cur
+    return get
+
+
+def _freeze(b: Any) -> Any:
+    if isinstance(b, (list, tuple, set, frozenset)):
+        try:
+            return frozenset(b)
+        except TypeError:  # unhashable members: keep linear containment
+            return tuple(b)
+    return b
+
+
+def compile_predicate(p: Predicate, getter: FieldGetter = default_getter) -> Check:
+    get = _compile_getter(p.field, getter)
+    op, b = p.op, p.value
+    if op in _BINARY:
+        fn = _BINARY[op]
+        return lambda data: fn(get(data), b)
+    if op in ("in", "not_in"):
+        members = _freeze(b)
+        negate = op == "not_in"
+
+        def contains(data: Dict[str, Any]) -> bool:
+            a = get(data)
+            try:
+                hit = a in members
+            except TypeError:  # unhashable payload value vs frozenset
+                hit = a in b
+            return hit != negate
+        return contains
+    if op == "startswith":
+        prefix = str(b)
+        return lambda data: str(get(data)).startswith(prefix)
+    if op == "endswith":
+        suffix = str(b)
+        return lambda data: str(get(data)).endswith(suffix)
+    if op == "regex":
+        search = re.compile(str(b)).search
+        return lambda data: search(str(get(data))) is not None
+    raise ValueError(f"Unsupported op: {op}")
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    id: str
+    weight: float
+    any_of: Tuple[Check, ...]
+    all_of: Tuple[Check, ...]
+
+    def __call__(self, payload: Dict[str, Any]) -> bool:
+        if self.any_of and not any(c(payload) for c in self.any_of):
+            return False
+        return all(c(payload) for c in self.all_of)
+
+
+def compile(rule: Rule, getter: FieldGetter = default_getter) -> CompiledRule:
+    """Prebind a rule's predicates: split paths, compiled regexes, frozen `in` sets."""
+    return CompiledRule(
+        id=rule.id,
+        weight=rule.weight,
+        any_of=tuple(compile_predicate(p, getter) for p in rule.any_of),
+        all_of=tuple(compile_predicate(p, getter) for p in rule.all_of),
+    )
+
+
+def score_many(rules: Sequence[Union[Rule, CompiledRule]], payloads: Iterable[Dict[str, Any]]) -> List[float]:
+    compiled = [r if isinstance(r, CompiledRule) else compile(r) for r in rules]
+    return [sum(r.weight for r in compiled if r(p)) for p in payloads]
 
 
 def from_dict(d: Dict[str, Any]) -> Rule:
@@ -69,3 +180,94 @@ def from_dict(d: Dict[str, Any]) -> Rule:
         weight=float(d.get("weight", 1.0)),
         description=d.get("description"),
     )
+
+
+def _freeze_key(v: Any) -> Any:
+    # Tagged with the type: 1, 1.0 and True (or a list and a tuple) compare equal but
+    # str() differently, which startswith/endswith/regex predicates act on.
+    if isinstance(v, (list, tuple)):
+        return type(v), tuple(_freeze_key(x) for x in v)
+    if isinstance(v, (set, frozenset)):
+        return type(v), frozenset(_freeze_key(x) for x in v)
+    if isinstance(v, dict):
+        return dict, tuple(sorted((k, _freeze_key(x)) for k, x in v.items()))
+    return type(v), v
+
+
+def predicate_key(p: Predicate) -> Tuple[str, str, Any]:
+    if p.op in ("in", "not_in") and isinstance(p.value, (list, tuple, set, frozenset)):
+        value = frozenset(_freeze_key(x) for x in p.value)  # membership ignores order and container type
+    else:
+        value = _freeze_key(p.value)
+    return p.field, p.op, value
+
+
+# ---- Columnar form ----
+def _frame_column(df: Any, field: str) -> Any:
+    import pandas as pd
+    if field in df.columns:
+        return df[field]
+    return pd.Series([None] * len(df), index=df.index, dtype=object)
+
+
+def predicate_mask(p: Predicate, df: Any) -> np.ndarray:
+    """Vectorised Predicate over a DataFrame; missing/null values never satisfy ordered comparisons."""
+    col = _frame_column(df, p.field)
+    op, b = p.op, p.value
+    if op in _BINARY:
+        if op in ("==", "!="):
+            mask = _BINARY[op](col, b)
+        else:
+            valid = col.notna().to_numpy()
+            mask = np.zeros(len(col), dtype=bool)
+            if valid.any():
+                mask[valid] = np.asarray(_BINARY[op](col[valid], b), dtype=bool)
+    elif op in ("in", "not_in"):
+        if isinstance(b, str):  # `field in "IRKP"`: substring test, a null field is never in it
+            mask = col.map(lambda a: isinstance(a, str) and a in b).astype(bool)
+        else:
+            mask = col.isin(list(b))
+        if op == "not_in":
+            mask = ~mask
+    elif op == "startswith":
+        mask = col.astype(str).str.startswith(str(b))
+    elif op == "endswith":
+        mask = col.astype(str).str.endswith(str(b))
+    elif op == "regex":
+        mask = col.astype(str).str.contains(str(b), regex=True)
+    else:
+        raise ValueError(f"Unsupported op: {op}")
+    if hasattr(mask, "fillna"):
+        mask = mask.fillna(False)
+    return np.asarray(mask, dtype=bool)
+
+
+def score_frame(rules: Sequence[Rule], df: Any) -> Tuple[Any, np.ndarray]:
+    """
+    Score every row of a DataFrame (or pyarrow Table) at once.
+    Returns (total score Series aligned to df.index, bool hit matrix of shape [rules, rows]).
+    Fields are looked up as column names; dotted paths must exist as flat columns.
+    """
+    import pandas as pd
+    if not isinstance(df, pd.DataFrame) and hasattr(df, "to_pandas"):
+        df = df.to_pandas()
+    n = len(df)
+    masks: Dict[Tuple[str, str, Any], np.ndarray] = {}
+
+    def mask(p: Predicate) -> np.ndarray:
+        k = predicate_key(p)
+        if k not in masks:
+            masks[k] = predicate_mask(p, df)
+        return masks[k]
+
+    hits = np.zeros((len(rules), n), dtype=bool)
+    for j, r in enumerate(rules):
+        row = np.ones(n, dtype=bool)
+        if r.any_of:
+            row &= np.logical_or.reduce([mask(p) for p in r.any_of])
+        for p in r.all_of:
+            row &= mask(p)
+        hits[j] = row
+    weights = np.array([r.weight for r in rules], dtype=np.float64)
+    total = pd.Series(weights @ hits if len(rules) else np.zeros(n), index=df.index, name="rules_score")
+    return total, hits
@@ -1,13 +1,16 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Tuple, Callable
-from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Sequence, Tuple, Callable
+from datetime import datetime, timedelta, timezone
+import time
+import numpy as np
 import yaml
 from loguru import logger
 from sqlalchemy.orm import Session
 from db.models import Transaction
 from common.config import get_settings
+from rules_engine.stats import rule_stats
 
 # ---- Base & Registry ----
 class Rule(ABC):
@@ -21,6 +24,91 @@ class Rule(ABC):
         """
         ...
 
+    def evaluate_batch(self, batch: "TxBatch") -> Tuple[np.ndarray, Dict[int, Dict[str, Any]]]:
+        """
+        Returns (scores[n], {row: details}) with details only for rows that scored.
+        Default is the per-row path; built-in rules override it with NumPy kernels.
+        """
+        scores = np.zeros(len(batch), dtype=np.float64)
+        details: Dict[int, Dict[str, Any]] = {}
+        for i in range(len(batch)):
+            s, d = self.evaluate(batch.tx(i), batch.history(i))
+            if s > 0:
+                scores[i] = s
+                details[i] = d
+        return scores, details
+
+# ---- Columnar batch ----
+def _epoch(ts: datetime) -> float:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+@dataclass
+class TxBatch:
+    """
+    Columnar batch of transactions plus their account histories.
+    History rows of transaction i live in hist_*[offsets[i]:offsets[i+1]] (CSR layout).
+    Timestamps are UTC epoch seconds.
+    """
+    amount: np.ndarray
+    country: np.ndarray
+    timestamp: np.ndarray
+    offsets: np.ndarray
+    hist_amount: np.ndarray
+    hist_country: np.ndarray
+    hist_timestamp: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    @classmethod
+    def from_records(cls, txs: Sequence[Dict[str, Any]], histories: Sequence[Iterable[Dict[str, Any]]]) -> "TxBatch":
+        if len(txs) != len(histories):
+            raise ValueError("txs and histories must have the same length")
+        offsets = np.zeros(len(txs) + 1, dtype=np.int64)
+        tx_cols = dict(
+            amount=np.array([float(t.get("amount", 0.0)) for t in txs], dtype=np.float64),
+            country=np.array([(t.get("country") or "").upper() for t in txs], dtype=str),
+            timestamp=np.array([_epoch(t["timestamp"]) for t in txs], dtype=np.float64),
+        )
+        if histories and all(hasattr(h, "timestamps") for h in histories):
+            # columnar histories (features.history.AccountHistory): no per-row dicts
+            np.cumsum([len(h) for h in histories], out=offsets[1:])
+            return cls(
+                **tx_cols, offsets=offsets,
+                hist_amount=np.concatenate([h.amounts for h in histories]).astype(np.float64),
+                hist_country=np.concatenate([h.countries for h in histories]).astype(str),
+                hist_timestamp=np.concatenate([h.timestamps for h in histories]).astype(np.float64),
+            )
+        hist = [list(h) for h in histories]
+        np.cumsum([len(h) for h in hist], out=offsets[1:])
+        flat = [h for hs in hist for h in hs]
+        return cls(
+            **tx_cols, offsets=offsets,
+            hist_amount=np.array([float(h.get("amount", 0.0)) for h in flat], dtype=np.float64),
+            hist_country=np.array([(h.get("country") or "").upper() for h in flat], dtype=str),
+            hist_timestamp=np.array([_epoch(h["timestamp"]) for h in flat], dtype=np.float64),
+        )
+
+    def history_sizes(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def tx(self, i: int) -> Dict[str, Any]:
+        return {
+            "amount": float(self.amount[i]),
+            "country": str(self.country[i]),
+            "timestamp": datetime.fromtimestamp(self.timestamp[i], tz=timezone.utc),
+        }
+
+    def history(self, i: int) -> List[Dict[str, Any]]:
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        return [{
+            "amount": float(self.hist_amount[j]),
+            "country": str(self.hist_country[j]),
+            "timestamp": datetime.fromtimestamp(self.hist_timestamp[j], tz=timezone.utc),
+        } for j in range(lo, hi)]
+
 _RULES: dict[str, Callable[[dict], Rule]] = {}
 
 def register(name: str):
@@ -42,6 +130,12 @@ class AmountOver(Rule):
             score = (amt - self.threshold) / max(self.threshold, 1.0) * self.weight
             return score, {"threshold": self.threshold, "amount": amt}
         return 0.0, {}
+    def evaluate_batch(self, batch):
+        excess = batch.amount - self.threshold
+        scores = np.where(excess > 0, excess / max(self.threshold, 1.0) * self.weight, 0.0)
+        details = {int(i): {"threshold": self.threshold, "amount": float(batch.amount[i])}
+                   for i in np.flatnonzero(excess > 0)}
+        return scores, details
 
 @register("velocity")
 class Velocity(Rule):
@@ -54,10 +148,24 @@ class Velocity(Rule):
         from datetime import datetime, timezone
         t_now = tx["timestamp"]
         win_start = t_now - timedelta(hours=self.window_hours)
-        cnt = sum(1 for h in history if h["timestamp"] >= win_start)
+        ts = getattr(history, "timestamps", None)
+        if ts is not None:  # columnar AccountHistory
+            cnt = int(np.count_nonzero(ts >= _epoch(win_start)))
+        else:
+            cnt = sum(1 for h in history if h["timestamp"] >= win_start)
         if cnt > self.max_tx:
             return (cnt - self.max_tx) / max(self.max_tx, 1) * self.weight, {"count": cnt}
         return 0.0, {}
+    def evaluate_batch(self, batch):
+        sizes = batch.history_sizes()
+        win_start = np.repeat(batch.timestamp - self.window_hours * 3600.0, sizes)
+        owner = np.repeat(np.arange(len(batch)), sizes)
+        in_win = batch.hist_timestamp >= win_start
+        cnt = np.bincount(owner[in_win], minlength=len(batch))
+        over = cnt > self.max_tx
+        scores = np.where(over, (cnt - self.max_tx) / max(self.max_tx, 1) * self.weight, 0.0)
+        details = {int(i): {"count": int(cnt[i])} for i in np.flatnonzero(over)}
+        return scores, details
 
 @register("country_risk")
 class CountryRisk(Rule):
@@ -70,6 +178,11 @@ class CountryRisk(Rule):
         if c in self.high_risk:
             return self.weight, {"country": c}
         return 0.0, {}
+    def evaluate_batch(self, batch):
+        hit = np.isin(batch.country, list(self.high_risk))
+        scores = np.where(hit, self.weight, 0.0)
+        details = {int(i): {"country": str(batch.country[i])} for i in np.flatnonzero(hit)}
+        return scores, details
 
 # ---- Loader & Evaluator ----
 @dataclass
@@ -78,6 +191,12 @@ class RuleOutcome:
     score: float
     details: Dict[str, Any]
 
+@dataclass
+class BatchOutcome:
+    total: np.ndarray                 # (n,) summed rule score per transaction
+    scores: Dict[str, np.ndarray]     # rule name -> (n,) scores
+    outcomes: List[List[RuleOutcome]]  # per transaction, same shape as evaluate()
+
 class RuleEngine:
     def __init__(self, rules: List[Rule]):
         self.rules = rules
@@ -100,13 +219,32 @@ class RuleEngine:
     def evaluate(self, tx: Dict[str, Any], history: Iterable[Dict[str, Any]]) -> Tuple[float, List[RuleOutcome]]:
         outcomes: List[RuleOutcome] = []
         total = 0.0
+        timed = rule_stats.enabled
         for r in self.rules:
-            s, d = r.evaluate(tx, history)
+            if timed:
+                t0 = time.perf_counter_ns()
+                s, d = r.evaluate(tx, history)
+                rule_stats.record(r.name, time.perf_counter_ns() - t0, s > 0)
+            else:
+                s, d = r.evaluate(tx, history)
             if s > 0:
                 outcomes.append(RuleOutcome(r.name, s, d))
                 total += s
         return total, outcomes
 
+    def evaluate_batch(self, batch: TxBatch) -> BatchOutcome:
+        n = len(batch)
+        total = np.zeros(n, dtype=np.float64)
+        scores: Dict[str, np.ndarray] = {}
+        outcomes: List[List[RuleOutcome]] = [[] for _ in range(n)]
+        for r in self.rules:
+            s, details = r.evaluate_batch(batch)
+            scores[r.name] = s
+            for i in np.flatnonzero(s > 0):
+                outcomes[i].append(RuleOutcome(r.name, float(s[i]), details.get(int(i), {})))
+            total += np.where(s > 0, s, 0.0)
+        return BatchOutcome(total, scores, outcomes)
+
 # Optional: helper to fetch account history efficiently
 def fetch_account_history(db: Session, account_id: int, hours: int = 72) -> List[Dict[str, Any]]:
     from sqlalchemy import select, func
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .dsl import Check, FieldGetter, Predicate, Rule, compile_predicate, default_getter, predicate_key
+from .stats import count, observe, rule_stats
+
+
+class RuleSetPlan:
+    """
+    Evaluation plan for a DSL rule set.
+
+    - Each distinct Predicate(field, op, value) is compiled once and evaluated
+      at most once per payload, however many rules share it.
+    - Every `sample_every`-th payload is instrumented (evals, trues, ns); every
+      `reorder_every` sampled payloads the any_of/all_of members are reordered so
+      cheap, decisive checks run first: any_of by cost / P(true), all_of by
+      cost / P(false), both ascending.
+    - With `rule_stats.enabled`, each rule is recorded as `dsl:{id}` (as `dsl.score`
+      does): evals and hits on every payload, latency on the sampled ones only, which
+      keeps the per-rule overhead to a couple of list increments.
+    - `plan()` returns the current order and counters for inspection.
+    """
+    def __init__(
+        self,
+        rules: Sequence[Rule],
+        getter: FieldGetter = default_getter,
+        sample_every: int = 16,
+        reorder_every: int = 256,
+    ) -> None:
+        self.rules = list(rules)
+        self._stat_keys = [f"dsl:{r.id}" for r in self.rules]
+        self.sample_every = max(1, sample_every)
+        self.reorder_every = max(1, reorder_every)
+
+        index: Dict[Tuple[str, str, Any], int] = {}
+        self.predicates: List[Predicate] = []
+        self._checks: List[Check] = []
+
+        def slot(p: Predicate) -> int:
+            k = predicate_key(p)
+            if k not in index:
+                index[k] = len(self.predicates)
+                self.predicates.append(p)
+                self._checks.append(compile_predicate(p, getter))
+            return index[k]
+
+        self._members: List[Tuple[float, Tuple[int, ...], Tuple[int, ...]]] = [
+            (r.weight, tuple(slot(p) for p in r.any_of), tuple(slot(p) for p in r.all_of))
+            for r in self.rules
+        ]
+        n = len(self.predicates)
+        self.evals = [0] * n
+        self.trues = [0] * n
+        self.total_ns = [0] * n
+        self._seen = 0
+        self._sampled = 0
+        self._lock = threading.Lock()  # guards reorder only; counters are best-effort
+
+    # ---- evaluation ----
+    def _plain(self, i: int, payload: Dict[str, Any], memo: List[Optional[bool]]) -> bool:
+        v = memo[i]
+        if v is None:
+            v = memo[i] = bool(self._checks[i](payload))
+        return v
+
+    def _timed(self, i: int, payload: Dict[str, Any], memo: List[Optional[bool]]) -> bool:
+        v = memo[i]
+        if v is None:
+            t0 = time.perf_counter_ns()
+            v = memo[i] = bool(self._checks[i](payload))
+            self.total_ns[i] += time.perf_counter_ns() - t0
+            self.evals[i] += 1
+            self.trues[i] += v
+        return v
+
+    def hits(self, payload: Dict[str, Any]) -> List[bool]:
+        """Per-rule match flags, in the order rules were given."""
+        self._seen += 1
+        sampled = self._seen % self.sample_every == 0
+        ev = self._timed if sampled else self._plain
+        memo: List[Optional[bool]] = [None] * len(self._checks)
+        out = []
+        if rule_stats.enabled:
+            counters = rule_stats.counters(self._stat_keys)
+            for c, (_, any_of, all_of) in zip(counters, self._members):
+                t0 = time.perf_counter_ns() if sampled else 0
+                ok = (not any_of or any(ev(i, payload, memo) for i in any_of)) and all(
+                    ev(i, payload, memo) for i in all_of
+                )
+                if sampled:
+                    observe(c, time.perf_counter_ns() - t0, ok)
+                else:
+                    count(c, ok)
+                out.append(ok)
+        else:
+            for _, any_of, all_of in self._members:
+                ok = (not any_of or any(ev(i, payload, memo) for i in any_of)) and all(
+                    ev(i, payload, memo) for i in all_of
+                )
+                out.append(ok)
+        if sampled:
+            self._sampled += 1
+            if self._sampled % self.reorder_every == 0:
+                self.reorder()
+        return out
+
+    def score(self, payload: Dict[str, Any]) -> float:
+        return sum(m[0] for m, hit in zip(self._members, self.hits(payload)) if hit)
+
+    def score_many(self, payloads: Sequence[Dict[str, Any]]) -> List[float]:
+        return [self.score(p) for p in payloads]
+
+    # ---- adaptive ordering ----
+    def _cost(self, i: int) -> float:
+        return self.total_ns[i] / self.evals[i] if self.evals[i] else 1.0
+
+    def _p_true(self, i: int) -> float:
+        # Laplace-smoothed so unseen predicates keep a neutral 0.5
+        return (self.trues[i] + 1) / (self.evals[i] + 2)
+
+    def reorder(self) -> None:
+        with self._lock:
+            self._members = [
+                (
+                    w,
+                    tuple(sorted(any_of, key=lambda i: self._cost(i) / self._p_true(i))),
+                    tuple(sorted(all_of, key=lambda i: self._cost(i) / (1.0 - self._p_true(i)))),
+                )
+                for w, any_of, all_of in self._members
+            ]
+
+    # ---- introspection ----
+    def _describe(self, i: int) -> Dict[str, Any]:
+        p = self.predicates[i]
+        return {
+            "slot": i, "field": p.field, "op": p.op, "value": p.value,
+            "evals": self.evals[i], "p_true": round(self._p_true(i), 4), "avg_ns": round(self._cost(i), 1),
+        }
+
+    def plan(self) -> Dict[str, Any]:
+        shared: Dict[int, int] = {}
+        for _, any_of, all_of in self._members:
+            for i in set(any_of) | set(all_of):
+                shared[i] = shared.get(i, 0) + 1
+        return {
+            "distinct_predicates": len(self.predicates),
+            "total_predicates": sum(len(r.any_of) + len(r.all_of) for r in self.rules),
+            "predicates": [{**self._describe(i), "shared_by": shared.get(i, 0)} for i in range(len(self.predicates))],
+            "rules": [
+                {"id": r.id, "weight": w, "any_of": list(any_of), "all_of": list(all_of)}
+                for r, (w, any_of, all_of) in zip(self.rules, self._members)
+            ],
+        }
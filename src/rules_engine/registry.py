@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from loguru import logger
+
+from common.config import get_settings
+from rules_engine.engine import RuleEngine
+
+
+@dataclass(frozen=True)
+class RuleSnapshot:
+    version: str  # content hash of the YAML the engine was built from
+    engine: RuleEngine
+
+
+class RuleRegistry:
+    """
+    Holds the live RuleEngine as an immutable snapshot.
+
+    Readers call `current()` once per request and keep the snapshot, so a reload
+    never changes rules under an in-flight request. New engines are built off the
+    request path and published with a single reference assignment.
+
+    Every uvicorn worker has its own registry; a background thread polls the rules
+    file (mtime + size) so a change written by any worker, or by `/rules/export-yaml`,
+    reaches all of them within `poll_interval` seconds.
+    """
+    def __init__(self, path: str, poll_interval: float = 2.0) -> None:
+        self.path = path
+        self.poll_interval = poll_interval
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._snapshot = self._build()
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _file_stamp(self) -> Tuple[int, int]:
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def _build(self) -> RuleSnapshot:
+        stamp = self._file_stamp()
+        with open(self.path, "rb") as f:
+            version = hashlib.sha256(f.read()).hexdigest()[:12]
+        engine = RuleEngine.from_yaml(self.path)
+        self._stamp = stamp
+        return RuleSnapshot(version=version, engine=engine)
+
+    def current(self) -> RuleSnapshot:
+        return self._snapshot
+
+    def reload(self, force: bool = False) -> RuleSnapshot:
+        """Rebuild if the file changed (or when forced); invalid YAML keeps the old snapshot and raises."""
+        with self._reload_lock:
+            if not force and self._file_stamp() == self._stamp:
+                return self._snapshot
+            snap = self._build()
+            if snap.version != self._snapshot.version:
+                logger.info(f"Rules reloaded: {self._snapshot.version} -> {snap.version}")
+            self._snapshot = snap
+            return snap
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception:
+                logger.exception(f"Rules reload from {self.path} failed; keeping version {self._snapshot.version}")
+
+    def start(self) -> None:
+        if self.poll_interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="rules-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+@lru_cache
+def get_rule_registry() -> RuleRegistry:
+    s = get_settings()
+    reg = RuleRegistry(s.RULES_PATH, poll_interval=s.RULES_POLL_INTERVAL_S)
+    reg.start()
+    return reg
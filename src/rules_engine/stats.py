@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Sequence
+
+from common.config import get_settings
+
+# Latency histogram: bucket b counts evaluations with ns.bit_length() == b,
+# i.e. durations in [2**(b-1), 2**b) ns. 32 buckets reach ~2s.
+_NBUCKETS = 32
+
+
+# Counter layout: one flat list per (thread, rule) keeps the hot path to index ops.
+# _TIMED counts the evaluations the latency fields cover (all of them, unless the
+# caller samples timing and uses `count` for the rest).
+_EVALS, _HITS, _TIMED, _TOTAL_NS, _MAX_NS, _HIST = 0, 1, 2, 3, 4, 5
+
+
+def _new_counter() -> List[int]:
+    return [0] * (_HIST + _NBUCKETS)
+
+
+class RuleStats:
+    """
+    Per-rule evaluation counters.
+
+    Each thread writes only to its own shard (a plain dict), so the hot path takes
+    no locks; `snapshot()` merges shards on read. When `enabled` is False callers
+    skip timing entirely, so the disabled cost is one attribute read per call.
+    """
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._local = threading.local()
+        self._shards: List[Dict[str, List[int]]] = []
+        self._lock = threading.Lock()  # only for registering new shards
+
+    def _shard(self) -> Dict[str, List[int]]:
+        try:
+            return self._local.counters
+        except AttributeError:
+            d = self._local.counters = {}
+            with self._lock:
+                self._shards.append(d)
+            return d
+
+    def record(self, key: str, ns: int, hit: bool) -> None:
+        d = self._shard()
+        c = d.get(key)
+        if c is None:
+            c = d[key] = _new_counter()
+        observe(c, ns, hit)
+
+    def counters(self, keys: Sequence[str]) -> List[List[int]]:
+        """This thread's counters for `keys`, for hot loops that record through
+        `count`/`observe` (resolve them per call: reset() drops the lists)."""
+        d = self._shard()
+        out = []
+        for key in keys:
+            c = d.get(key)
+            if c is None:
+                c = d[key] = _new_counter()
+            out.append(c)
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            for d in self._shards:
+                d.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        merged: Dict[str, List[int]] = {}
+        with self._lock:
+            shards = list(self._shards)
+        for d in shards:
+            for key, c in list(d.items()):
+                m = merged.setdefault(key, _new_counter())
+                for i, v in enumerate(c):
+                    m[i] = max(m[i], v) if i == _MAX_NS else m[i] + v
+        return {key: _summary(c) for key, c in sorted(merged.items())}
+
+
+def count(c: List[int], hit: bool) -> None:
+    c[_EVALS] += 1
+    c[_HITS] += hit
+
+
+def observe(c: List[int], ns: int, hit: bool) -> None:
+    c[_EVALS] += 1
+    c[_HITS] += hit
+    c[_TIMED] += 1
+    c[_TOTAL_NS] += ns
+    if ns > c[_MAX_NS]:
+        c[_MAX_NS] = ns
+    c[_HIST + min(ns.bit_length(), _NBUCKETS - 1)] += 1
+
+
+def _quantile_ns(c: List[int], q: float) -> int:
+    target, seen = q * c[_TIMED], 0
+    for b, n in enumerate(c[_HIST:]):
+        seen += n
+        if n and seen >= target:
+            return 1 << b  # bucket upper bound
+    return c[_MAX_NS]
+
+
+def _summary(c: List[int]) -> Dict[str, Any]:
+    evals, timed = c[_EVALS], c[_TIMED]
+    return {
+        "evals": evals,
+        "hits": c[_HITS],
+        "hit_rate": c[_HITS] / evals if evals else 0.0,
+        "timed": timed,
+        "avg_ns": c[_TOTAL_NS] / timed if timed else 0.0,
+        "max_ns": c[_MAX_NS],
+        "p50_ns": _quantile_ns(c, 0.50),
+        "p99_ns": _quantile_ns(c, 0.99),
+        "histogram": {f"le_{1 << b}ns": n for b, n in enumerate(c[_HIST:]) if n},
+    }
+
+
+rule_stats = RuleStats(enabled=get_settings().RULE_STATS_ENABLED)
@@ -0,0 +1,90 @@
+import os
+import uuid
+
+import pytest
+
+# Tests that need a real server take `pg_url`; they are skipped unless this points at a
+# PostgreSQL (13+) where the user may create databases, e.g. postgresql://postgres@localhost/postgres
+PG_URL = os.environ.get("AMLYNX_TEST_PG_URL")
+
+# Migrations 0003 (status enum), 0004 (partitioned transactions/alerts), 0007 (account_daily)
+# and 0008 (queue index). The primary keys include the partition key, which PostgreSQL
+# requires on partitioned tables.
+SCHEMA = """
+CREATE TYPE alert_status_enum AS ENUM ('new', 'in_review', 'escalated', 'closed');
+CREATE TABLE transactions (
+    tx_id uuid NOT NULL,
+    src_account uuid NOT NULL,
+    dst_account uuid NOT NULL,
+    amount numeric(18,4) NOT NULL,
+    currency varchar(3) NOT NULL DEFAULT 'USD',
+    channel varchar(32),
+    merchant_code varchar(20),
+    tx_ts timestamp NOT NULL DEFAULT NOW(),
+    ip_hash varchar(128),
+    geo jsonb,
+    raw_payload jsonb,
+    processed boolean NOT NULL DEFAULT false,
+    PRIMARY KEY (tx_id, tx_ts)
+) PARTITION BY RANGE (tx_ts);
+CREATE INDEX ix_transactions_tx_ts ON transactions (tx_ts);
+CREATE INDEX ix_transactions_unprocessed ON transactions (tx_ts) WHERE NOT processed;
+CREATE TABLE alerts (
+    alert_id uuid NOT NULL,
+    tx_id varchar(64) NOT NULL,
+    src_account varchar(64) NOT NULL,
+    dst_account varchar(64) NOT NULL,
+    amount numeric(18,4) NOT NULL,
+    currency varchar(3) NOT NULL,
+    risk_score numeric(6,5) NOT NULL,
+    model_score numeric(6,5) NOT NULL,
+    rule_score numeric(6,5) NOT NULL,
+    priority integer NOT NULL DEFAULT 0,
+    tags jsonb NOT NULL DEFAULT '[]'::jsonb,
+    explanation jsonb NOT NULL,
+    status alert_status_enum NOT NULL DEFAULT 'new',
+    created_at timestamp NOT NULL DEFAULT NOW(),
+    assigned_to varchar(128),
+    PRIMARY KEY (alert_id, created_at)
+) PARTITION BY RANGE (created_at);
+CREATE INDEX ix_alerts_tags_gin ON alerts USING GIN (tags);
+CREATE INDEX ix_alerts_new_priority_desc ON alerts (priority DESC, created_at DESC, alert_id DESC) WHERE status = 'new';
+CREATE TABLE account_daily (
+    day date NOT NULL,
+    account_id uuid NOT NULL,
+    sum_out numeric(20,4) NOT NULL DEFAULT 0,
+    n_out bigint NOT NULL DEFAULT 0,
+    sum_in numeric(20,4) NOT NULL DEFAULT 0,
+    n_in bigint NOT NULL DEFAULT 0,
+    updated_at timestamp NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (day, account_id)
+);
+"""
+
+
+def _partitions(table: str, column: str, year: int) -> str:
+    return "".join(
+        f"CREATE TABLE {table}_{year}_{m:02d} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{year}-{m:02d}-01') TO ('{year + m // 12}-{m % 12 + 1:02d}-01');"
+        for m in range(1, 13)
+    )
+
+
+@pytest.fixture
+def pg_url():
+    """libpq URL of a fresh database with the partitioned schema (2025 partitions)."""
+    if not PG_URL:
+        pytest.skip("AMLYNX_TEST_PG_URL is not set")
+    import psycopg
+    from psycopg.conninfo import make_conninfo
+    name = f"amlynx_test_{uuid.uuid4().hex[:12]}"
+    with psycopg.connect(PG_URL, autocommit=True) as admin:
+        admin.execute(f"CREATE DATABASE {name}")
+    url = make_conninfo(PG_URL, dbname=name)
+    try:
+        with psycopg.connect(url, autocommit=True) as conn:
+            conn.execute(SCHEMA + _partitions("transactions", "tx_ts", 2025) + _partitions("alerts", "created_at", 2025))
+        yield url
+    finally:
+        with psycopg.connect(PG_URL, autocommit=True) as admin:
+            admin.execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
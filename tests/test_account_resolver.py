@@ -0,0 +1,35 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from db.models import Base
+from db.accounts import AccountResolver
+
+def _engine(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path / 'acct.db'}")
+    Base.metadata.create_all(eng)
+    return eng
+
+def test_resolve_caches_only_after_commit(tmp_path):
+    eng, res = _engine(tmp_path), AccountResolver(max_size=2)
+    with Session(eng) as db:
+        res.resolve(db, "a", "FI")
+        assert len(res) == 0  # parked until commit
+        db.rollback()
+    with Session(eng) as db:
+        ids = res.resolve_many(db, {"a": "FI", "b": "DE", "c": "SE"})
+        db.commit()
+    assert len(set(ids.values())) == 3 and len(res) == 2 and res.evictions == 1
+    with Session(eng) as db:
+        assert res.resolve(db, "c", "SE") == ids["c"]
+    assert res.stats()["hits"] == 1 and res.stats()["misses"] == 4
+
+def test_reselects_rows_missed_by_the_statement_snapshot(tmp_path, monkeypatch):
+    import db.accounts as accounts
+    eng, res = _engine(tmp_path), AccountResolver()
+    real = accounts._fallback_stmts
+    # Stand-in for READ COMMITTED: "b" was committed by another transaction after the
+    # upsert's snapshot, so the upsert's own SELECT does not return it.
+    monkeypatch.setattr(accounts, "_fallback_stmts", lambda new: (real(new)[0], accounts._select_stmt([k for k in new if k != "b"])))
+    with Session(eng) as db:
+        ids = res.resolve_many(db, {"a": "FI", "b": "DE"})
+        db.commit()
+    assert set(ids) == {"a", "b"} and ids["a"] != ids["b"]
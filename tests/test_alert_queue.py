@@ -0,0 +1,130 @@
+from datetime import datetime
+import pytest
+from fastapi import HTTPException
+from api.alerts.main import decode_cursor, encode_cursor
+
+def test_cursor_roundtrip():
+    ts = datetime(2025, 3, 1, 12, 30, 5, 123456)
+    cur = encode_cursor(87, ts, "6f1c0b2e-0000-4000-8000-000000000001")
+    assert "=" not in cur
+    assert decode_cursor(cur) == (87, ts, "6f1c0b2e-0000-4000-8000-000000000001")
+
+def test_bad_cursor_is_400():
+    with pytest.raises(HTTPException) as e:
+        decode_cursor("not-a-cursor")
+    assert e.value.status_code == 400
+
+
+# ---- against PostgreSQL (pg_url) ----
+import json
+import threading
+import uuid
+
+from api.alerts.main import ClaimIn, alert_queue, claim_alerts
+
+_TIMES = [datetime(2025, 1, 31, 23, 59), datetime(2025, 2, 1), datetime(2025, 2, 1, 0, 0, 1)]  # two partitions
+_TAGS = [["sanctions"], ["sanctions", "pep"], ["velocity"], []]
+
+
+@pytest.fixture
+def Session(pg_url):
+    import psycopg
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    eng = create_engine("postgresql+psycopg://", creator=lambda: psycopg.connect(pg_url))
+    yield sessionmaker(bind=eng)
+    eng.dispose()
+
+
+def _seed(Session, n=90):
+    """n alerts with heavy ties on (priority, created_at); every 10th is not 'new'."""
+    from sqlalchemy import text
+    rows = [dict(id=uuid.uuid4(), p=i % 3, c=_TIMES[(i // 3) % 3], tags=json.dumps(_TAGS[i % 4]),
+                 s="new" if i % 10 else "closed") for i in range(n)]
+    with Session() as db:
+        db.execute(text(
+            "INSERT INTO alerts (alert_id, tx_id, src_account, dst_account, amount, currency, risk_score, model_score, "
+            "rule_score, priority, tags, explanation, status, created_at) VALUES (:id, 'tx', 'a', 'b', 1, 'EUR', 0.5, "
+            "0.5, 0.5, :p, CAST(:tags AS jsonb), '{}', CAST(:s AS alert_status_enum), :c)"), rows)
+        db.commit()
+    key = lambda r: (r["p"], r["c"], r["id"])  # uuid order is the same in Python and PostgreSQL
+    return sorted((r for r in rows if r["s"] == "new"), key=key, reverse=True)
+
+
+def _pages(Session, limit, tags=()):
+    ids, cursor = [], None
+    with Session() as db:
+        while True:
+            page = alert_queue(limit=limit, cursor=cursor, tag=list(tags), db=db)
+            assert len(page.items) <= limit
+            ids += [a.alert_id for a in page.items]
+            if page.next_cursor is None:
+                return ids
+            cursor = page.next_cursor
+
+
+@pytest.mark.parametrize("limit", [1, 7, 30, 500])
+def test_keyset_pages_have_no_gaps_or_duplicates(Session, limit):
+    expected = [str(r["id"]) for r in _seed(Session)]
+    assert _pages(Session, limit) == expected
+
+
+def test_tag_filters_are_containment(Session):
+    expected = _seed(Session)
+    assert _pages(Session, 4, ["sanctions"]) == [str(r["id"]) for r in expected if "sanctions" in json.loads(r["tags"])]
+    assert _pages(Session, 4, ["sanctions", "pep"]) == [str(r["id"]) for r in expected if "pep" in json.loads(r["tags"])]
+    assert _pages(Session, 4, ["nope"]) == []
+
+
+def test_queue_order_comes_from_the_index(Session):
+    from sqlalchemy import text
+    _seed(Session)
+    with Session() as db:
+        db.execute(text("SET enable_seqscan = off"))
+        plan = "\n".join(db.execute(text(
+            "EXPLAIN SELECT alert_id FROM alerts WHERE status = 'new' "
+            "AND (priority, created_at, alert_id) < (2, '2025-02-01', CAST(:a AS uuid)) "
+            "ORDER BY priority DESC, created_at DESC, alert_id DESC LIMIT 10"), {"a": str(uuid.UUID(int=0))}).scalars())
+    nodes = [line.strip().removeprefix("->").strip() for line in plan.splitlines()]
+    assert any(n.startswith(("Index Scan", "Index Only Scan")) for n in nodes), plan
+    # a Merge Append of index scans: no (incremental) sort step for the alert_id tie-break
+    assert not any(n.startswith(("Sort  (", "Incremental Sort  (")) for n in nodes), plan
+
+
+def test_claim_skips_rows_locked_by_another_claimer(Session):
+    from sqlalchemy import text
+    expected = [str(r["id"]) for r in _seed(Session)]
+    with Session() as holder, Session() as db:
+        # an in-flight claim holds the head of the queue
+        holder.execute(text("SELECT alert_id FROM alerts WHERE alert_id = ANY(CAST(:ids AS uuid[])) FOR UPDATE"),
+                       {"ids": expected[:3]})
+        db.execute(text("SET lock_timeout = '2s'"))  # fail instead of hanging if the claim blocks
+        got = claim_alerts(ClaimIn(analyst="bob", n=5), db=db)
+        assert [a.alert_id for a in got] == expected[3:8]
+        assert {a.assigned_to for a in got} == {"bob"} and {a.status for a in got} == {"in_review"}
+        holder.rollback()
+    assert _pages(Session, 50) == expected[:3] + expected[8:]
+
+
+def test_concurrent_claims_never_share_an_alert(Session):
+    expected = _seed(Session)
+    claimed = {}
+    barrier = threading.Barrier(4)
+
+    def claimer(name):
+        barrier.wait()
+        while True:
+            with Session() as db:
+                got = claim_alerts(ClaimIn(analyst=name, n=3), db=db)
+            if not got:
+                return
+            for a in got:
+                assert claimed.setdefault(a.alert_id, name) == name, f"{a.alert_id} claimed twice"
+
+    threads = [threading.Thread(target=claimer, args=(f"analyst{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed) == sorted(str(r["id"]) for r in expected)
+    assert _pages(Session, 50) == []
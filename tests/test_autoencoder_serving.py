@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from anomaly import autoencoder_detector as ae  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def trained():
+    torch.manual_seed(0)
+    rng = np.random.default_rng(0)
+    n = 4000
+    # raw features on very different scales: amount next to hour, a ratio and a count
+    X = np.column_stack([rng.lognormal(8, 1.5, n), rng.integers(0, 24, n), rng.random(n), rng.poisson(3, n)]).astype(float)
+    det = ae.AutoencoderDetector(input_dim=4, hidden_dims=[16, 8], epochs=5, batch_size=128)
+    det.train(X)
+    return det, X
+
+
+def test_folded_scores_match_eager(trained):
+    det, X = trained
+    np.testing.assert_allclose(det.serving().score(X[:500]), det._score_eager(X[:500]), rtol=1e-4, atol=1e-6)
+
+
+@pytest.mark.parametrize("kw", [dict(quantize=True), dict(script=True), dict(quantize=True, script=True)])
+def test_serving_paths_keep_ranking(trained, kw):
+    det, X = trained
+    scorer = det.serving(validate_on=X[:2000], **kw)  # raises ValueError on drift
+    report = ae.ranking_agreement(det._score_eager(X[2000:]), scorer.score(X[2000:]))
+    assert report["spearman"] >= 0.99 and report["top_overlap"] >= 0.9
+
+
+def test_buffer_grows_and_is_reused(trained):
+    det, X = trained
+    scorer = det.serving()
+    small = scorer.score(X[:10])
+    assert scorer.score(X[:1000]).shape == (1000,)  # beyond the initial 256-row buffer
+    np.testing.assert_array_equal(scorer.score(X[:10]), small)
+
+
+def test_torchscript_round_trip(trained, tmp_path):
+    det, X = trained
+    scorer = det.serving(script=True)
+    scorer.save(tmp_path / "ae.pt")
+    loaded = ae.ServingScorer.load(tmp_path / "ae.pt", det.input_dim)
+    np.testing.assert_allclose(loaded.score(X[:100]), scorer.score(X[:100]), rtol=1e-6)
+    with pytest.raises(TypeError):
+        det.serving().save(tmp_path / "eager.pt")
+
+
+def test_error_shares_sum_to_reconstruction_error(trained):
+    det, X = trained
+    scores, expl = det.score_and_explain(X[:200], top_k=det.input_dim)
+    np.testing.assert_allclose(scores, det._score_eager(X[:200]), rtol=1e-5, atol=1e-7)
+    np.testing.assert_allclose([sum(t["contribution"] for t in e["top"]) for e in expl], scores, rtol=1e-6)
+    assert all(len(e["top"]) == det.input_dim for e in expl)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+torch = pytest.importorskip("torch")
+
+from anomaly import autoencoder_detector as ae  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(1)
+    n = 6000
+    X = np.column_stack([rng.lognormal(8, 1.5, n), rng.integers(0, 24, n), rng.random(n), rng.poisson(3, n)]).astype(float)
+    return X[:5000], X[5000:]
+
+
+def _stream(X, parts=7):
+    return lambda: iter(np.array_split(X, parts))
+
+
+def test_streamed_scaler_and_threshold(data):
+    X, _ = data
+    torch.manual_seed(0)
+    det = ae.AutoencoderDetector(input_dim=4, hidden_dims=[16, 8], epochs=3, batch_size=128)
+    report = det.train_stream(_stream(X))
+    assert report["rows"] == len(X) and len(report["epochs"]) == 3
+
+    full = StandardScaler().fit(X)
+    np.testing.assert_allclose(det.scaler.mean_, full.mean_, rtol=1e-9)
+    np.testing.assert_allclose(det.scaler.scale_, full.scale_, rtol=1e-9)
+
+    # the sketch picks the ceil(q * n)-th error up to one log bin (200 per decade)
+    exact = np.quantile(det._score_eager(X), det.threshold_percentile / 100.0, method="inverted_cdf")
+    assert abs(det.threshold / exact - 1) <= 10 ** (1 / 200) - 1 + 1e-6
+
+
+def test_early_stopping_restores_best_weights(data):
+    X, V = data
+    torch.manual_seed(0)
+    det = ae.AutoencoderDetector(input_dim=4, hidden_dims=[16, 8], epochs=10, batch_size=128)
+    # an unreachable min_delta: epoch 1 is the best and the next `patience` epochs are stale
+    report = det.train_stream(_stream(X), val_chunks=_stream(V, 2), patience=2, min_delta=1e9)
+    history = report["epochs"]
+    assert len(history) == 3
+    assert report["best_val_loss"] == history[0]["val_loss"] != history[-1]["val_loss"]
+    restored = det._stream_errors(_stream(V, 2)()).mean_error
+    assert restored == pytest.approx(history[0]["val_loss"], rel=1e-6)
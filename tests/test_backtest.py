@@ -0,0 +1,57 @@
+import json
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from db.models import Base, Account, Transaction
+from rules_engine.backtest import iter_month, run_backtest
+
+BASE = "rules:\n  - type: amount_over\n    threshold: 1000\n"
+CAND = BASE + "  - type: velocity\n    window_hours: 24\n    max_tx: 2\n"
+
+def test_backtest_against_local_db(tmp_path):
+    url = f"sqlite:///{tmp_path / 'bt.db'}"
+    eng = create_engine(url)
+    Base.metadata.create_all(eng)
+    with Session(eng) as db:
+        a = Account(external_id="a1", country="FI")
+        db.add(a); db.flush()
+        t0 = datetime(2025, 1, 31, 20)  # burst straddles the month boundary
+        for i, amt in enumerate([5.0, 5.0, 5000.0, 5.0, 5.0]):
+            db.add(Transaction(account_id=a.id, amount=amt, currency="EUR", country="FI",
+                               timestamp=t0 + timedelta(hours=2 * i), metadata={}))
+        db.commit()
+    (tmp_path / "base.yaml").write_text(BASE)
+    (tmp_path / "cand.yaml").write_text(CAND)
+
+    out = tmp_path / "out"
+    report = run_backtest(url, str(tmp_path / "base.yaml"), str(tmp_path / "cand.yaml"), str(out),
+                          months=2, end=date(2025, 2, 1), workers=2, chunk_size=2)
+    total = report["total"]
+    assert total["transactions"] == 5
+    assert total["baseline_flagged"] == 1
+    # Feb rows see the January burst in their 24h window
+    assert total["candidate_rules"]["velocity"] == 3 and total["newly_flagged"] == 2
+    feb = np.load(out / "2025-02.npz")
+    assert int(feb["n"]) == 3 and int(feb["chunks"]) == 2  # chunk_size=2
+    chunks = list(iter_month(str(out / "2025-02.npz")))
+    assert [c[2].shape for c in chunks] == [(2, 2), (2, 1)]
+    assert np.concatenate([c[2][1] for c in chunks]).tolist() == [True, True, True]
+    assert json.loads((out / "summary.json").read_text())["total"] == total
+
+def test_rules_sharing_a_name_keep_separate_counts(tmp_path):
+    url = f"sqlite:///{tmp_path / 'bt.db'}"
+    eng = create_engine(url)
+    Base.metadata.create_all(eng)
+    with Session(eng) as db:
+        a = Account(external_id="a1", country="FI")
+        db.add(a); db.flush()
+        for i, amt in enumerate([50.0, 500.0, 5000.0]):
+            db.add(Transaction(account_id=a.id, amount=amt, currency="EUR", country="FI",
+                               timestamp=datetime(2025, 3, 1) + timedelta(hours=i), metadata={}))
+        db.commit()
+    (tmp_path / "base.yaml").write_text(BASE)
+    (tmp_path / "cand.yaml").write_text(BASE + "  - type: amount_over\n    threshold: 100\n")
+    report = run_backtest(url, str(tmp_path / "base.yaml"), str(tmp_path / "cand.yaml"), str(tmp_path / "out"),
+                          months=1, end=date(2025, 3, 1), workers=1)
+    assert report["total"]["candidate_rules"] == {"amount_over": 1, "amount_over#2": 2}
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+import numpy as np
+import pytest
+from common.batcher import MicroBatcher
+
+def test_concurrent_rows_share_batches():
+    calls = []
+    def fn(X):
+        calls.append(len(X))
+        return X.sum(axis=1)
+    b = MicroBatcher(fn, max_batch=16, max_wait_ms=20)
+    out = {}
+    def worker(i):
+        out[i] = b.score(np.array([i, 1.0]))
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(40)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    b.close()
+    assert out == {i: i + 1.0 for i in range(40)}
+    assert sum(calls) == 40 and len(calls) < 40 and max(calls) <= 16
+    st = b.stats()
+    assert st["rows"] == 40 and st["batches"] == len(calls) and st["queue_wait_us"]["p99"] is not None
+
+def test_async_and_errors_reach_every_caller():
+    def fn(X):
+        if (X < 0).any():
+            raise ValueError("bad row")
+        return X[:, 0] * 2
+    b = MicroBatcher(fn, max_batch=8, max_wait_ms=5)
+    async def main():
+        return await asyncio.gather(*(b.ascore(np.array([float(i)])) for i in range(5)))
+    assert asyncio.run(main()) == [0.0, 2.0, 4.0, 6.0, 8.0]
+    with pytest.raises(ValueError):
+        b.score(np.array([-1.0]))
+    b.close()
+    assert b.stats()["errors"] == 1
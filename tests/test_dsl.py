@@ -0,0 +1,82 @@
+import pytest
+from rules_engine import dsl
+from rules_engine.dsl import Predicate, Rule
+
+RULES = [
+    Rule("r1", any_of=[Predicate("tx.country", "in", ["IR", "KP"]), Predicate("amount", ">=", 10_000)],
+         all_of=[Predicate("channel", "regex", "^WI")], weight=2.0),
+    Rule("r2", any_of=[], all_of=[Predicate("merchant", "startswith", "cas"),
+                                  Predicate("tx.country", "not_in", ["FI"])], weight=0.5),
+    Rule("r3", any_of=[Predicate("memo", "endswith", "!"), Predicate("amount", "!=", 1)], all_of=[]),
+]
+
+PAYLOADS = [
+    {"amount": 50_000, "channel": "WIRE", "merchant": "casino", "tx": {"country": "DE"}, "memo": "hi"},
+    {"amount": 1, "channel": "CARD", "merchant": "shop", "tx": {"country": "IR"}, "memo": "hey!"},
+    {"amount": 1, "channel": "WIRE", "merchant": "cash", "tx": {"country": "FI"}, "memo": ""},
+]
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_compiled_matches_interpreted(payload):
+    for r in RULES:
+        assert dsl.compile(r)(payload) == dsl.evaluate(r, payload)
+
+def test_score_many_matches_score():
+    assert dsl.score_many(RULES, PAYLOADS) == [dsl.score(RULES, p) for p in PAYLOADS]
+
+def test_unsupported_op_fails_at_compile_time():
+    with pytest.raises(ValueError):
+        dsl.compile(Rule("bad", any_of=[Predicate("a", "like", "x")], all_of=[]))
+
+
+def test_planner_dedups_and_matches_score():
+    from rules_engine.planner import RuleSetPlan
+    shared = Predicate("amount", ">=", 10_000)
+    rules = RULES + [Rule("r4", any_of=[], all_of=[shared, Predicate("tx.country", "in", ["KP", "IR"])])]
+    plan = RuleSetPlan(rules, sample_every=1, reorder_every=2)
+    for _ in range(4):
+        assert plan.score_many(PAYLOADS) == [dsl.score(rules, p) for p in PAYLOADS]
+    info = plan.plan()
+    assert info["distinct_predicates"] == info["total_predicates"] - 2
+    assert sum(p["evals"] for p in info["predicates"]) > 0
+
+
+def test_score_frame_matches_row_scoring():
+    import pandas as pd
+    flat = [{**{k: v for k, v in p.items() if k != "tx"}, "tx.country": p["tx"]["country"]} for p in PAYLOADS]
+    df = pd.DataFrame(flat + [{"amount": None, "channel": None, "merchant": None, "tx.country": None, "memo": None}])
+    total, hits = dsl.score_frame(RULES, df)
+    assert hits.shape == (len(RULES), len(df))
+    assert total.tolist()[:3] == [dsl.score(RULES, p) for p in PAYLOADS]
+    assert hits[:, 3].tolist() == [False, False, True]  # only r3's `amount != 1` holds on nulls
+
+    # a str value tests `field in value`, not `value in field`
+    rules = [Rule("s_in", any_of=[], all_of=[Predicate("tx.country", "in", "IRKPSY")]),
+             Rule("s_not_in", any_of=[], all_of=[Predicate("tx.country", "not_in", "IRKPSY")])]
+    total, hits = dsl.score_frame(rules, df)
+    assert total.tolist()[:3] == [dsl.score(rules, p) for p in PAYLOADS]
+    assert hits[:, 1].tolist() == [True, False]  # "IR" in "IRKPSY"
+    assert hits[:, 3].tolist() == [False, True]  # a null country is never in it
+
+
+def test_predicate_key_keeps_value_types():
+    from rules_engine.dsl import predicate_key
+    keys = {predicate_key(Predicate("code", "startswith", v)) for v in (1, 1.0, True, "1")}
+    assert len(keys) == 4
+    assert predicate_key(Predicate("m", "regex", [1, 2])) != predicate_key(Predicate("m", "regex", (1, 2)))
+    assert predicate_key(Predicate("c", "in", ["IR", "KP"])) == predicate_key(Predicate("c", "in", ("KP", "IR")))
+    from rules_engine.planner import RuleSetPlan
+    plan = RuleSetPlan([Rule("a", any_of=[], all_of=[Predicate("code", "startswith", 1)]),
+                        Rule("b", any_of=[], all_of=[Predicate("code", "startswith", 1.0)])])
+    assert plan.hits({"code": "1.05"}) == [True, True] and plan.hits({"code": "15"}) == [True, False]
+
+
+def test_pipeline_replans_when_rule_list_changes_in_place():
+    from features.store import FeatureStore
+    from pipeline.scoring import ScoringPipeline
+    pipe = ScoringPipeline(FeatureStore())
+    rules = [Rule("big", any_of=[Predicate("amount", ">", 100)], all_of=[])]
+    payload = {"amount": 500, "country": "FI"}
+    assert pipe.score(payload, rules, "acct", "a1", [])["breakdown"]["rules"] == 1.0
+    rules.append(Rule("fi", any_of=[], all_of=[Predicate("country", "==", "FI")], weight=0.5))
+    assert pipe.score(payload, rules, "acct", "a1", [])["breakdown"]["rules"] == 1.5
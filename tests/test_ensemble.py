@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from aml.ensemble_aggregator import EnsembleAggregator
+from anomaly.detector import DetectorBase, top_k_contributions
+
+
+class _Linear(DetectorBase):
+    """Scores rows as X @ coef and counts how often each entry point is hit."""
+
+    def __init__(self, coef):
+        self.coef = np.asarray(coef, dtype=float)
+        self.calls = {"score": 0, "score_and_explain": 0}
+
+    def score(self, X):
+        self.calls["score"] += 1
+        return np.atleast_2d(X) @ self.coef
+
+    def score_and_explain(self, X, top_k=3):
+        self.calls["score_and_explain"] += 1
+        X = np.atleast_2d(X)
+        scores = X @ self.coef
+        tops = top_k_contributions(X * self.coef, top_k)
+        return scores, [{"score": float(s), "top": t} for s, t in zip(scores, tops)]
+
+
+class _A(_Linear): ...
+class _B(_Linear): ...
+class _C(_Linear): ...
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.random((300, 3))
+    y = (X[:, 0] + 0.2 * rng.random(300) > 0.7).astype(np.int32)
+    return X, y
+
+
+def _ensemble():
+    return EnsembleAggregator([_A([1.0, 0.0, 0.0]), _B([0.0, 1.0, 0.5]), _C([0.2, 0.2, 0.2])])
+
+
+@pytest.mark.parametrize("fitted", [False, True])
+def test_score_and_explain_matches_score(data, fitted):
+    X, y = data
+    ens = _ensemble()
+    if fitted:
+        ens.fit_weights(X, y)
+    scores, expl = ens.score_and_explain(X)
+    np.testing.assert_allclose(scores, ens.score(X))
+    assert [e["score"] for e in expl] == scores.tolist()
+
+
+def test_top_is_ranked_by_weighted_share(data):
+    X, y = data
+    ens = _ensemble()
+    ens.fit_weights(X, y)
+    _, expl = ens.score_and_explain(X[:50], top_k=2)
+    names = ["_A", "_B", "_C"]
+    shares = np.column_stack([d.score(X[:50]) for d in ens.detectors]) * ens.weights
+    for row, e in zip(shares, expl):
+        order = np.argsort(-row)[:2]
+        assert [t["feature"] for t in e["top"]] == [names[j] for j in order]
+        np.testing.assert_allclose([t["contribution"] for t in e["top"]], row[order])
+        assert [d["name"] for d in e["detectors"]] == names
+
+
+def test_each_detector_explains_once_per_batch(data):
+    X, _ = data
+    ens = _ensemble()
+    ens.score_and_explain(X)
+    ens.score_and_explain(X[:7])
+    assert [d.calls for d in ens.detectors] == [{"score": 0, "score_and_explain": 2}] * 3
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from data.etl import amount_log_stats, compute_basic_features, iter_basic_features, iter_transactions
+
+def _db(tmp_path, n=10):
+    eng = create_engine(f"sqlite:///{tmp_path / 'etl.db'}")
+    with eng.begin() as c:
+        c.execute(text("CREATE TABLE transactions (tx_id TEXT, src_account TEXT, dst_account TEXT, amount NUMERIC, "
+                       "currency TEXT, channel TEXT, merchant_code TEXT, tx_ts TIMESTAMP, processed BOOLEAN)"))
+        t0 = datetime(2025, 1, 1)
+        for i in range(n):
+            c.execute(text("INSERT INTO transactions VALUES (:i, 'a', 'b', :amt, 'EUR', :ch, NULL, :ts, 0)"),
+                      {"i": f"t{i}", "amt": 10.0 ** (i % 5), "ch": None if i % 2 else "web", "ts": t0 + timedelta(hours=i)})
+    return sessionmaker(bind=eng)
+
+def test_stream_chunks_are_typed_and_bounded(tmp_path):
+    sf = _db(tmp_path)
+    chunks = list(iter_transactions(chunk_size=4, columns=("tx_id", "amount", "channel", "tx_ts"), session_factory=sf))
+    assert [len(c) for c in chunks] == [4, 4, 2]
+    df = chunks[0]
+    assert list(df.columns) == ["tx_id", "amount", "channel", "tx_ts"]
+    assert df["amount"].dtype == np.float64 and str(df["tx_ts"].dt.tz) == "UTC"
+    assert df["channel"].tolist() == ["web", "unknown", "web", "unknown"]
+    tables = list(iter_transactions(chunk_size=4, limit=5, as_arrow=True, session_factory=sf))
+    assert sum(t.num_rows for t in tables) == 5
+
+def test_streamed_features_match_in_memory(tmp_path):
+    sf = _db(tmp_path)
+    whole = compute_basic_features(pd.concat(iter_transactions(chunk_size=100, session_factory=sf), ignore_index=True))
+    stats = amount_log_stats(session_factory=sf)
+    streamed = pd.concat(iter_basic_features(iter_transactions(chunk_size=3, session_factory=sf), stats), ignore_index=True)
+    np.testing.assert_allclose(streamed["amount_zscore"], whole["amount_zscore"])
+    assert streamed["hour"].tolist() == whole["hour"].tolist()
+
+def test_feature_table_formats_roundtrip(tmp_path):
+    from datetime import date
+    from data.etl import iter_feature_arrays, load_feature_table, write_feature_table
+    sf = _db(tmp_path)
+    stats = amount_log_stats(session_factory=sf)
+    feats = lambda: iter_basic_features(iter_transactions(chunk_size=3, session_factory=sf), stats)
+    ref = pd.concat(feats(), ignore_index=True)
+    for fmt, part in (("parquet", "day"), ("ipc", "account"), ("csv", None)):
+        out = str(tmp_path / ("f.csv" if fmt == "csv" else f"f_{fmt}"))
+        write_feature_table(feats(), out, fmt, part, account_buckets=4)
+        got = load_feature_table(out, columns=["tx_id", "amount_zscore", "hour"])
+        got = got.sort_values("tx_id", key=lambda s: s.str[1:].astype(int)).reset_index(drop=True)
+        np.testing.assert_allclose(got["amount_zscore"], ref["amount_zscore"])
+        assert got["hour"].tolist() == ref["hour"].tolist()
+    arrays = list(iter_feature_arrays(str(tmp_path / "f_parquet"), ["amount", "hour"], chunk_size=4))
+    assert sum(len(a) for a in arrays) == 10 and arrays[0].dtype == np.float64 and arrays[0].shape[1] == 2
+    pq_day = load_feature_table(str(tmp_path / "f_parquet"), filters=[("day", "=", date(2025, 1, 1))], as_arrow=True)
+    assert pq_day.num_rows == 10 and pq_day.schema.field("hour").type.bit_width == 8
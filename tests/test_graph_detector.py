@@ -0,0 +1,46 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from anomaly.graph_detector import GraphDetector
+
+
+def _frame(rng, n_tx, n_nodes, start_id=0):
+    return pd.DataFrame({
+        "id": np.arange(start_id, start_id + n_tx),
+        "sender_id": rng.integers(0, n_nodes, n_tx),
+        "receiver_id": rng.integers(0, n_nodes, n_tx),
+        "amount": rng.random(n_tx) * 1000,
+    })
+
+
+def _expected(det, X):
+    g = det.G
+    central = {k for k, c in nx.degree_centrality(g).items() if c > det.centrality_threshold}
+    out = []
+    for s, r in X.astype(np.int64).tolist():
+        score = 0.4 * (s in central) + 0.4 * (r in central)
+        if s in g and r in g and nx.has_path(g, r, s):
+            score += det.cycle_risk_factor * 0.2
+        out.append(min(score, 1.0))
+    return np.array(out)
+
+
+def test_scores_match_networkx_and_follow_added_edges():
+    rng = np.random.default_rng(0)
+    det = GraphDetector(centrality_threshold=0.03)
+    det.train(_frame(rng, 150, 120))
+    # pairs over known ids plus ids the graph has never seen (>= 120)
+    X = np.column_stack([rng.integers(0, 130, 500), rng.integers(0, 130, 500)]).astype(float)
+    assert (X >= 120).any()
+    np.testing.assert_allclose(det.score(X), _expected(det, X))
+
+    before = det._ensure_index()
+    det.add_transactions(_frame(rng, 150, 125, start_id=150))
+    assert det._index is None  # cached centrality/reachability dropped
+    np.testing.assert_allclose(det.score(X), _expected(det, X))
+    assert det._ensure_index() is not before
+
+    unknown = np.array([[1_000, 1_001], [1_000, 0], [0, 1_000]], dtype=float)
+    np.testing.assert_allclose(det.score(unknown), _expected(det, unknown))
+    assert det.score(unknown)[0] == 0.0
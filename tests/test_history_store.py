@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta, timezone
+from features.history import AccountHistoryStore
+from rules_engine.engine import Velocity
+
+NOW = datetime.now(timezone.utc)
+
+def test_ring_buffer_wraps_and_filters_window():
+    store = AccountHistoryStore(per_account=4, max_rows=100)
+    store.load(1, [(NOW - timedelta(hours=100), 1.0, "fi"), (NOW - timedelta(hours=1), 2.0, "de")])
+    for i in range(4):
+        store.append(1, NOW, 10.0 + i, "IR")
+    hist = store.get(db=None, account_id=1, hours=72)
+    assert hist.amounts.tolist() == [10.0, 11.0, 12.0, 13.0]
+    assert [h["country"] for h in hist] == ["IR"] * 4
+
+def test_append_ignores_cold_accounts_and_lru_evicts():
+    store = AccountHistoryStore(per_account=2, max_rows=4)
+    store.append(7, NOW, 1.0, "FI")
+    assert len(store) == 0
+    for acct in (1, 2, 3):
+        store.load(acct, [])
+    assert len(store) == 2 and 1 not in store._rings
+
+def test_velocity_reads_columnar_history():
+    store = AccountHistoryStore(per_account=32)
+    store.load(1, [(NOW - timedelta(minutes=m), 5.0, "FI") for m in range(10)])
+    hist = store.get(db=None, account_id=1)
+    rule = Velocity({"window_hours": 24, "max_tx": 8})
+    assert rule.evaluate({"timestamp": NOW}, hist) == rule.evaluate({"timestamp": NOW}, list(hist))
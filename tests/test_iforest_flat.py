@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+from anomaly.iforest_flat import FlatForest
+
+@pytest.mark.parametrize("kw", [dict(n_estimators=40), dict(n_estimators=25, max_features=0.5, bootstrap=True)])
+def test_matches_sklearn(kw):
+    rng = np.random.default_rng(0)
+    model = IsolationForest(random_state=3, **kw).fit(rng.normal(size=(2000, 5)))
+    flat = FlatForest.from_sklearn(model)
+    X = np.vstack([rng.normal(size=(300, 5)) * 3, [[0.0] * 5]])
+    np.testing.assert_allclose(flat.decision_function(X), model.decision_function(X), atol=1e-12)
+    np.testing.assert_allclose(flat.score_samples(X[:1]), model.score_samples(X[:1]), atol=1e-12)
+    with pytest.raises(ValueError):
+        flat.decision_function(np.zeros((1, 4)))
+
+def test_score_and_explain_single_pass():
+    from anomaly.detector import AnomalyDetector, top_k_contributions
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(1000, 4))
+    det = AnomalyDetector(model=IsolationForest(n_estimators=50, random_state=0).fit(X))
+    det.feature_names = ["a", "b", "c", "d"]
+    outlier = np.array([[0.0, 0.0, 9.0, 0.0]])
+    scores, expl = det.score_and_explain(np.vstack([outlier, X[:5]]), top_k=2)
+    np.testing.assert_allclose(scores, det.score_many(np.vstack([outlier, X[:5]])))
+    assert expl[0]["top"][0]["feature"] == "c" and len(expl[0]["top"]) == 2
+    assert top_k_contributions(np.array([[0.1, 0.5, 0.4]]), 2) == [
+        [{"feature": 1, "contribution": 0.5}, {"feature": 2, "contribution": 0.4}]]
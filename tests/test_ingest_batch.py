@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sklearn.ensemble import IsolationForest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+import api.transactions.main as tx_api
+from anomaly.detector import AnomalyDetector
+from anomaly.registry import ModelRegistry
+from data.etl import ANOMALY_FEATURES, history_features, latest_feature_row, to_frame
+from db.accounts import AccountResolver
+from db.models import Alert, Base, Transaction
+from features.history import AccountHistory, AccountHistoryStore
+
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+def _item(acct, amount, hours, country="FI"):
+    return {"account_external_id": acct, "amount": amount, "currency": "EUR", "country": country,
+            "timestamp": (T0 + timedelta(hours=hours)).isoformat()}
+
+def test_batch_columns_match_one_by_one_histories():
+    pre = {1: AccountHistory(np.array([T0.timestamp() - 60]), np.array([7.0]), np.array([b"SE"])),
+           2: AccountHistory(np.zeros(0), np.zeros(0), np.zeros(0, dtype="S2"))}
+    owners = [1, 2, 1, 1, 2]
+    txs = [tx_api.TxIn(**_item(str(a), 10.0 * i, i, "FI" if i % 2 else "DE")) for i, a in enumerate(owners)]
+    batch = tx_api._batch_columns(pre, owners, txs)
+    for i, a in enumerate(owners):
+        earlier = [t for t, o in zip(txs[:i + 1], owners) if o == a]
+        want = [*pre[a], *({"amount": t.amount, "country": t.country, "timestamp": t.timestamp} for t in earlier)]
+        got = batch.history(i)
+        assert [(h["amount"], h["country"], h["timestamp"]) for h in got] == [
+            (w["amount"], w["country"].upper(), w["timestamp"]) for w in want]
+        X = history_features(batch.hist_timestamp, batch.hist_amount, batch.hist_country, batch.offsets)
+        np.testing.assert_allclose(X[i], latest_feature_row(to_frame(want)))
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    eng = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    Base.metadata.create_all(eng)
+    Session = sessionmaker(bind=eng)
+    det = AnomalyDetector(model=IsolationForest(n_estimators=10, random_state=0))
+    det.path = tmp_path / "iforest.joblib"
+    det.fit(np.random.default_rng(0).normal(size=(64, len(ANOMALY_FEATURES))))
+    monkeypatch.setattr(tx_api, "_models", ModelRegistry(det.path, poll_interval=0))
+    monkeypatch.setattr(tx_api, "_history", AccountHistoryStore())
+    monkeypatch.setattr(tx_api, "account_resolver", AccountResolver())
+    app = FastAPI()
+    app.include_router(tx_api.router)
+
+    def get_db():
+        with Session() as db:
+            yield db
+    app.dependency_overrides[tx_api.get_db] = get_db
+    return TestClient(app), Session
+
+def test_ingest_and_score_batch(client):
+    http, Session = client
+    items = [_item("a", 50.0, 0), _item("b", 20.0, 1), _item("a", 250_000.0, 2, "KP"), _item("a", 60.0, 3)]
+    r = http.post("/transactions/ingest-and-score-batch", json=items)
+    assert r.status_code == 200
+    out = r.json()
+    assert len(out) == 4 and len({o["transaction_id"] for o in out}) == 4
+    assert all(0.0 <= o["anomaly_score"] <= 1.0 for o in out)
+    assert out[2]["rule_score"] > 0 and out[0]["rule_score"] == 0
+    with Session() as db:
+        assert db.scalar(select(func.count()).select_from(Transaction)) == 4
+        assert db.scalar(select(func.count()).select_from(Alert)) == sum(o["suspicious"] for o in out)
+
+def test_oversized_batch_is_rejected(client, monkeypatch):
+    http, _ = client
+    monkeypatch.setattr(tx_api.settings, "INGEST_BATCH_MAX_SIZE", 2)
+    r = http.post("/transactions/ingest-and-score-batch", json=[_item("a", 1.0, i) for i in range(3)])
+    assert r.status_code == 413
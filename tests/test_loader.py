@@ -0,0 +1,175 @@
+import json
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+import psycopg
+import pytest
+from data import loader
+from data.loader import COLUMNS, CopyLoader, _copy_value, normalize_row
+
+TX = "6f1c0b2e-0000-4000-8000-000000000001"
+
+def test_normalize_row_coerces_csv_strings():
+    row = normalize_row({"tx_id": TX, "src_account": TX, "dst_account": "", "amount": "12.50",
+                         "currency": "", "channel": "web", "tx_ts": "2025-03-01T12:30:00",
+                         "geo": '{"cc": "FI"}', "raw_payload": "", "processed": " Yes "})
+    assert list(row) == list(COLUMNS)
+    assert row["tx_id"] == uuid.UUID(TX) and row["dst_account"] is None
+    assert row["amount"] == Decimal("12.50") and row["tx_ts"] == datetime(2025, 3, 1, 12, 30)
+    assert row["geo"] == {"cc": "FI"} and row["raw_payload"] is None
+    assert row["currency"] == "USD" and row["processed"] is True and row["merchant_code"] is None
+    assert normalize_row({"processed": "0"})["processed"] is False
+
+def test_copy_value_encodes_json_columns_only():
+    assert _copy_value("geo", {"cc": "FI"}, binary=False) == '{"cc": "FI"}'
+    assert _copy_value("geo", {"cc": "FI"}, binary=True).obj == {"cc": "FI"}
+    assert _copy_value("geo", None, binary=True) is None
+    assert _copy_value("amount", Decimal("1.5"), binary=False) == Decimal("1.5")
+
+
+class _FakeConn:
+    """Just enough of a psycopg connection for CopyLoader; fails the first `fail` COPYs."""
+    def __init__(self, fail=0):
+        self.fail, self.copied, self.sql = fail, [], []
+        self.closed = self.broken = False
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    @contextmanager
+    def copy(self, statement):
+        if self.fail:
+            self.fail -= 1
+            self.broken = True
+            raise psycopg.OperationalError("connection lost")
+        rows = []
+        yield type("Copy", (), {"set_types": lambda s, t: None, "write_row": lambda s, r: rows.append(r),
+                                "write": lambda s, b: rows.append(bytes(b))})()
+        self.copied.append((statement, rows))
+
+    def execute(self, sql):
+        self.sql.append(sql)
+        return type("Result", (), {"rowcount": len(self.copied[-1][1])})()
+
+    def close(self):
+        self.closed = True
+
+
+def _rows(n):
+    return [normalize_row({"tx_id": str(uuid.uuid4()), "amount": "1", "tx_ts": "2025-01-01T00:00:00"}) for _ in range(n)]
+
+def test_failed_chunk_is_retried_on_a_new_connection(monkeypatch):
+    conns = [_FakeConn(fail=1), _FakeConn()]
+    ld = CopyLoader("postgresql://unused", binary=False, max_retries=2)
+
+    def connect():
+        if ld._conn is None:
+            ld._conn = conns.pop(0)
+        return ld._conn
+    monkeypatch.setattr(ld, "_connect", connect)
+    monkeypatch.setattr(loader.time, "sleep", lambda s: None)
+    stats = ld.load([_rows(3), _rows(2)])
+    assert (stats.rows_in, stats.rows_loaded, stats.retries, stats.failed_chunks) == (5, 5, 1, [])
+    assert not conns  # the broken connection was replaced
+
+def test_dedup_stages_then_inserts_missing_tx_ids(monkeypatch):
+    conn = _FakeConn()
+    ld = CopyLoader("postgresql://unused", binary=False)
+    monkeypatch.setattr(ld, "_connect", lambda: conn)
+    assert ld.load_chunk(_rows(2)) == 2
+    assert conn.copied[0][0].startswith("COPY _load_stage (")
+    (sql,) = conn.sql
+    assert "SELECT DISTINCT ON (s.tx_id)" in sql and "WHERE NOT EXISTS (SELECT 1 FROM transactions t WHERE t.tx_ts = s.tx_ts AND t.tx_id = s.tx_id)" in sql
+
+def test_chunk_fails_after_max_retries(monkeypatch):
+    conn = _FakeConn(fail=10)
+    ld = CopyLoader("postgresql://unused", binary=False, max_retries=1)
+    monkeypatch.setattr(ld, "_connect", lambda: conn)
+    monkeypatch.setattr(loader.time, "sleep", lambda s: None)
+    stats = ld.load([_rows(1)])
+    assert stats.failed_chunks == [0] and stats.rows_loaded == 0 and stats.retries == 1
+
+
+def _write_csv(path, rows, fields):
+    import csv
+    with path.open("w", newline="") as f:
+        w = csv.DictWriter(f, fields)
+        w.writeheader()
+        w.writerows(rows)
+
+def _csv_rows(n):
+    # raw_payload is absent from the file; "extra" is not a column
+    return [{"tx_id": str(uuid.uuid4()), "src_account": TX, "dst_account": TX, "amount": f"{i}.12345",
+             "currency": "" if i % 3 else "EUR", "channel": "" if i % 2 else "web", "merchant_code": "0042",
+             "tx_ts": f"2025-0{1 + i % 3}-0{1 + i % 9}T12:30:0{i % 10}", "ip_hash": "",
+             "geo": '{"cc": "FI", "q": "a,\\"b\\""}' if i % 2 else "", "processed": [" Yes ", "0", "", "t"][i % 4],
+             "extra": "x"} for i in range(n)]
+
+_CSV_FIELDS = [c for c in COLUMNS if c != "raw_payload"] + ["extra"]
+
+def test_table_stream_matches_normalize_row(tmp_path):
+    raw = _csv_rows(7)
+    _write_csv(tmp_path / "tx.csv", raw, _CSV_FIELDS)
+    tables = list(loader.read_table_stream(tmp_path / "tx.csv", 3))
+    assert [t.num_rows for t in tables] == [3, 3, 1] and all(t.schema == loader.arrow_schema() for t in tables)
+    got = [r for t in tables for r in t.to_pylist()]
+    for g, r in zip(got, raw):
+        want = normalize_row(r)
+        geo = g.pop("geo")  # JSON stays text for the server to parse
+        assert (json.loads(geo) if geo else None) == want.pop("geo")
+        assert {k: str(v) if k in loader._UUID else v for k, v in want.items()} == g
+
+def test_parquet_table_stream(tmp_path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    raw = _csv_rows(5)
+    pq.write_table(pa.Table.from_pylist(raw), tmp_path / "tx.parquet", row_group_size=2)
+    tables = list(loader.read_table_stream(tmp_path / "tx.parquet", 4))
+    assert [t.num_rows for t in tables] == [4, 1]
+    assert tables[0]["processed"].to_pylist() == [True, False, False, True]
+    assert tables[0]["currency"].to_pylist() == ["EUR", "USD", "USD", "EUR"]
+
+def test_table_chunks_are_copied_as_csv(monkeypatch, tmp_path):
+    import csv, io
+    _write_csv(tmp_path / "tx.csv", _csv_rows(2), _CSV_FIELDS)
+    conn = _FakeConn()
+    ld = CopyLoader("postgresql://unused", binary=True, dedup=False)
+    monkeypatch.setattr(ld, "_connect", lambda: conn)
+    (table,) = loader.read_table_stream(tmp_path / "tx.csv", 10)
+    assert ld.load_chunk(table) == 2
+    (statement, (data,)), = conn.copied
+    assert statement.endswith("FROM STDIN (FORMAT csv)")  # Arrow-rendered CSV even with binary=True
+    lines = list(csv.reader(io.StringIO(data.decode())))
+    assert len(lines) == 2 and all(len(r) == len(COLUMNS) for r in lines)
+    assert lines[0][COLUMNS.index("merchant_code")] == "0042" and lines[1][COLUMNS.index("channel")] == ""
+    with pytest.raises(TypeError):
+        ld.load([table], normalize_row)
+
+
+def _fetch(url):
+    with psycopg.connect(url) as conn:
+        cur = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM transactions ORDER BY tx_id")
+        return [dict(zip(COLUMNS, r)) for r in cur]
+
+@pytest.mark.parametrize("rollup", [False, True])
+def test_columnar_load_against_postgres(pg_url, tmp_path, rollup):
+    raw = _csv_rows(25)
+    raw[3]["ip_hash"] = '""'  # a literal value, not a blank
+    _write_csv(tmp_path / "tx.csv", raw, _CSV_FIELDS)
+    ld = CopyLoader(pg_url, rollup=rollup)
+    stats = ld.load(loader.read_table_stream(tmp_path / "tx.csv", 10))
+    assert (stats.rows_in, stats.rows_loaded, stats.failed_chunks) == (25, 25, [])
+    assert CopyLoader(pg_url).load(loader.read_table_stream(tmp_path / "tx.csv", 10)).rows_loaded == 0  # dedup
+
+    want = sorted((normalize_row(r) for r in raw), key=lambda r: r["tx_id"])
+    for w in want:
+        w["amount"] = w["amount"].quantize(Decimal("0.0001"), ROUND_HALF_UP)  # numeric(18,4)
+        if rollup:
+            w["processed"] = True
+    assert _fetch(pg_url) == want
@@ -0,0 +1,65 @@
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from anomaly.detector import AnomalyDetector
+from anomaly.registry import ModelRegistry, file_version
+
+def _publish(path, seed):
+    det = AnomalyDetector(model=IsolationForest(n_estimators=10, random_state=seed))
+    det.path = path
+    det.fit(np.random.default_rng(seed).normal(size=(64, 3)))
+
+def test_loads_once_and_swaps_on_new_version(tmp_path):
+    path = tmp_path / "iforest.joblib"
+    reg = ModelRegistry(path, poll_interval=0)
+    assert not reg.ready
+    _publish(path, 1)
+    first = reg.reload()
+    assert reg.ready and reg.reload() is first  # unchanged file: no re-read
+    path.touch()
+    assert reg.reload(force=True) is first  # same content hash: keep the loaded model
+    _publish(path, 2)
+    second = reg.reload()
+    assert second.version != first.version and reg.current() is second
+    assert reg.detector_for(np.zeros((1, 3))) is second.detector
+
+def test_first_request_fits_when_no_model(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    from common.config import get_settings
+    get_settings.cache_clear()
+    try:
+        reg = ModelRegistry(tmp_path / "iforest.joblib", poll_interval=0)
+        det = reg.detector_for(np.random.default_rng(0).normal(size=(32, 3)))
+        assert reg.ready and (tmp_path / "iforest.joblib").exists()
+        assert 0.0 <= det.score_one(np.zeros(3)) <= 1.0
+    finally:
+        get_settings.cache_clear()
+
+def test_bootstrap_fits_from_training_data_or_stays_empty(tmp_path):
+    path = tmp_path / "iforest.joblib"
+    reg = ModelRegistry(path, poll_interval=0)
+    assert reg.bootstrap(lambda: np.zeros((0, 3))) is None and not reg.ready
+    snap = reg.bootstrap(lambda: np.random.default_rng(0).normal(size=(64, 3)))
+    assert reg.ready and path.exists() and snap.version == file_version(path)
+    assert ModelRegistry(path, poll_interval=0).bootstrap(lambda: 1 / 0).version == snap.version  # loads, no refit
+
+def test_training_matrix_from_ingested_transactions(tmp_path):
+    from datetime import datetime, timedelta
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from data.etl import ANOMALY_FEATURES, anomaly_training_matrix, latest_feature_row, to_frame
+    from db.models import Account, Base, Transaction
+    eng = create_engine(f"sqlite:///{tmp_path / 'tx.db'}")
+    Base.metadata.create_all(eng)
+    Session = sessionmaker(bind=eng)
+    rows = [(1, 10.0, "FI"), (2, 5.0, "SE"), (1, 30.0, "DE"), (1, 20.0, "FI")]
+    with Session() as db:
+        db.add_all([Account(external_id="a", country="FI"), Account(external_id="b", country="SE")]); db.flush()
+        for i, (acct, amt, cty) in enumerate(rows):
+            db.add(Transaction(account_id=acct, amount=amt, currency="EUR", country=cty,
+                               timestamp=datetime(2025, 1, 1) + timedelta(hours=i), metadata={}))
+        db.commit()
+    X = anomaly_training_matrix(session_factory=Session)
+    assert X.shape == (4, len(ANOMALY_FEATURES))
+    acct1 = [{"amount": a, "country": c, "timestamp": datetime(2025, 1, 1) + timedelta(hours=i)}
+             for i, (acct, a, c) in enumerate(rows) if acct == 1]
+    np.testing.assert_allclose(X[2], latest_feature_row(to_frame(acct1)))
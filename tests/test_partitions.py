@@ -0,0 +1,19 @@
+from datetime import date
+from db.partitions import PartitionInfo, parse_bounds, plan
+
+def test_parse_bounds():
+    expr = "FOR VALUES FROM ('2025-01-01 00:00:00') TO ('2025-02-01 00:00:00')"
+    assert parse_bounds(expr) == (date(2025, 1, 1), date(2025, 2, 1))
+    assert parse_bounds("DEFAULT") == (None, None)
+
+def test_plan_creates_ahead_and_detaches_past_horizon():
+    existing = [
+        PartitionInfo("transactions_p_2023_11", date(2023, 11, 1), date(2023, 12, 1)),
+        PartitionInfo("transactions_p_2024_12", date(2024, 12, 1), date(2025, 1, 1)),
+        PartitionInfo("transactions_p_2025_01", date(2025, 1, 1), date(2025, 2, 1)),
+    ]
+    create, detach = plan("transactions", existing, date(2024, 12, 15), months_ahead=3, retention_months=12)
+    assert [c[0] for c in create] == ["transactions_p_2025_02", "transactions_p_2025_03"]
+    assert create[-1][2] == date(2025, 4, 1)
+    assert [p.name for p in detach] == ["transactions_p_2023_11"]
+    assert plan("transactions", existing, date(2024, 12, 15), retention_months=None)[1] == []
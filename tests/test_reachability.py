@@ -0,0 +1,24 @@
+import networkx as nx
+import numpy as np
+
+from anomaly.reachability import ReachabilityIndex
+
+
+def test_reaches_matches_networkx():
+    rng = np.random.default_rng(0)
+    n = 400
+    src, dst = rng.integers(0, n, 600), rng.integers(0, n, 600)
+    g = nx.DiGraph()
+    g.add_nodes_from(range(n))
+    g.add_edges_from(zip(src.tolist(), dst.tolist()))
+    index = ReachabilityIndex(n, src, dst)
+
+    u, v = rng.integers(0, n, 3000), rng.integers(0, n, 3000)
+    expected = np.array([nx.has_path(g, a, b) for a, b in zip(u.tolist(), v.tolist())])
+    assert (index.reaches(u, v) == expected).all()
+    assert index.reachable(int(u[0]), int(u[0]))
+
+
+def test_unknown_nodes_are_unreachable():
+    index = ReachabilityIndex(3, np.array([0, 1]), np.array([1, 2]))
+    assert index.reaches(np.array([0, -1, 2]), np.array([2, 0, -1])).tolist() == [True, False, False]
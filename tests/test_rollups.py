@@ -0,0 +1,110 @@
+import random
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import psycopg
+import pytest
+from sqlalchemy import create_engine, text
+
+from data.loader import CopyLoader, normalize_row, normalize_table
+from db import rollups
+
+LO, HI = date(2025, 1, 1), date(2026, 1, 1)
+ACCOUNTS = [uuid.UUID(int=i) for i in range(1, 9)]
+
+
+@pytest.fixture
+def engine(pg_url):
+    eng = create_engine("postgresql+psycopg://", creator=lambda: psycopg.connect(pg_url))
+    yield eng
+    eng.dispose()
+
+
+def _txs(n, seed=0):
+    rnd = random.Random(seed)
+    return [(uuid.uuid4(), rnd.choice(ACCOUNTS), rnd.choice(ACCOUNTS), Decimal(rnd.randrange(1, 10**6)) / 100,
+             datetime(2025, 1, 1) + timedelta(minutes=rnd.randrange(60 * 24 * 45))) for _ in range(n)]
+
+
+def _insert(engine, txs):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO transactions (tx_id, src_account, dst_account, amount, tx_ts) "
+                          "VALUES (:t, :s, :d, :a, :ts)"),
+                     [dict(t=t, s=s, d=d, a=a, ts=ts) for t, s, d, a, ts in txs])
+
+
+def _expected(txs):
+    out = defaultdict(lambda: [Decimal(0), 0, Decimal(0), 0])
+    for _, s, d, a, ts in txs:
+        out[(ts.date(), s)][0] += a
+        out[(ts.date(), s)][1] += 1
+        out[(ts.date(), d)][2] += a
+        out[(ts.date(), d)][3] += 1
+    return {k: tuple(v) for k, v in out.items()}
+
+
+def _rollup(engine):
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT day, account_id, sum_out, n_out, sum_in, n_in FROM account_daily"))
+        return {(r[0], r[1]): tuple(r[2:]) for r in rows}
+
+
+def _check(engine):
+    with engine.connect() as conn:
+        return rollups.check(conn, LO, HI)
+
+
+def test_drain_applies_each_delta_once(engine):
+    txs = _txs(120)
+    _insert(engine, txs)
+    assert _check(engine) == []  # unprocessed rows are on neither side
+    # two drainers with open transactions claim disjoint rows (SKIP LOCKED)
+    with engine.connect() as a, engine.connect() as b:
+        with a.begin(), b.begin():
+            assert rollups.drain_once(a, 30) == 30
+            assert rollups.drain_once(b, 30) == 30
+    assert rollups.drain(engine, batch_size=25) == 60
+    assert rollups.drain(engine) == 0
+    assert _rollup(engine) == _expected(txs)
+    assert _check(engine) == []
+
+    more = _txs(40, seed=1)
+    _insert(engine, more)
+    assert rollups.drain(engine, batch_size=7) == 40
+    assert _rollup(engine) == _expected(txs + more)
+    assert _check(engine) == []
+
+
+def test_rollup_copy_load_stays_consistent(engine, pg_url):
+    import pyarrow as pa
+    txs = _txs(50)
+    raw = [dict(tx_id=str(t), src_account=str(s), dst_account=str(d), amount=str(a), tx_ts=ts.isoformat())
+           for t, s, d, a, ts in txs]
+    rows = [normalize_row(r) for r in raw]
+    table = normalize_table(pa.Table.from_pylist(raw[30:]))  # both the row and the columnar path
+    assert CopyLoader(pg_url, rollup=True).load([rows[:30], table]).rows_loaded == 50
+    assert CopyLoader(pg_url, rollup=True).load([rows]).rows_loaded == 0  # duplicates are not rolled up twice
+    assert rollups.drain(engine) == 0  # loaded as processed
+    assert _rollup(engine) == _expected(txs)
+    assert _check(engine) == []
+
+
+def test_check_reports_drift_until_rebuild(engine):
+    txs = _txs(80)
+    _insert(engine, txs)
+    rollups.drain(engine)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE account_daily SET n_out = n_out + 1 WHERE account_id = :a"), {"a": ACCOUNTS[0]})
+        conn.execute(text("DELETE FROM account_daily WHERE account_id = :a"), {"a": ACCOUNTS[1]})
+    bad = _check(engine)
+    assert bad and {r["account_id"] for r in bad} == {str(ACCOUNTS[0]), str(ACCOUNTS[1])}
+
+    late = _txs(20, seed=2)
+    _insert(engine, late)  # unprocessed rows inside the range are folded in by rebuild
+    with engine.begin() as conn:
+        rollups.rebuild(conn, LO, HI)
+    assert _check(engine) == []
+    assert rollups.drain(engine) == 0
+    assert _rollup(engine) == _expected(txs + late)
@@ -0,0 +1,22 @@
+import pytest
+from rules_engine.registry import RuleRegistry
+
+RULES_V1 = "rules:\n  - type: amount_over\n    threshold: 1000\n"
+RULES_V2 = RULES_V1 + "  - type: country_risk\n    high_risk: [IR]\n"
+
+def test_reload_swaps_snapshot_and_keeps_old_on_error(tmp_path):
+    p = tmp_path / "rules.yaml"
+    p.write_text(RULES_V1, encoding="utf-8")
+    reg = RuleRegistry(str(p), poll_interval=0)
+    before = reg.current()
+    assert reg.reload() is before  # unchanged file: no rebuild
+
+    p.write_text(RULES_V2, encoding="utf-8")
+    after = reg.reload()
+    assert after.version != before.version and len(after.engine.rules) == 2
+    assert len(before.engine.rules) == 1  # in-flight holders keep their snapshot
+
+    p.write_text("rules:\n  - type: nope\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        reg.reload(force=True)
+    assert reg.current() is after
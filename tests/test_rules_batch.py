@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from rules_engine.engine import Rule, RuleEngine, TxBatch, AmountOver, Velocity, CountryRisk, register
+
+NOW = datetime(2025, 1, 1, 12, tzinfo=timezone.utc)
+
+def _sample():
+    txs = [
+        {"amount": 150_000.0, "country": "ir", "timestamp": NOW},
+        {"amount": 10.0, "country": "FI", "timestamp": NOW},
+        {"amount": 99.0, "country": "DE", "timestamp": NOW},
+    ]
+    histories = [
+        [{"amount": 1.0, "country": "FI", "timestamp": NOW - timedelta(hours=h)} for h in range(12)],
+        [],
+        [{"amount": 1.0, "country": "FI", "timestamp": NOW - timedelta(hours=30)}],
+    ]
+    return txs, histories
+
+def test_batch_matches_per_row():
+    engine = RuleEngine([
+        AmountOver({"threshold": 100_000, "weight": 1.6}),
+        Velocity({"window_hours": 24, "max_tx": 8, "weight": 1.2}),
+        CountryRisk({"high_risk": ["IR", "KP"], "weight": 1.0}),
+    ])
+    txs, histories = _sample()
+    res = engine.evaluate_batch(TxBatch.from_records(txs, histories))
+    for i, (tx, hist) in enumerate(zip(txs, histories)):
+        tx = {**tx, "country": tx["country"].upper()}
+        total, outcomes = engine.evaluate(tx, hist)
+        assert np.isclose(res.total[i], total)
+        assert [(o.rule, o.details) for o in res.outcomes[i]] == [(o.rule, o.details) for o in outcomes]
+    assert set(res.scores) == {"amount_over", "velocity", "country_risk"}
+
+def test_custom_rule_falls_back_to_per_row():
+    @register("small_tx_test")
+    class SmallTx(Rule):
+        def __init__(self, cfg: dict):
+            self.name = "small_tx"
+            self.weight = 1.0
+        def evaluate(self, tx, history):
+            return (1.0, {"n": len(history)}) if tx["amount"] < 50 else (0.0, {})
+
+    txs, histories = _sample()
+    res = RuleEngine([SmallTx({})]).evaluate_batch(TxBatch.from_records(txs, histories))
+    assert res.scores["small_tx"].tolist() == [0.0, 1.0, 0.0]
+    assert res.outcomes[1][0].details == {"n": 0}
@@ -0,0 +1,14 @@
+import numpy as np
+from common.sketch import LogHistogramSketch
+
+def test_quantiles_within_bin_error_and_merge():
+    rng = np.random.default_rng(0)
+    x = rng.lognormal(-3, 2, 200_000)
+    a, b = LogHistogramSketch(), LogHistogramSketch()
+    for i, chunk in enumerate(np.array_split(x, 20)):
+        (a if i % 2 else b).update(chunk)
+    a.merge(b)
+    assert a.n == len(x)
+    for q in (0.5, 0.95, 0.99):
+        assert abs(a.quantile(q) / np.quantile(x, q) - 1) < 0.012
+    assert a.quantile(1.0) == x.max()
@@ -0,0 +1,133 @@
+import itertools
+import time
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from db.models import Base, Alert, Transaction
+from db.write_behind import WriteBehindFull, WriteBehindWriter, _encode
+
+def _factory(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path / 'wb.db'}")
+    Base.metadata.create_all(eng)
+    return sessionmaker(bind=eng)
+
+def _ids():
+    counter = itertools.count(1)
+    return lambda n: [next(counter) for _ in range(n)]
+
+def _row(i, **kw):
+    return dict(id=i, account_id=1, amount=10.0, currency="EUR", country="FI",
+                timestamp=datetime(2025, 1, 1), metadata={}, **kw)
+
+def _count(Session, model):
+    with Session() as db:
+        return db.scalar(select(func.count()).select_from(model))
+
+@pytest.mark.parametrize("wal", [False, True])
+def test_flushes_and_drains_on_close(tmp_path, wal):
+    Session = _factory(tmp_path)
+    w = WriteBehindWriter(Session, _ids(), max_rows=3, max_delay_ms=5,
+                          wal_dir=str(tmp_path / "wal") if wal else None, wal_fsync=False)
+    for _ in range(7):
+        i = w.next_id()
+        alert = dict(transaction_id=i, final_score=1.0, rule_score=1.0, anomaly_score=0.0,
+                     explanation={}, created_at=datetime(2025, 1, 1)) if i % 2 else None
+        w.submit(_row(i), alert)
+    w.close()
+    assert (_count(Session, Transaction), _count(Session, Alert)) == (7, 4)
+    if wal:
+        assert list((tmp_path / "wal").glob("*.wal")) == []
+
+def test_wal_replay_skips_committed_rows(tmp_path):
+    Session = _factory(tmp_path)
+    with Session() as db:
+        db.add(Transaction(**_row(1))); db.commit()
+    wal = tmp_path / "wal"; wal.mkdir()
+    (wal / "0-old.wal").write_text(_encode((_row(1), None)) + "\n" + _encode((_row(2), None)) + "\n")
+    WriteBehindWriter(Session, _ids(), wal_dir=str(wal)).close()
+    assert _count(Session, Transaction) == 2
+
+def test_replay_waits_for_db_instead_of_failing_startup(tmp_path):
+    Session, down = _factory(tmp_path), [True]
+    def factory():
+        if down[0]:
+            raise ConnectionError("db down")
+        return Session()
+    wal = tmp_path / "wal"; wal.mkdir()
+    (wal / "0-old.wal").write_text(_encode((_row(1), None)) + "\n")
+    w = WriteBehindWriter(factory, _ids(), max_rows=10, max_delay_ms=1, wal_dir=str(wal), wal_fsync=False)
+    w.submit(_row(2))
+    deadline = time.monotonic() + 5
+    while not w.failed_flushes and time.monotonic() < deadline:  # replay is retrying
+        time.sleep(0.01)
+    assert w.failed_flushes > 0 and w.stats()["flushed_rows"] == 0
+    down[0] = False
+    w.close()
+    assert _count(Session, Transaction) == 2
+    assert list(wal.glob("*.wal")) == []
+
+def test_backpressure_when_full(tmp_path):
+    w = WriteBehindWriter(_factory(tmp_path), _ids(), max_rows=100, max_delay_ms=10_000,
+                          capacity=2, put_timeout=0.05)
+    w.submit(_row(1)); w.submit(_row(2))
+    with pytest.raises(WriteBehindFull):
+        w.submit(_row(3))
+    w.close()
+
+def test_replay_skips_segments_of_live_writers(tmp_path):
+    Session, wal = _factory(tmp_path), str(tmp_path / "wal")
+    live = WriteBehindWriter(Session, _ids(), max_rows=100, max_delay_ms=10_000, wal_dir=wal, wal_fsync=False)
+    live.submit(_row(1)); live.submit(_row(2))
+    WriteBehindWriter(Session, _ids(), wal_dir=wal).close()  # a second worker starting up
+    assert _count(Session, Transaction) == 0
+    live.close()
+    assert _count(Session, Transaction) == 2
+
+def test_failed_batch_stays_queued_and_pushes_back(tmp_path):
+    Session, down = _factory(tmp_path), [True]
+    def factory():
+        if down[0]:
+            raise ConnectionError("db down")
+        return Session()
+    w = WriteBehindWriter(factory, _ids(), max_rows=2, max_delay_ms=1, capacity=2, put_timeout=0.05)
+    w.submit(_row(1)); w.submit(_row(2))
+    with pytest.raises(WriteBehindFull):
+        w.submit(_row(3))
+    assert w.stats()["queued"] == 2
+    down[0] = False
+    w.close()
+    assert _count(Session, Transaction) == 2 and w.failed_rows == 0 and w.failed_flushes > 0
+
+def test_rejected_rows_do_not_block_the_batch(tmp_path):
+    Session = _factory(tmp_path)
+    with Session() as db:
+        db.add(Transaction(**_row(1))); db.commit()
+    w = WriteBehindWriter(Session, _ids(), max_rows=3, max_delay_ms=1)
+    for i in (1, 2, 3):
+        w.submit(_row(i))
+    w.close()
+    assert _count(Session, Transaction) == 3 and w.failed_rows == 1
+
+def test_concurrent_submits_share_fsync(tmp_path, monkeypatch):
+    import threading, time
+    import db.write_behind as wb
+    calls = []
+    def slow_fsync(fd):
+        calls.append(fd); time.sleep(0.01)
+    monkeypatch.setattr(wb.os, "fsync", slow_fsync)
+    Session = _factory(tmp_path)
+    w = WriteBehindWriter(Session, _ids(), max_rows=1000, max_delay_ms=10_000, wal_dir=str(tmp_path / "wal"))
+    ids = iter(range(1, 81))
+    lock = threading.Lock()
+    def worker():
+        for _ in range(10):
+            with lock:
+                i = next(ids)
+            w.submit(_row(i))
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert len(calls) < 80
+    w.close()
+    assert _count(Session, Transaction) == 80